@@ -1,9 +1,21 @@
 import pandas as pd
 import os
+import argparse
+import contextlib
+import functools
+
+from sources_csv import source_existe
+from cache_colonnes import lire_colonnes, lire_par_blocs, colonnes_disponibles
+from schema_inventaire import valider_entete, en_texte, SchemaInvalide
+from index_inventaire import lire_par_codes
+from delta_odoo import ExportDelta
+from transform_commodity import categories_odoo
+from metriques import etape
+from parallelisme import executer_en_parallele
 
 # --- Configuration ---
 # Chemin vers votre fichier CSV d'origine
-FICHIER_ENTREE = r"INVENTAIRE-PARTS-CANADA\PartsCanada_with_Features.csv"
+FICHIER_ENTREE = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanada_with_Features.csv")
 
 # Répertoire où les fichiers filtrés seront sauvegardés
 REPERTOIRE_SORTIE = r"MICPARTSONLINE"
@@ -11,45 +23,299 @@ REPERTOIRE_SORTIE = r"MICPARTSONLINE"
 # Le code "Commodity" que vous souhaitez filtrer par défaut
 CODE_A_FILTRER_DEFAUT = "1240"
 
+# Colonnes du fichier combiné utilisées pour construire l'export Odoo
+COLONNES_SOURCE_ODOO = [
+    'Part Number', 'Commodity Code', 'Brand', 'Manufacturer Part Number',
+    'Description EN', 'Description FR', 'Description Long EN', 'Description Long FR',
+    'MSRP Latest', 'Dealer Discounted Price', 'Features'
+]
+
+# Catégorie Odoo racine : les produits sont rangés sous "New Parts / <parent> / <enfant>"
+# d'après les codes de commodité, ou directement sous la racine si leur code est inconnu
+CATEGORIE_RACINE = 'New Parts'
+
+# Préfixe ajouté au 'Part Number' pour former la référence interne Odoo ('Internal Reference')
+PREFIXE_REFERENCE = "10-"
+
+
+
+# Ordre des colonnes attendu par l'import Odoo
+COLONNES_ODOO_ORDRE = [
+    'Name', 'Internal Reference', 'Brand', 'Can be Sold', 'Can be Purchased',
+    'Is Publish', 'Product Category', 'Product Type', 'Sales Price', 
+    'Detailed Price', 'Cost', 'Unit of Measure', 'Customer Taxes', 
+    'Vendor Taxes', 'Invoicing Policy', 'Control Policy', 'Routes', 
+    'Tracking', 'Variant Seller/Vendor', 'Variant Seller/Delivery Lead Time',
+    'Variant Seller/Quantity', 'Variant Seller/Price', 'description_en', 
+    'description_fr'
+]
+
+# Nombre de lignes lues à la fois en mode flux (mémoire bornée)
+TAILLE_BLOC_DEFAUT = 100_000
+
+# Nombre d'exports écrits simultanément en mode multi-codes
+MAX_WORKERS_ECRITURE = 4
+
+
+def lire_source(source):
+    """
+    Lit uniquement les colonnes utiles (via le cache Parquet si disponible),
+    avec les types du schéma de l'inventaire (voir schema_inventaire).
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    with etape("lecture_csv") as mesure:
+        df = lire_colonnes(source, COLONNES_SOURCE_ODOO)
+        mesure.ajouter(lignes=len(df))
+    return df
+
+
+def verifier_colonnes(source):
+    """
+    Vérifie que la source contient toutes les colonnes utilisées par l'export Odoo.
+
+    Raises:
+        SchemaInvalide: si des colonnes manquent.
+    """
+    if isinstance(source, pd.DataFrame):
+        valider_entete(source.columns, COLONNES_SOURCE_ODOO, nom="Le DataFrame")
+    else:
+        valider_entete(colonnes_disponibles(source), COLONNES_SOURCE_ODOO, nom=f"'{source}'")
+
+
+def categorie_produit(codes):
+    """
+    Retourne la catégorie Odoo de chaque ligne d'après son 'Commodity Code'
+    (jointure vectorisée sur la hiérarchie des codes de commodité).
+    """
+    categories = categories_odoo(CATEGORIE_RACINE)
+    if categories is None:
+        return CATEGORIE_RACINE
+    return codes.map(categories).fillna(CATEGORIE_RACINE)
+
+
+def transformer_pour_odoo(df_filtre):
+    """
+    Transforme des lignes du fichier combiné au format d'import Odoo.
+    """
+    # Les colonnes catégorielles (Brand...) sont repassées en texte pour les concaténations
+    df_filtre = en_texte(df_filtre)
+
+    # Créer un nouveau DataFrame vide pour le format Odoo
+    df_odoo = pd.DataFrame()
+    
+    # Remplir les colonnes dans l'ordre Odoo
+    # .fillna() est utilisé pour éviter les erreurs si des données sont manquantes
+    
+    df_odoo['Name'] = df_filtre['Description EN'].fillna('')
+    df_odoo['Internal Reference'] = PREFIXE_REFERENCE + df_filtre['Part Number'].fillna('')
+    df_odoo['Brand'] = df_filtre['Brand'].fillna('')
+    # Remplissage par default
+    df_odoo['Can be Sold'] = True
+    df_odoo['Can be Purchased'] = True
+    df_odoo['Is Publish'] = True
+    df_odoo['Product Category'] = categorie_produit(df_filtre['Commodity Code'])
+    df_odoo['Product Type'] = 'Storable Product'
+    #Remplissge du prix
+    df_odoo['Sales Price'] = df_filtre['MSRP Latest'].fillna(0)
+    df_odoo['Detailed Price'] = df_filtre['MSRP Latest'].fillna(0)
+    df_odoo['Cost'] = df_filtre['Dealer Discounted Price'].fillna(0)
+    # Remplissage par default
+    df_odoo['Unit of Measure'] = 'Units'
+    df_odoo['Customer Taxes'] = 'Tax Exempt'
+    df_odoo['Vendor Taxes'] = 'Tax - Exempt'
+    df_odoo['Invoicing Policy'] = 'Ordered quantities'
+    df_odoo['Control Policy'] = 'On received quantities'
+    df_odoo['Routes'] = 'Buy'
+    df_odoo['Tracking'] = 'No Tracking'
+    df_odoo['Variant Seller/Vendor'] = 'Parts Canada'
+    df_odoo['Variant Seller/Delivery Lead Time'] = 0
+    df_odoo['Variant Seller/Quantity'] = 0
+    df_odoo['Variant Seller/Price'] = 0
+    
+    # Remplissage CUSTOM
+    
+    # --- MODIFICATION ICI ---
+    # Construit la description 'en' selon votre format
+    df_odoo['description_en'] = (
+        df_filtre['Description Long EN'].fillna('') +
+        '<br />' + 
+        df_filtre['Brand'].fillna('') + ' ' +
+        df_filtre['Manufacturer Part Number'].fillna('') + ' ' +
+        df_filtre['Description EN'].fillna('') +
+        '<br />' +
+        df_filtre['Features'].fillna('')
+    )
+    
+
+
+    # --- MODIFICATION ICI pour description_fr ---
+    # Préparer les descriptions FR avec fallback en EN si elles sont vides
+    desc_long_fr_with_fallback = df_filtre['Description Long FR'].fillna(df_filtre['Description Long EN'])
+    desc_fr_with_fallback = df_filtre['Description FR'].fillna(df_filtre['Description EN'])
+    
+    # Construit la description 'fr' avec la même structure
+    df_odoo['description_fr'] = (
+        desc_long_fr_with_fallback.fillna('') +
+        '<br />' + 
+        df_filtre['Brand'].fillna('') + ' ' +
+        df_filtre['Manufacturer Part Number'].fillna('') + ' ' +
+        desc_fr_with_fallback.fillna('') +
+        '<br />' +
+        df_filtre['Features'].fillna('')
+    )
+    # --- FIN MODIFICATION ---
+
+    # Réorganiser le DataFrame pour correspondre à la liste (sécurité)
+    return df_odoo.reindex(columns=COLONNES_ODOO_ORDRE)
 
 
-def filtrer_par_code(target_code: str):
+def chemin_export(target_code: str):
+    """
+    Retourne le chemin de l'export Odoo d'un code
+    (par ex: MICPARTSONLINE\\parts_canada_1240.csv).
+    """
+    return os.path.join(REPERTOIRE_SORTIE, f"parts_canada_{target_code}.csv")
+
+
+def afficher_delta(output_file, compteurs):
+    if compteurs['premier_export']:
+        print(f"Premier export suivi pour '{output_file}' : les {compteurs['lignes']} lignes sont dans le delta.")
+    else:
+        print(f"Delta de '{output_file}' : {compteurs['modifiees']} produit(s) nouveau(x) ou modifié(s), "
+              f"{compteurs['supprimees']} supprimé(s).")
+
+
+def ecrire_export(df_filtre, target_code: str, delta: bool = False, liste_supprimes: bool = False):
+    """
+    Transforme et sauvegarde l'export Odoo d'un code.
+
+    Args:
+        delta (bool): Écrire aussi deltas/parts_canada_<code>_delta.csv, limité aux
+            produits nouveaux ou modifiés depuis le dernier export.
+        liste_supprimes (bool): Avec delta, écrire aussi la liste des produits disparus.
+
+    Returns:
+        str: Le chemin du fichier écrit.
+    """
+    output_file = chemin_export(target_code)
+    os.makedirs(REPERTOIRE_SORTIE, exist_ok=True)
+    with etape("transformation_odoo") as mesure:
+        df_odoo = transformer_pour_odoo(df_filtre)
+        mesure.ajouter(lignes=len(df_odoo))
+    with etape("ecriture_csv") as mesure:
+        df_odoo.to_csv(output_file, index=False, encoding='utf-8')
+        mesure.ajouter(octets=os.path.getsize(output_file), lignes=len(df_odoo))
+    if delta:
+        with etape("delta_odoo"), ExportDelta(output_file, liste_supprimes) as suivi:
+            suivi.ajouter(df_odoo)
+            afficher_delta(output_file, suivi.terminer())
+    return output_file
+
+
+def filtrer_par_blocs(target_code: str, source=FICHIER_ENTREE, taille_bloc: int = TAILLE_BLOC_DEFAUT,
+                      delta: bool = False, liste_supprimes: bool = False):
+    """
+    Variante en flux de filtrer_par_code : la source est lue par blocs,
+    chaque bloc est filtré puis transformé, et les lignes retenues sont
+    ajoutées à l'export. La mémoire reste bornée par la taille d'un bloc.
+
+    Returns:
+        tuple: (chemin de l'export, lignes lues, lignes écrites)
+    """
+    output_file = chemin_export(target_code)
+    os.makedirs(REPERTOIRE_SORTIE, exist_ok=True)
+    lignes_lues = lignes_ecrites = 0
+
+    with ExportDelta(output_file, liste_supprimes) if delta else contextlib.nullcontext() as suivi:
+        # Fichier temporaire : un export interrompu ne remplace pas le précédent
+        temporaire = output_file + ".tmp"
+        try:
+            with etape("filtre_par_blocs") as mesure, \
+                    open(temporaire, 'w', encoding='utf-8', newline='') as sortie:
+                pd.DataFrame(columns=COLONNES_ODOO_ORDRE).to_csv(sortie, index=False)
+                for bloc in lire_par_blocs(source, COLONNES_SOURCE_ODOO, taille_bloc=taille_bloc):
+                    lignes_lues += len(bloc)
+                    mesure.ajouter(lignes=len(bloc))
+                    bloc = bloc[bloc['Commodity Code'] == target_code]
+                    if bloc.empty:
+                        continue
+                    df_odoo = transformer_pour_odoo(bloc)
+                    df_odoo.to_csv(sortie, index=False, header=False)
+                    if suivi is not None:
+                        suivi.ajouter(df_odoo)
+                    lignes_ecrites += len(bloc)
+            os.replace(temporaire, output_file)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        if suivi is not None:
+            afficher_delta(output_file, suivi.terminer())
+    return output_file, lignes_lues, lignes_ecrites
+
+
+def filtrer_par_code(target_code: str, source=FICHIER_ENTREE, taille_bloc: int = None,
+                     delta: bool = False, liste_supprimes: bool = False):
     """
     Lit un fichier CSV, le filtre par 'Commodity Code', le transforme
     pour l'import Odoo et sauvegarde le résultat.
     
     Args:
         target_code (str): Le code "Commodity" à utiliser pour le filtre.
+        source: Le CSV d'entrée : un chemin .csv, une archive .zip
+            ("archive.zip::membre.csv") ou un DataFrame déjà chargé.
+        taille_bloc (int): Si renseigné, lit la source par blocs de ce nombre
+            de lignes (mode flux, mémoire bornée) au lieu de la charger en entier,
+            même si un index à jour permettrait un accès direct.
+        delta (bool): Écrire aussi le fichier des seuls produits nouveaux ou
+            modifiés depuis le dernier export (voir ecrire_export).
+        liste_supprimes (bool): Avec delta, lister aussi les produits disparus.
     """
     
     # 1. Vérifier si le fichier d'entrée existe
-    if not os.path.exists(FICHIER_ENTREE):
-        print(f"Erreur : Le fichier d'entrée '{FICHIER_ENTREE}' n'a pas été trouvé.")
+    if not isinstance(source, pd.DataFrame) and not source_existe(source):
+        print(f"Erreur : Le fichier d'entrée '{source}' n'a pas été trouvé.")
         return
 
-    # 2. Définir le chemin de sortie
-    # Le nom du fichier sera (par ex): MICPARTSONLINE\parts_canada_1240.csv
-    output_file = os.path.join(REPERTOIRE_SORTIE, f"parts_canada_{target_code}.csv")
-
     print(f"Démarrage du filtre pour le code '{target_code}'...")
-    print(f"Lecture de : {FICHIER_ENTREE}")
+    print(f"Lecture de : {source if isinstance(source, str) else 'DataFrame en mémoire'}")
 
     try:
-        # 3. Lire le fichier CSV avec pandas
-        # On spécifie dtype pour s'assurer que les codes sont lus comme du texte.
-        df = pd.read_csv(FICHIER_ENTREE, dtype={
-            'Commodity Code': str, 
-            'Part Number': str,
-            'Manufacturer Part Number': str  # Ajout pour la concaténation
-        })
-
-        # 4. Vérifier si la colonne nécessaire existe
-        if 'Commodity Code' not in df.columns:
-            print(f"Erreur : Colonne 'Commodity Code' introuvable dans le fichier.")
-            print(f"Colonnes disponibles : {df.columns.tolist()}")
+        # 2. Vérifier que les colonnes nécessaires existent
+        verifier_colonnes(source)
+
+        # Mode flux demandé : lecture, filtre et écriture bloc par bloc (prioritaire sur l'index)
+        if taille_bloc and not isinstance(source, pd.DataFrame):
+            output_file, lignes_lues, lignes_ecrites = filtrer_par_blocs(
+                target_code, source, taille_bloc, delta, liste_supprimes
+            )
+            if not lignes_ecrites:
+                print(f"Avertissement : Aucun produit trouvé pour le code '{target_code}'.")
+            print("\n--- Succès ---")
+            print(f"Fichier d'import Odoo sauvegardé ici : {output_file}")
+            print(f"{lignes_lues} lignes lues au total (par blocs de {taille_bloc}).")
+            print(f"{lignes_ecrites} lignes transformées et écrites pour Odoo.")
             return
 
-        # 5. Appliquer le filtre
+        # Index à jour : seules les lignes du code sont relues (accès direct)
+        df_filtre = None if isinstance(source, pd.DataFrame) else lire_par_codes(
+            target_code, source, COLONNES_SOURCE_ODOO
+        )
+        if df_filtre is not None:
+            print(f"Lecture via l'index : {len(df_filtre)} lignes pour le code '{target_code}'.")
+            if df_filtre.empty:
+                print(f"Avertissement : Aucun produit trouvé pour le code '{target_code}'.")
+            output_file = ecrire_export(df_filtre, target_code, delta, liste_supprimes)
+            print("\n--- Succès ---")
+            print(f"Fichier d'import Odoo sauvegardé ici : {output_file}")
+            print(f"{len(df_filtre)} lignes transformées et écrites pour Odoo.")
+            return
+
+        # 3. Lire uniquement les colonnes utiles
+        df = lire_source(source)
+
+        # 4. Appliquer le filtre
         df_filtre = df[df['Commodity Code'] == target_code]
         
         if df_filtre.empty:
@@ -57,91 +323,8 @@ def filtrer_par_code(target_code: str):
         else:
             print(f"{len(df_filtre)} produits trouvés. Transformation pour Odoo...")
 
-        # 6. Transformer pour Odoo
-        # Créer un nouveau DataFrame vide pour le format Odoo
-        df_odoo = pd.DataFrame()
-        
-        # Remplir les colonnes dans l'ordre Odoo
-        # .fillna() est utilisé pour éviter les erreurs si des données sont manquantes
-        
-        df_odoo['Name'] = df_filtre['Description EN'].fillna('')
-        df_odoo['Internal Reference'] = '10-'+ df_filtre['Part Number'].fillna('')
-        df_odoo['Brand'] = df_filtre['Brand'].fillna('')
-        # Remplissage par default
-        df_odoo['Can be Sold'] = True
-        df_odoo['Can be Purchased'] = True
-        df_odoo['Is Publish'] = True
-        df_odoo['Product Category'] = 'New Parts'
-        df_odoo['Product Type'] = 'Storable Product'
-        #Remplissge du prix
-        df_odoo['Sales Price'] = df_filtre['MSRP Latest'].fillna(0)
-        df_odoo['Detailed Price'] = df_filtre['MSRP Latest'].fillna(0)
-        df_odoo['Cost'] = df_filtre['Dealer Discounted Price'].fillna(0)
-        # Remplissage par default
-        df_odoo['Unit of Measure'] = 'Units'
-        df_odoo['Customer Taxes'] = 'Tax Exempt'
-        df_odoo['Vendor Taxes'] = 'Tax - Exempt'
-        df_odoo['Invoicing Policy'] = 'Ordered quantities'
-        df_odoo['Control Policy'] = 'On received quantities'
-        df_odoo['Routes'] = 'Buy'
-        df_odoo['Tracking'] = 'No Tracking'
-        df_odoo['Variant Seller/Vendor'] = 'Parts Canada'
-        df_odoo['Variant Seller/Delivery Lead Time'] = 0
-        df_odoo['Variant Seller/Quantity'] = 0
-        df_odoo['Variant Seller/Price'] = 0
-        
-        # Remplissage CUSTOM
-        
-        # --- MODIFICATION ICI ---
-        # Construit la description 'en' selon votre format
-        df_odoo['description_en'] = (
-            df_filtre['Description Long EN'].fillna('') +
-            '<br />' + 
-            df_filtre['Brand'].fillna('') + ' ' +
-            df_filtre['Manufacturer Part Number'].fillna('') + ' ' +
-            df_filtre['Description EN'].fillna('') +
-            '<br />' +
-            df_filtre['Features'].fillna('')
-        )
-        
-
-
-        # --- MODIFICATION ICI pour description_fr ---
-        # Préparer les descriptions FR avec fallback en EN si elles sont vides
-        desc_long_fr_with_fallback = df_filtre['Description Long FR'].fillna(df_filtre['Description Long EN'])
-        desc_fr_with_fallback = df_filtre['Description FR'].fillna(df_filtre['Description EN'])
-        
-        # Construit la description 'fr' avec la même structure
-        df_odoo['description_fr'] = (
-            desc_long_fr_with_fallback.fillna('') +
-            '<br />' + 
-            df_filtre['Brand'].fillna('') + ' ' +
-            df_filtre['Manufacturer Part Number'].fillna('') + ' ' +
-            desc_fr_with_fallback.fillna('') +
-            '<br />' +
-            df_filtre['Features'].fillna('')
-        )
-        # --- FIN MODIFICATION ---
-        
-        # 7. S'assurer que le répertoire de sortie existe
-        os.makedirs(REPERTOIRE_SORTIE, exist_ok=True)
-
-        # 8. Sauvegarder le fichier Odoo
-        # La liste ci-dessous sert de vérification finale pour l'ordre
-        colonnes_odoo_ordre = [
-            'Name', 'Internal Reference', 'Brand', 'Can be Sold', 'Can be Purchased',
-            'Is Publish', 'Product Category', 'Product Type', 'Sales Price', 
-            'Detailed Price', 'Cost', 'Unit of Measure', 'Customer Taxes', 
-            'Vendor Taxes', 'Invoicing Policy', 'Control Policy', 'Routes', 
-            'Tracking', 'Variant Seller/Vendor', 'Variant Seller/Delivery Lead Time',
-            'Variant Seller/Quantity', 'Variant Seller/Price', 'description_en', 
-            'description_fr'
-        ]
-        
-        # Réorganiser le DataFrame pour correspondre à la liste (sécurité)
-        df_odoo = df_odoo.reindex(columns=colonnes_odoo_ordre)
-        
-        df_odoo.to_csv(output_file, index=False, encoding='utf-8')
+        # 5. Transformer pour Odoo et sauvegarder
+        output_file = ecrire_export(df_filtre, target_code, delta, liste_supprimes)
         
         print("\n--- Succès ---")
         print(f"Fichier d'import Odoo sauvegardé ici : {output_file}")
@@ -153,7 +336,91 @@ def filtrer_par_code(target_code: str):
         print(f"Une erreur est survenue pendant le traitement : {e}")
 
 
+def filtrer_par_codes(codes=None, source=FICHIER_ENTREE, max_workers=MAX_WORKERS_ECRITURE,
+                      delta: bool = False, liste_supprimes: bool = False):
+    """
+    Produit les exports Odoo de plusieurs codes en une seule lecture de la
+    source : les lignes sont partitionnées par 'Commodity Code' puis chaque
+    fichier parts_canada_<code>.csv est écrit en parallèle.
+
+    Args:
+        codes: Liste de codes, ou None / "all" pour tous les codes présents.
+        source, delta, liste_supprimes: Voir filtrer_par_code.
+
+    Returns:
+        dict: {code: nombre de lignes écrites, ou None si l'export du code a échoué}.
+        L'échec d'un code n'interrompt pas les autres exports.
+    """
+    if not isinstance(source, pd.DataFrame) and not source_existe(source):
+        print(f"Erreur : Le fichier d'entrée '{source}' n'a pas été trouvé.")
+        return {}
+
+    try:
+        verifier_colonnes(source)
+    except SchemaInvalide as e:
+        print(f"Erreur : {e}")
+        return {}
+
+    tous = codes is None or codes == "all"
+    if not tous:
+        codes = [str(code) for code in codes]
+
+    # Avec l'index, seules les lignes des codes demandés sont relues
+    df = None
+    if not tous and not isinstance(source, pd.DataFrame):
+        df = lire_par_codes(codes, source, COLONNES_SOURCE_ODOO)
+    if df is None:
+        print(f"Lecture unique de : {source if isinstance(source, str) else 'DataFrame en mémoire'}")
+        df = lire_source(source)
+        if not tous:
+            df = df[df['Commodity Code'].isin(codes)]
+    else:
+        print(f"Lecture via l'index : {len(df)} lignes pour {len(codes)} code(s).")
+
+    partitions = dict(tuple(df.groupby('Commodity Code', sort=False, observed=True)))
+    if not tous:
+        for code in codes:
+            if code not in partitions:
+                print(f"Avertissement : Aucun produit trouvé pour le code '{code}'.")
+                partitions[code] = df.iloc[0:0]
+
+    print(f"{len(partitions)} export(s) à écrire...")
+    appels = {code: functools.partial(ecrire_export, partition, code, delta, liste_supprimes)
+              for code, partition in partitions.items()}
+    resultats = {}
+    for code, execution in executer_en_parallele(appels, max_workers, "export"):
+        if execution['succes']:
+            resultats[code] = len(partitions[code])
+        else:
+            print(f"Erreur : l'export du code '{code}' a échoué : {execution['erreur']}")
+            resultats[code] = None
+
+    ecrits = {code: lignes for code, lignes in resultats.items() if lignes is not None}
+    print(f"--- Succès --- {len(ecrits)} fichiers écrits dans '{REPERTOIRE_SORTIE}', "
+          f"{sum(ecrits.values())} lignes au total.")
+    if len(ecrits) < len(resultats):
+        print(f"--- Échecs --- {', '.join(sorted(set(resultats) - set(ecrits)))}")
+    return resultats
+
+
 # --- Exécution du script ---
 if __name__ == "__main__":
-    # Pour exécuter le script, il utilise la variable définie en haut
-    filtrer_par_code(CODE_A_FILTRER_DEFAUT)
\ No newline at end of file
+    # Sans argument, le script utilise la variable définie en haut.
+    # Avec des codes (ou "all"), tous les exports sont produits en une seule lecture.
+    parser = argparse.ArgumentParser(description="Produit les exports Odoo filtrés par 'Commodity Code'.")
+    parser.add_argument("codes", nargs="*", help="Codes à exporter, ou 'all' pour tous les codes.")
+    parser.add_argument("--flux", type=int, nargs="?", const=TAILLE_BLOC_DEFAUT, default=None,
+                        metavar="LIGNES", help="Lecture par blocs (mémoire bornée) pour un seul code.")
+    parser.add_argument("--delta", action="store_true",
+                        help="Écrire aussi deltas/parts_canada_<code>_delta.csv (produits nouveaux ou modifiés).")
+    parser.add_argument("--supprimes", action="store_true",
+                        help="Avec --delta, écrire aussi deltas/parts_canada_<code>_supprimes.csv.")
+    args = parser.parse_args()
+
+    options = {'delta': args.delta, 'liste_supprimes': args.supprimes}
+    if len(args.codes) <= 1 and args.codes != ["all"]:
+        filtrer_par_code(args.codes[0] if args.codes else CODE_A_FILTRER_DEFAUT, taille_bloc=args.flux, **options)
+    elif args.codes == ["all"]:
+        filtrer_par_codes("all", **options)
+    else:
+        filtrer_par_codes(args.codes, **options)
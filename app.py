@@ -1,25 +1,21 @@
-from flask import Flask, render_template, redirect, url_for, request
+from flask import Flask, Response, render_template, redirect, url_for, request, jsonify
 from telecharger_inventaire import download_inventory_file
 from combiner_features import lancer_combinaison_caracteristiques
 from download_and_save_catalog_details import download_and_save_catalog_files
-from get_folder_info import get_folder_content
+from get_folder_info import get_folder_content, invalider as invalider_dossiers
 from download_commodity_codes import download_commodity_codes_file
 from download_extended_inventory import download_extended_inventory_file
+from telecharger_quantites import rafraichir_quantites
+from stock_pieces import consulter_stocks
+from rafraichir_catalogues import CATALOGUES_A_GERER, rafraichir_tous_les_catalogues, rapport_en_succes
+from file_travaux import initialiser as initialiser_travaux, soumettre, statut, derniers_travaux, abonner_fin_travail
+from metriques import format_prometheus
 # --- L'importation de 'download_product_features' est SUPPRIMÉE ---
 
 app = Flask(__name__)
-
-# --- CONFIGURATION DE LA LISTE DES CATALOGUES ---
-CATALOGUES_A_GERER = [
-    "snow",
-    "fatbook",
-    "street",
-    "atv-utv",
-    "offroad",
-    "tire-and-service",
-    "oldbook"
-]
-# ------------------------------------------------
+initialiser_travaux()
+# Un travail terminé a pu réécrire des fichiers : l'état des dossiers est relu au prochain affichage
+abonner_fin_travail(lambda travail: invalider_dossiers())
 
 @app.route('/')
 def index():
@@ -47,60 +43,124 @@ def index():
         inventory_files=inventory_files,
         commodity_files=commodity_files,
         extended_inventory_files=extended_inventory_files,
-        catalog_data=catalog_data
+        catalog_data=catalog_data,
+        travaux=derniers_travaux(10)
     )
 
+def pipeline_inventaire():
+    """
+    Télécharge l'inventaire puis combine les caractéristiques.
+    """
+    download_inventory_file(endpoint="/inventory")
+    print("\n--- DÉBUT ÉTAPE 2: COMBINAISON DES CARACTÉRISTIQUES ---")
+    # Lancée même si l'inventaire est inchangé : des caractéristiques ont pu
+    # changer depuis. La combinaison ne refait rien si aucune source n'a changé.
+    lancer_combinaison_caracteristiques()
+    print("--- ÉTAPE 2 TERMINÉE: Combinaison réussie ---")
+
+def pipeline_rafraichissement_catalogues(max_workers=None):
+    """
+    Rafraîchit tous les catalogues ; échoue si au moins un catalogue a échoué.
+    """
+    rapport = rafraichir_tous_les_catalogues(CATALOGUES_A_GERER, max_workers=max_workers)
+    if not rapport_en_succes(rapport):
+        echecs = sorted({nom for nom, etapes in rapport.items() for res in etapes.values() if not res['succes']})
+        raise RuntimeError(f"Échec pour : {', '.join(echecs)}")
+
 @app.route('/lancer-telechargement-inventaire', methods=['POST'])
 def lancer_telechargement_inventaire():
     """
-    Route pour démarrer le téléchargement de l'inventaire.
+    Route pour démarrer le téléchargement de l'inventaire (en arrière-plan).
     """
-    try:
-        download_inventory_file(endpoint="/inventory")
-        print("\n--- DÉBUT ÉTAPE 2: COMBINAISON DES CARACTÉRISTIQUES ---")
-        # Appelle la fonction qui contient la logique de combinaison
-        lancer_combinaison_caracteristiques()
-        print("--- ÉTAPE 2 TERMINÉE: Combinaison réussie ---")
-    except Exception as e:
-        print(f"Une erreur est survenue lors du téléchargement de l'inventaire : {e}")
+    soumettre("inventaire", pipeline_inventaire)
+    return redirect(url_for('index'))
+
+@app.route('/lancer-rafraichissement-quantites', methods=['POST'])
+def lancer_rafraichissement_quantites():
+    """
+    Route pour rafraîchir uniquement les quantités en stock (en arrière-plan).
+    """
+    soumettre("quantites", rafraichir_quantites)
     return redirect(url_for('index'))
 
 @app.route('/lancer-telechargement-inventaire-etendu', methods=['POST'])
 def lancer_telechargement_inventaire_etendu():
     """
-    Route pour démarrer le téléchargement de l'inventaire étendu.
+    Route pour démarrer le téléchargement de l'inventaire étendu (en arrière-plan).
     """
-    try:
-        download_extended_inventory_file()
-    except Exception as e:
-        print(f"Une erreur est survenue lors du téléchargement de l'inventaire étendu : {e}")
+    soumettre("inventaire-etendu", download_extended_inventory_file)
     return redirect(url_for('index'))
 
 @app.route('/lancer-telechargement-commodity', methods=['POST'])
 def lancer_telechargement_commodity():
     """
-    Route pour démarrer le téléchargement des codes de commodité.
+    Route pour démarrer le téléchargement des codes de commodité (en arrière-plan).
     """
-    try:
-        download_commodity_codes_file()
-    except Exception as e:
-        print(f"Une erreur est survenue lors du téléchargement des codes de commodité : {e}")
+    soumettre("commodity", download_commodity_codes_file)
     return redirect(url_for('index'))
 
 @app.route('/lancer-telechargement-catalogue/<string:catalog_name>', methods=['POST'])
 def lancer_telechargement_catalogue(catalog_name):
     """
-    Route dynamique pour démarrer le téléchargement d'un catalogue.
+    Route dynamique pour démarrer le téléchargement d'un catalogue (en arrière-plan).
     """
     if catalog_name not in CATALOGUES_A_GERER:
         print(f"Erreur : Tentative de téléchargement pour un catalogue non géré : {catalog_name}")
         return redirect(url_for('index'))
     
-    try:
-        download_and_save_catalog_files(catalog_name=catalog_name)
-    except Exception as e:
-        print(f"Une erreur est survenue lors du téléchargement du catalogue '{catalog_name}': {e}")
+    soumettre(f"catalogue-{catalog_name}", download_and_save_catalog_files, catalog_name=catalog_name)
     return redirect(url_for('index'))
 
+@app.route('/lancer-rafraichissement-catalogues', methods=['POST'])
+def lancer_rafraichissement_catalogues():
+    """
+    Route pour rafraîchir tous les catalogues en parallèle (en arrière-plan).
+    """
+    max_workers = request.form.get('workers') or None
+    soumettre("catalogues", pipeline_rafraichissement_catalogues, max_workers=max_workers)
+    return redirect(url_for('index'))
+
+@app.route('/stock', methods=['GET', 'POST'])
+def stock_pieces():
+    """
+    Retourne le stock d'un panier de pièces (JSON).
+    GET /stock?parts=A,B,C ou POST {"parts": ["A", "B", "C"]}.
+    """
+    if request.method == 'POST':
+        corps = request.get_json(silent=True)
+        pieces = corps.get('parts') if isinstance(corps, dict) else None
+        if not isinstance(pieces, list) or not all(isinstance(p, str) and p.strip() for p in pieces):
+            return jsonify({'erreur': "'parts' doit être une liste de numéros de pièce non vides."}), 400
+        pieces = [p.strip() for p in pieces]
+    else:
+        pieces = [p.strip() for p in request.args.get('parts', '').split(',') if p.strip()]
+    if not pieces:
+        return jsonify({'erreur': "Aucune pièce demandée."}), 400
+    return jsonify(consulter_stocks(pieces))
+
+@app.route('/metrics')
+def metrics():
+    """
+    Expose les métriques des étapes du pipeline au format texte de Prometheus.
+    """
+    return Response(format_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs')
+def liste_travaux():
+    """
+    Retourne les travaux les plus récents (JSON).
+    """
+    return jsonify(derniers_travaux())
+
+@app.route('/jobs/<int:id_travail>')
+def statut_travail(id_travail):
+    """
+    Retourne l'état d'un travail : état, étape, octets, lignes, durée (JSON).
+    """
+    travail = statut(id_travail)
+    if travail is None:
+        return jsonify({'erreur': f"Travail #{id_travail} introuvable."}), 404
+    return jsonify(travail)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
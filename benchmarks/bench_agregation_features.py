@@ -0,0 +1,58 @@
+"""
+Compare l'agrégation des caractéristiques par groupby().apply(joindre_caracteristiques)
+(ancienne méthode) et agreger_caracteristiques (vectorisée) sur un jeu synthétique.
+
+Usage : python benchmarks/bench_agregation_features.py [--pieces 300000] [--lignes 1500000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from combiner_features import joindre_caracteristiques, agreger_caracteristiques
+from donnees_synthetiques import generer_features
+
+
+def preparer(df):
+    # Même préparation que lancer_combinaison_caracteristiques
+    df = df.drop_duplicates(subset=['Part Number', 'Feature Text'])
+    return df.dropna(subset=['Feature Text'])
+
+
+def ancienne_methode(df):
+    agg = df.groupby('Part Number')['Feature Text'].apply(joindre_caracteristiques).reset_index()
+    return agg.rename(columns={'Feature Text': 'Features'})
+
+
+def chronometrer(fonction, df, repetitions: int):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction(df)
+        durees.append(time.perf_counter() - debut)
+    return min(durees), resultat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pieces", type=int, default=300_000)
+    parser.add_argument("--lignes", type=int, default=1_500_000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Génération de {args.lignes} lignes pour {args.pieces} pièces...")
+    df = preparer(generer_features(args.pieces, args.lignes))
+
+    duree_ancienne, attendu = chronometrer(ancienne_methode, df, args.repetitions)
+    duree_nouvelle, obtenu = chronometrer(agreger_caracteristiques, df, args.repetitions)
+
+    # Même résultat une fois fusionné : les pièces sans texte valent None d'un côté, absentes de l'autre
+    attendu = attendu.dropna(subset=['Features']).reset_index(drop=True)
+    identique = attendu.astype(object).equals(obtenu.astype(object))
+
+    print(f"groupby().apply(joindre_caracteristiques) : {duree_ancienne:.2f} s")
+    print(f"agreger_caracteristiques (vectorisée)     : {duree_nouvelle:.2f} s")
+    print(f"Accélération : x{duree_ancienne / duree_nouvelle:.1f} — résultats identiques : {identique}")
+    sys.exit(0 if identique else 1)
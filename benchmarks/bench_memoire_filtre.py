@@ -0,0 +1,88 @@
+"""
+Compare la mémoire maximale de filtrer_par_code en lecture complète et en
+mode flux (par blocs) sur un fichier combiné synthétique.
+
+Usage : python benchmarks/bench_memoire_filtre.py [--lignes 1000000] [--taille-bloc 100000]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import Filtrer_CSV_par_Code as filtre
+from cache_colonnes import chemin_parquet
+from donnees_synthetiques import generer_fichier_combine
+from metriques import memoire_pic
+
+CODE_TEST = "1240"
+
+
+def mesurer(mode: str, fichier: str, taille_bloc: int):
+    """
+    Exécuté dans un processus enfant : lance un mode et retourne la durée
+    et la mémoire maximale du processus.
+    """
+    debut = time.perf_counter()
+    filtre.filtrer_par_code(CODE_TEST, source=fichier, taille_bloc=taille_bloc if mode == "flux" else None)
+    duree = time.perf_counter() - debut
+    return {'mode': mode, 'duree': duree, 'pic_octets': memoire_pic()}
+
+
+def lancer_enfant(mode: str, fichier: str, taille_bloc: int, dossier: str):
+    # Repartir sans cache Parquet : les deux modes lisent alors le même CSV
+    if os.path.exists(chemin_parquet(fichier)):
+        os.remove(chemin_parquet(fichier))
+    sortie = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--enfant", mode, "--fichier", fichier,
+         "--taille-bloc", str(taille_bloc)],
+        cwd=dossier, capture_output=True, text=True, check=True,
+    )
+    resultat = json.loads(sortie.stdout.strip().splitlines()[-1])
+    resultat['export'] = os.path.join(dossier, filtre.chemin_export(CODE_TEST))
+    return resultat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lignes", type=int, default=1_000_000)
+    parser.add_argument("--taille-bloc", type=int, default=filtre.TAILLE_BLOC_DEFAUT)
+    parser.add_argument("--enfant", choices=["complet", "flux"], help=argparse.SUPPRESS)
+    parser.add_argument("--fichier", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.enfant:
+        # Les messages du filtre partent sur stderr : stdout ne contient que le résultat
+        sys.stdout, stdout = sys.stderr, sys.stdout
+        resultat = mesurer(args.enfant, args.fichier, args.taille_bloc)
+        stdout.write(json.dumps(resultat) + "\n")
+        sys.exit(0)
+
+    dossier = tempfile.mkdtemp(prefix="bench_filtre_")
+    try:
+        fichier = os.path.join(dossier, "PartsCanada_with_Features.csv")
+        print(f"Génération de {args.lignes} lignes...")
+        generer_fichier_combine(fichier, args.lignes)
+        print(f"Fichier combiné : {os.path.getsize(fichier) / 2**20:.0f} Mo")
+
+        resultats = {}
+        for mode in ("complet", "flux"):
+            resultats[mode] = lancer_enfant(mode, fichier, args.taille_bloc, dossier)
+            with open(resultats[mode]['export'], 'rb') as f:
+                resultats[mode]['contenu'] = f.read()
+
+        identique = resultats['complet']['contenu'] == resultats['flux']['contenu']
+        for mode, r in resultats.items():
+            print(f"{mode:<8} : {r['duree']:6.2f} s, mémoire max {(r['pic_octets'] or 0) / 2**20:8.0f} Mo")
+        if resultats['complet']['pic_octets'] and resultats['flux']['pic_octets']:
+            print(f"Réduction mémoire : x{resultats['complet']['pic_octets'] / resultats['flux']['pic_octets']:.1f}")
+        print(f"Exports identiques : {identique}")
+        sys.exit(0 if identique else 1)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
@@ -0,0 +1,208 @@
+"""
+Mesure la durée et la mémoire maximale des étapes du pipeline
+(transformer_codes_commodite, lancer_combinaison_caracteristiques,
+filtrer_par_code) sur des jeux synthétiques de plusieurs tailles, enregistre
+les résultats et les compare à la mesure précédente.
+
+Usage : python benchmarks/bench_pipeline.py [--tailles 100000 1000000 8000000] [--etapes ...]
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+
+import pandas as pd
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from donnees_synthetiques import generer_jeu_complet
+from metriques import memoire_pic
+
+# Résultats de chaque exécution, un fichier JSON par exécution (à versionner)
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultats")
+
+TAILLES_DEFAUT = [100_000, 1_000_000]
+
+CODE_TEST = "1240"
+
+# Une étape plus lente ou plus gourmande de plus de 20 % que la mesure précédente est signalée
+SEUIL_REGRESSION = 1.20
+
+# En dessous de cette durée (secondes), les écarts relèvent du bruit de mesure
+DUREE_MINIMALE_COMPAREE = 1.0
+
+
+def _transformer_codes():
+    from transform_commodity import transformer_codes_commodite
+    transformer_codes_commodite()
+
+
+def _combiner():
+    from combiner_features import lancer_combinaison_caracteristiques
+    lancer_combinaison_caracteristiques(complet=True)
+
+
+def _filtrer():
+    from Filtrer_CSV_par_Code import filtrer_par_code
+    filtrer_par_code(CODE_TEST)
+
+
+# Étapes mesurées, dans l'ordre du pipeline (le filtre lit le fichier combiné)
+ETAPES = {
+    'transformer_codes_commodite': _transformer_codes,
+    'lancer_combinaison_caracteristiques': _combiner,
+    'filtrer_par_code': _filtrer,
+}
+
+
+def mesurer(nom_etape: str):
+    """
+    Exécuté dans un processus enfant, dans le dossier du jeu synthétique :
+    lance une étape et retourne sa durée et la mémoire maximale du processus.
+    """
+    debut = time.perf_counter()
+    ETAPES[nom_etape]()
+    return {'duree': round(time.perf_counter() - debut, 3), 'pic_octets': memoire_pic()}
+
+
+def lancer_enfant(nom_etape: str, dossier: str):
+    # Un processus par étape : la mémoire maximale n'est pas faussée par les étapes précédentes
+    sortie = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--enfant", nom_etape],
+        cwd=dossier, capture_output=True, text=True,
+    )
+    if sortie.returncode != 0:
+        raise RuntimeError(f"L'étape '{nom_etape}' a échoué :\n{sortie.stderr[-2000:]}")
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def version_du_code():
+    """
+    Commit courant du dépôt (suivi de '+' si l'arbre contient des modifications), ou None.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RACINE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        modifie = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RACINE,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+" if modifie else "")
+
+
+def environnement():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plateforme': platform.platform(),
+        'processeurs': os.cpu_count(),
+    }
+
+
+def derniers_resultats():
+    """
+    Retourne les résultats enregistrés les plus récents, ou None.
+    """
+    fichiers = sorted(glob.glob(os.path.join(DOSSIER_RESULTATS, "*.json")))
+    if not fichiers:
+        return None
+    with open(fichiers[-1], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def enregistrer(resultats: dict):
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    horodatage = resultats['date'].replace(':', '').replace('-', '')
+    chemin = os.path.join(DOSSIER_RESULTATS, f"{horodatage}_{resultats['version'] or 'inconnue'}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    return chemin
+
+
+def comparer(resultats: dict, precedents: dict):
+    """
+    Affiche les écarts avec les résultats précédents pour les mêmes (étape, taille).
+
+    Returns:
+        list: Les (étape, taille, mesure, rapport) au-delà de SEUIL_REGRESSION.
+    """
+    anciennes = {(m['etape'], m['taille']): m for m in precedents['mesures']}
+    regressions = []
+    print(f"\nComparaison avec {precedents['version']} ({precedents['date']}) :")
+    for m in resultats['mesures']:
+        ancienne = anciennes.get((m['etape'], m['taille']))
+        if ancienne is None:
+            continue
+        ecarts = []
+        for cle in ('duree', 'pic_octets'):
+            if not ancienne.get(cle) or not m.get(cle):
+                continue
+            rapport = m[cle] / ancienne[cle]
+            ecarts.append(f"{cle} x{rapport:.2f}")
+            if cle == 'duree' and ancienne[cle] < DUREE_MINIMALE_COMPAREE:
+                continue
+            if rapport > SEUIL_REGRESSION:
+                regressions.append((m['etape'], m['taille'], cle, rapport))
+        print(f"  {m['etape']:<36} {m['taille']:>9} : {', '.join(ecarts)}")
+    for nom_etape, taille, cle, rapport in regressions:
+        print(f"RÉGRESSION : {nom_etape} ({taille} lignes), {cle} x{rapport:.2f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tailles", type=int, nargs="+", default=TAILLES_DEFAUT)
+    parser.add_argument("--etapes", nargs="+", choices=list(ETAPES), default=list(ETAPES))
+    parser.add_argument("--sans-enregistrement", action="store_true",
+                        help="Ne pas enregistrer les résultats dans benchmarks/resultats.")
+    parser.add_argument("--enfant", choices=list(ETAPES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.enfant:
+        # Les messages du pipeline partent sur stderr : stdout ne contient que le résultat
+        sys.stdout, stdout = sys.stderr, sys.stdout
+        resultat = mesurer(args.enfant)
+        stdout.write(json.dumps(resultat) + "\n")
+        sys.exit(0)
+
+    # Le filtre lit le fichier combiné : la combinaison doit le précéder
+    etapes = [nom for nom in ETAPES if nom in args.etapes]
+    if 'filtrer_par_code' in etapes and 'lancer_combinaison_caracteristiques' not in etapes:
+        etapes.insert(etapes.index('filtrer_par_code'), 'lancer_combinaison_caracteristiques')
+
+    resultats = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'version': version_du_code(),
+        'environnement': environnement(),
+        'mesures': [],
+    }
+    for taille in sorted(args.tailles):
+        dossier = tempfile.mkdtemp(prefix="bench_pipeline_")
+        try:
+            print(f"Génération d'un jeu de {taille} pièces...")
+            debut = time.perf_counter()
+            generer_jeu_complet(dossier, taille)
+            print(f"  généré en {time.perf_counter() - debut:.1f} s")
+
+            for nom_etape in etapes:
+                mesure = lancer_enfant(nom_etape, dossier)
+                mesure.update(etape=nom_etape, taille=taille)
+                resultats['mesures'].append(mesure)
+                print(f"  {nom_etape:<36} : {mesure['duree']:8.2f} s, "
+                      f"mémoire max {(mesure['pic_octets'] or 0) / 2**20:7.0f} Mo")
+        finally:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    precedents = derniers_resultats()
+    if not args.sans_enregistrement:
+        print(f"\nRésultats enregistrés : {enregistrer(resultats)}")
+    if precedents is not None:
+        comparer(resultats, precedents)
@@ -0,0 +1,77 @@
+"""
+Mesure le débit du moteur de téléchargement contre l'API simulée : plusieurs
+téléchargements simultanés d'une même archive, sous les conditions réseau
+choisies (latence, débit, coupures, 429).
+
+Usage : python benchmarks/bench_telechargement.py [--lignes 200000] [--concurrence 1 4 8]
+            [--debit 5000000] [--coupures 0.2] [--taux-429 0.05]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from serveur_api_simule import demarrer_serveur, arreter_serveur, ajouter_options_conditions, conditions_depuis
+from moteur_telechargement import telecharger_fichier, desactiver_progression
+
+ENDPOINT_TEST = "/inventory"
+
+
+def un_telechargement(url: str, destination: str):
+    desactiver_progression()
+    try:
+        stats = telecharger_fichier(url, destination, headers={"Authorization": "Bearer test"})
+        return {'octets': stats['taille'], 'erreur': None}
+    except requests.exceptions.RequestException as e:
+        statut = getattr(e.response, 'status_code', None)
+        return {'octets': 0, 'erreur': f"HTTP {statut}" if statut else type(e).__name__}
+
+
+def mesurer(url: str, concurrence: int, repetitions: int, dossier: str):
+    """
+    Lance concurrence x repetitions téléchargements (concurrence à la fois).
+    """
+    destinations = [os.path.join(dossier, f"telechargement_{i}.zip") for i in range(concurrence * repetitions)]
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        resultats = list(executor.map(lambda d: un_telechargement(url, d), destinations))
+    duree = time.perf_counter() - debut
+    for destination in destinations:
+        for chemin in (destination, destination + ".etat.json"):
+            if os.path.exists(chemin):
+                os.remove(chemin)
+    octets = sum(r['octets'] for r in resultats)
+    erreurs = [r['erreur'] for r in resultats if r['erreur']]
+    return {'duree': duree, 'octets': octets, 'debit': octets / duree, 'erreurs': erreurs}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lignes", type=int, default=200_000, help="Pièces de l'inventaire simulé.")
+    parser.add_argument("--concurrence", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repetitions", type=int, default=2, help="Téléchargements par thread.")
+    ajouter_options_conditions(parser)
+    args = parser.parse_args()
+
+    serveur = demarrer_serveur(nb_lignes=args.lignes, conditions=conditions_depuis(args))
+    dossier = tempfile.mkdtemp(prefix="bench_telechargement_")
+    try:
+        archive = serveur.jeu.archive("inventory.zip")
+        print(f"API simulée sur {serveur.url_base}, archive de {archive.taille / 2**20:.1f} Mo.")
+        for concurrence in args.concurrence:
+            r = mesurer(serveur.url_base + ENDPOINT_TEST, concurrence, args.repetitions, dossier)
+            print(f"concurrence {concurrence:>3} : {r['duree']:6.2f} s, {r['debit'] / 2**20:7.1f} Mo/s au total, "
+                  f"{len(r['erreurs'])} échec(s) {sorted(set(r['erreurs']))}")
+        print(f"Serveur : {serveur.stats['requetes']} requêtes, {serveur.stats['coupures']} coupures, "
+              f"{serveur.stats['reprises']} reprises, {serveur.stats['reponses_429']} réponses 429.")
+    finally:
+        arreter_serveur(serveur)
+        shutil.rmtree(dossier, ignore_errors=True)
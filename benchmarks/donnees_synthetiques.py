@@ -0,0 +1,176 @@
+"""
+Génère des données synthétiques réalistes pour les benchmarks : inventaire
+(PartsCanadaCSV_8374000.csv), fichiers de caractéristiques par catalogue
+(product_features_<catalogue>.csv) et codes de commodité (commodity_codes.csv).
+
+Usage : python benchmarks/donnees_synthetiques.py DOSSIER [--lignes 8000000]
+"""
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Lignes générées à la fois : la génération ne dépend pas de la mémoire disponible
+TAILLE_BLOC_GENERATION = 200_000
+
+# Catalogues simulés (un dossier CATALOGUES-<nom> chacun)
+CATALOGUES = ["snow", "street", "offroad", "fatbook", "helmet"]
+
+# Premier code de commodité : les codes vont de PREMIER_CODE à PREMIER_CODE + nb_codes - 1
+PREMIER_CODE = 1000
+
+MARQUES = np.array(['ACME', 'MOOSE', 'KIMPEX', 'ALL BALLS', 'EBC', 'NGK'], dtype=object)
+
+
+def piece(i):
+    """
+    Part Number synthétique de la i-ème pièce (même format dans tous les fichiers).
+    """
+    return f"{i:08d}"
+
+
+def _textes(nb: int, modele: str):
+    return np.array([modele.format(i=i, m=i % 97, f=i % 13) for i in range(nb)], dtype=object)
+
+
+def blocs_inventaire(nb_lignes: int, nb_codes: int = 400, graine: int = 0, taille_bloc: int = TAILLE_BLOC_GENERATION):
+    """
+    Génère l'inventaire par blocs (DataFrames), avec les colonnes et les
+    répartitions de l'inventaire étendu : codes et marques très répétés,
+    descriptions partagées entre pièces, prix et quantités parfois manquants.
+    """
+    rng = np.random.default_rng(graine)
+    codes = np.array([str(PREMIER_CODE + c) for c in range(nb_codes)], dtype=object)
+    textes = _textes(5000, "Texte descriptif {i} pour pièce de remplacement")
+    for debut in range(0, nb_lignes, taille_bloc):
+        n = min(taille_bloc, nb_lignes - debut)
+        prix = rng.uniform(1, 500, n).round(2)
+        prix[rng.random(n) < 0.01] = np.nan
+        yield pd.DataFrame({
+            'Part Number': [piece(i) for i in range(debut, debut + n)],
+            'Commodity Code': codes[rng.integers(0, len(codes), n)],
+            'Brand': MARQUES[rng.integers(0, len(MARQUES), n)],
+            'Manufacturer Part Number': [f"M-{i}" for i in rng.integers(0, 10**7, n)],
+            'Description EN': textes[rng.integers(0, len(textes), n)],
+            'Description FR': textes[rng.integers(0, len(textes), n)],
+            'Description Long EN': textes[rng.integers(0, len(textes), n)],
+            'Description Long FR': textes[rng.integers(0, len(textes), n)],
+            'MSRP Latest': prix,
+            'Dealer Discounted Price': (prix * rng.uniform(0.6, 0.9, n)).round(2),
+            'CAL Qty Available': rng.integers(0, 50, n),
+            'Lon Qty Available': rng.integers(0, 50, n),
+        })
+
+
+def generer_inventaire(chemin: str, nb_lignes: int, nb_codes: int = 400, graine: int = 0):
+    """
+    Écrit un PartsCanadaCSV_8374000.csv synthétique.
+    """
+    with open(chemin, 'w', encoding='utf-8', newline='') as f:
+        for i, bloc in enumerate(blocs_inventaire(nb_lignes, nb_codes, graine)):
+            bloc.to_csv(f, index=False, header=(i == 0))
+
+
+def generer_fichier_combine(chemin: str, nb_lignes: int, nb_codes: int = 400, graine: int = 0):
+    """
+    Écrit un PartsCanada_with_Features.csv synthétique (inventaire + Features).
+    """
+    rng = np.random.default_rng(graine + 1)
+    textes = _textes(5000, "Caractéristique {i} : compatible modèle {m}")
+    with open(chemin, 'w', encoding='utf-8', newline='') as f:
+        for i, bloc in enumerate(blocs_inventaire(nb_lignes, nb_codes, graine)):
+            bloc['Features'] = textes[rng.integers(0, len(textes), len(bloc))]
+            bloc.to_csv(f, index=False, header=(i == 0))
+
+
+def generer_features(nb_pieces: int, nb_lignes: int, graine: int = 0):
+    """
+    Génère un jeu de 'product features' en mémoire : pièces tirées parmi
+    nb_pieces, textes répétés entre pièces, doublons, textes vides ou manquants.
+    """
+    rng = np.random.default_rng(graine)
+    vocabulaire = np.concatenate([
+        _textes(20000, "Caractéristique {i} : compatible modèle {m}, finition {f}"),
+        np.array(['', ' ', None], dtype=object),
+    ])
+    df = pd.DataFrame({
+        'Part Number': [piece(i) for i in rng.integers(0, nb_pieces, nb_lignes)],
+        'Feature Text': vocabulaire[rng.integers(0, len(vocabulaire), nb_lignes)],
+    })
+    # Environ 5 % de doublons exacts, comme dans les fichiers téléchargés
+    return pd.concat([df, df.sample(frac=0.05, random_state=graine)], ignore_index=True)
+
+
+def generer_features_catalogues(dossier: str, nb_pieces: int, lignes_par_piece: float = 1.5,
+                                catalogues=CATALOGUES, graine: int = 0):
+    """
+    Écrit un CATALOGUES-<nom>/product_features_<nom>.csv par catalogue.
+    Une même pièce peut figurer dans plusieurs catalogues avec les mêmes textes.
+
+    Returns:
+        list: Les chemins des fichiers écrits.
+    """
+    chemins = []
+    nb_lignes = int(nb_pieces * lignes_par_piece / len(catalogues))
+    for numero, nom in enumerate(catalogues):
+        sous_dossier = os.path.join(dossier, f"CATALOGUES-{nom}")
+        os.makedirs(sous_dossier, exist_ok=True)
+        chemin = os.path.join(sous_dossier, f"product_features_{nom}.csv")
+        with open(chemin, 'w', encoding='utf-8', newline='') as f:
+            for debut in range(0, nb_lignes, TAILLE_BLOC_GENERATION):
+                n = min(TAILLE_BLOC_GENERATION, nb_lignes - debut)
+                bloc = generer_features(nb_pieces, n, graine=graine + numero * 1000 + debut)
+                bloc.to_csv(f, index=False, header=(debut == 0))
+        chemins.append(chemin)
+    return chemins
+
+
+def generer_codes_commodite(chemin: str, nb_codes: int = 400, graine: int = 0):
+    """
+    Écrit un commodity_codes.csv synthétique (parent/enfant sur deux chiffres
+    chacun) couvrant les codes de l'inventaire, avec quelques lignes sans code
+    (reprises telles quelles) ou de plus de 4 colonnes (ignorées par transform_commodity).
+    """
+    rng = np.random.default_rng(graine)
+    lignes = ["Parent Code,Parent Description,Child Code,Child Description"]
+    for c in range(nb_codes):
+        code = str(PREMIER_CODE + c)
+        parent, enfant = code[:-2], code[-2:]
+        lignes.append(f"{parent},Famille {parent},{enfant},Sous-famille {code}")
+        if rng.random() < 0.01:
+            lignes.append(",,,")
+        if rng.random() < 0.01:
+            lignes.append(f"{parent},Famille {parent},{enfant},Sous-famille,en trop")
+    with open(chemin, 'w', encoding='utf-8', newline='') as f:
+        f.write("\r\n".join(lignes) + "\r\n")
+
+
+def generer_jeu_complet(dossier: str, nb_lignes: int, graine: int = 0):
+    """
+    Écrit dans `dossier` l'arborescence attendue par le pipeline :
+    INVENTAIRE-PARTS-CANADA/, CATALOGUES-*/ et COMMODITY-CODES/.
+    Le nombre de codes de commodité suit la taille de l'inventaire (400 à 9000).
+    """
+    nb_codes = min(9000, max(400, nb_lignes // 1000))
+    os.makedirs(os.path.join(dossier, "INVENTAIRE-PARTS-CANADA"), exist_ok=True)
+    os.makedirs(os.path.join(dossier, "COMMODITY-CODES"), exist_ok=True)
+    generer_inventaire(os.path.join(dossier, "INVENTAIRE-PARTS-CANADA", "PartsCanadaCSV_8374000.csv"),
+                       nb_lignes, nb_codes, graine)
+    generer_features_catalogues(dossier, nb_lignes, graine=graine)
+    generer_codes_commodite(os.path.join(dossier, "COMMODITY-CODES", "commodity_codes.csv"), nb_codes, graine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dossier")
+    parser.add_argument("--lignes", type=int, default=8_000_000)
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Génération d'un jeu de {args.lignes} pièces dans '{args.dossier}'...")
+    generer_jeu_complet(args.dossier, args.lignes, args.graine)
+    for racine, _, fichiers in sorted(os.walk(args.dossier)):
+        for nom in sorted(fichiers):
+            chemin = os.path.join(racine, nom)
+            print(f"  {chemin} : {os.path.getsize(chemin) / 2**20:.1f} Mo")
@@ -0,0 +1,515 @@
+"""
+Serveur local qui simule l'API Parts Canada d'après openapi.json, pour tester
+et mesurer les téléchargeurs sans accès au vrai service. Les archives ZIP sont
+générées à partir de données synthétiques ; latence, débit, coupures de
+connexion et réponses 429 sont réglables.
+
+Usage : python benchmarks/serveur_api_simule.py [--port 8800] [--lignes 100000]
+            [--latence 0.2] [--debit 5000000] [--coupures 0.1] [--taux-429 0.05]
+
+puis : API_BASE_URL=http://127.0.0.1:8800/api/v2 PARTS_CANADA_API_TOKEN=test python telecharger_inventaire.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import zipfile
+import argparse
+import datetime
+import tempfile
+import threading
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from donnees_synthetiques import (generer_inventaire, generer_features_catalogues, generer_codes_commodite,
+                                  blocs_inventaire)
+
+FICHIER_OPENAPI = os.path.join(RACINE, "openapi.json")
+
+# Préfixe des archives de catalogue (l'API renvoie un lien de téléchargement externe)
+PREFIXE_ARCHIVES = "/archives/"
+
+# Taille des blocs envoyés : petite pour que le plafond de débit reste régulier
+TAILLE_BLOC_ENVOI = 64 * 1024
+
+PAS_DE_MISE_A_JOUR = "No updates since your last download."
+
+
+class Conditions:
+    """
+    Conditions réseau simulées, tirées de façon reproductible (graine).
+
+    Args:
+        latence: délai (s) avant chaque réponse, plus une gigue aléatoire de 0 à `gigue` s.
+        debit: plafond en octets/s par connexion (None : illimité).
+        taux_coupures: probabilité qu'un corps de réponse soit coupé en cours d'envoi.
+        taux_429: probabilité de répondre 429 Too Many Requests.
+        quota, periode: au plus `quota` requêtes par opération et par `periode` s (429 au-delà).
+        retry_after: valeur de l'en-tête Retry-After des réponses 429 (s).
+    """
+
+    def __init__(self, latence=0.0, gigue=0.0, debit=None, taux_coupures=0.0, taux_429=0.0,
+                 quota=None, periode=24 * 3600, retry_after=1, graine=0):
+        self.latence = latence
+        self.gigue = gigue
+        self.debit = debit
+        self.taux_coupures = taux_coupures
+        self.taux_429 = taux_429
+        self.quota = quota
+        self.periode = periode
+        self.retry_after = retry_after
+        self._aleatoire = random.Random(graine)
+        self._verrou = threading.Lock()
+        self._appels = {}  # opération -> instants des requêtes acceptées
+
+    def tirer(self, probabilite: float):
+        if probabilite <= 0:
+            return False
+        with self._verrou:
+            return self._aleatoire.random() < probabilite
+
+    def uniforme(self, a: float, b: float):
+        with self._verrou:
+            return self._aleatoire.uniform(a, b)
+
+    def quota_depasse(self, operation: str):
+        if self.quota is None:
+            return False
+        maintenant = time.monotonic()
+        with self._verrou:
+            appels = [t for t in self._appels.get(operation, []) if maintenant - t < self.periode]
+            depasse = len(appels) >= self.quota
+            if not depasse:
+                appels.append(maintenant)
+            self._appels[operation] = appels
+            return depasse
+
+
+def charger_routes(chemin_openapi: str = FICHIER_OPENAPI):
+    """
+    Lit openapi.json et retourne le préfixe des URL ("/api/v2") et la liste des
+    routes (expression régulière, operationId, valeurs permises par paramètre).
+    """
+    with open(chemin_openapi, 'r', encoding='utf-8') as f:
+        specification = json.load(f)
+    prefixe = urlsplit(specification['servers'][0]['url']).path.rstrip('/')
+
+    routes = []
+    for chemin, operations in specification['paths'].items():
+        operation = operations.get('get')
+        if operation is None:
+            continue
+        motif = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(chemin))
+        enums = {p['name']: p['schema']['enum'] for p in operation.get('parameters', [])
+                 if p.get('in') == 'path' and 'enum' in p.get('schema', {})}
+        routes.append((re.compile(f"^{motif}$"), operation['operationId'], enums))
+    return prefixe, routes
+
+
+def catalogues_de_l_api(chemin_openapi: str = FICHIER_OPENAPI):
+    """
+    Noms de catalogue acceptés par /products/features/{catalogue}/download.
+    """
+    _, routes = charger_routes(chemin_openapi)
+    for _, operation, enums in routes:
+        if operation == 'product-features-download':
+            return enums['catalogue']
+    return []
+
+
+class Archive:
+    """
+    Une archive ZIP générée sur disque, avec ses validateurs HTTP.
+    """
+
+    def __init__(self, chemin: str, date: float):
+        self.chemin = chemin
+        self.taille = os.path.getsize(chemin)
+        hacheur = hashlib.sha256()
+        with open(chemin, 'rb') as f:
+            for bloc in iter(lambda: f.read(TAILLE_BLOC_ENVOI), b''):
+                hacheur.update(bloc)
+        self.etag = f'"{hacheur.hexdigest()[:32]}"'
+        self.last_modified = formatdate(date, usegmt=True)
+
+
+class JeuSimule:
+    """
+    Les archives servies par le serveur, générées à la première demande puis
+    gardées dans `dossier` : inventaire, quantités, codes de commodité,
+    caractéristiques et pièces de chaque catalogue.
+    """
+
+    def __init__(self, dossier: str, nb_lignes: int, catalogues, graine: int = 0):
+        self.dossier = dossier
+        self.nb_lignes = nb_lignes
+        self.catalogues = list(catalogues)
+        self.graine = graine
+        self.date = time.time()
+        self.nb_codes = min(9000, max(400, nb_lignes // 1000))
+        self._archives = {}
+        self._verrou = threading.Lock()
+
+    def _zipper(self, nom_archive: str, ecrire_membres):
+        travail = os.path.join(self.dossier, nom_archive + ".d")
+        os.makedirs(travail, exist_ok=True)
+        ecrire_membres(travail)
+        chemin = os.path.join(self.dossier, nom_archive)
+        with zipfile.ZipFile(chemin, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for nom in sorted(os.listdir(travail)):
+                zf.write(os.path.join(travail, nom), nom)
+        shutil.rmtree(travail)
+        return Archive(chemin, self.date)
+
+    def _generer(self, nom: str):
+        catalogue = re.sub(r"^(features|catalogue)_|\.zip$", "", nom)
+        if nom.startswith(("features_", "catalogue_")) and catalogue not in self.catalogues:
+            raise KeyError(nom)
+        if nom == "inventory.zip":
+            return self._zipper(nom, lambda d: generer_inventaire(
+                os.path.join(d, "PartsCanadaCSV_8374000.csv"), self.nb_lignes, self.nb_codes, self.graine))
+        if nom == "inventory_extended.zip":
+            return self._zipper(nom, lambda d: generer_inventaire(
+                os.path.join(d, "PartsCanadaExtendedCSV.csv"), self.nb_lignes, self.nb_codes, self.graine))
+        if nom == "quantities.zip":
+            return self._zipper(nom, self._ecrire_quantites)
+        if nom == "commodity_codes.zip":
+            return self._zipper(nom, lambda d: generer_codes_commodite(
+                os.path.join(d, "commodity_codes.csv"), self.nb_codes, self.graine))
+        if nom.startswith("features_"):
+            return self._zipper(nom, lambda d: self._ecrire_features(d, catalogue))
+        if nom.startswith("catalogue_"):
+            return self._zipper(nom, lambda d: generer_inventaire(
+                os.path.join(d, f"{catalogue}.csv"), max(1, self.nb_lignes // len(self.catalogues)),
+                self.nb_codes, self.graine + self.catalogues.index(catalogue) + 1))
+        raise KeyError(nom)
+
+    def _ecrire_quantites(self, dossier: str):
+        with open(os.path.join(dossier, "quantities.csv"), 'w', encoding='utf-8', newline='') as f:
+            for i, bloc in enumerate(blocs_inventaire(self.nb_lignes, self.nb_codes, self.graine + 7)):
+                bloc[['Part Number', 'CAL Qty Available', 'Lon Qty Available']].to_csv(
+                    f, index=False, header=(i == 0))
+
+    def _ecrire_features(self, dossier: str, catalogue: str):
+        numero = self.catalogues.index(catalogue)
+        source, = generer_features_catalogues(dossier, self.nb_lignes, catalogues=[catalogue],
+                                              graine=self.graine + numero)
+        os.replace(source, os.path.join(dossier, os.path.basename(source)))
+        os.rmdir(os.path.dirname(source))
+
+    def archive(self, nom: str):
+        """
+        Retourne l'Archive `nom`, générée au premier appel.
+        """
+        with self._verrou:
+            if nom not in self._archives:
+                self._archives[nom] = self._generer(nom)
+            return self._archives[nom]
+
+    def catalogue(self, nom: str, url_base: str):
+        annee = datetime.date.fromtimestamp(self.date).year
+        return {
+            'name': nom,
+            'year': annee,
+            'title_en': nom.upper(),
+            'title_fr': nom.upper(),
+            'browse_en': f"https://www.partscanada.com/catalogue/{annee}/{nom}/en/",
+            'browse_fr': f"https://www.partscanada.com/catalogue/{annee}/{nom}/fr/",
+            'archive': f"{url_base}{PREFIXE_ARCHIVES}catalogue_{nom}.zip",
+        }
+
+
+class ServeurApiSimule(ThreadingHTTPServer):
+    """
+    Serveur HTTP (un thread par connexion, keep-alive) de l'API simulée.
+    """
+    daemon_threads = True
+
+    def __init__(self, adresse, jeu: JeuSimule, conditions: Conditions, verbeux: bool = False):
+        super().__init__(adresse, GestionnaireApi)
+        self.jeu = jeu
+        self.conditions = conditions
+        self.verbeux = verbeux
+        self.prefixe, self.routes = charger_routes()
+        self._verrou = threading.Lock()
+        self.stats = {'requetes': 0, 'reponses_429': 0, 'coupures': 0, 'reprises': 0, 'non_modifie': 0,
+                      'octets': 0, 'par_operation': {}}
+
+    @property
+    def url_racine(self):
+        hote, port = self.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    @property
+    def url_base(self):
+        return self.url_racine + self.prefixe
+
+    def compter(self, cle: str, valeur: int = 1):
+        with self._verrou:
+            self.stats[cle] += valeur
+
+    def compter_operation(self, operation: str):
+        with self._verrou:
+            self.stats['par_operation'][operation] = self.stats['par_operation'].get(operation, 0) + 1
+
+
+class GestionnaireApi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PartsCanadaSimule/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbeux:
+            super().log_message(format, *args)
+
+    # --- Réponses ---
+
+    def _repondre(self, statut: int, corps: bytes = b'', type_contenu: str = 'application/json', en_tetes=None):
+        self.send_response(statut)
+        self.send_header('Content-Type', type_contenu)
+        self.send_header('Content-Length', str(len(corps)))
+        for nom, valeur in (en_tetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _json(self, statut: int, donnees):
+        self._repondre(statut, json.dumps(donnees).encode('utf-8'))
+
+    def _erreur(self, statut: int, message: str, en_tetes=None):
+        self._repondre(statut, json.dumps({'message': message}).encode('utf-8'), en_tetes=en_tetes)
+
+    def _envoyer_archive(self, archive: Archive):
+        """
+        Envoie une archive en respectant les en-têtes conditionnels (If-None-Match,
+        If-Modified-Since), les reprises (Range / If-Range), le plafond de débit
+        et les coupures simulées.
+        """
+        if self.headers.get('If-None-Match') == archive.etag or \
+                self.headers.get('If-Modified-Since') == archive.last_modified:
+            self.server.compter('non_modifie')
+            self.send_response(304)
+            self.send_header('ETag', archive.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        debut, fin, statut = 0, archive.taille, 200
+        plage = re.match(r"bytes=(\d+)-$", self.headers.get('Range', ''))
+        if plage and self.headers.get('If-Range', archive.etag) in (archive.etag, archive.last_modified):
+            debut = int(plage.group(1))
+            if debut >= archive.taille:
+                self._repondre(416, en_tetes={'Content-Range': f"bytes */{archive.taille}"})
+                return
+            statut = 206
+            self.server.compter('reprises')
+
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(fin - debut))
+        self.send_header('ETag', archive.etag)
+        self.send_header('Last-Modified', archive.last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        if statut == 206:
+            self.send_header('Content-Range', f"bytes {debut}-{fin - 1}/{archive.taille}")
+        self.end_headers()
+
+        conditions = self.server.conditions
+        if conditions.tirer(conditions.taux_coupures):
+            # Coupure quelque part dans le corps : le client reçoit moins que Content-Length
+            fin = debut + int((fin - debut) * conditions.uniforme(0.05, 0.95))
+            self.server.compter('coupures')
+            self.close_connection = True
+
+        horloge = time.perf_counter()
+        envoye = 0
+        with open(archive.chemin, 'rb') as f:
+            f.seek(debut)
+            while debut + envoye < fin:
+                bloc = f.read(min(TAILLE_BLOC_ENVOI, fin - debut - envoye))
+                self.wfile.write(bloc)
+                envoye += len(bloc)
+                if conditions.debit:
+                    retard = envoye / conditions.debit - (time.perf_counter() - horloge)
+                    if retard > 0:
+                        time.sleep(retard)
+        self.server.compter('octets', envoye)
+
+    # --- Routage ---
+
+    def do_GET(self):
+        self.server.compter('requetes')
+        conditions = self.server.conditions
+        parties = urlsplit(self.path)
+        chemin = unquote(parties.path)
+        parametres = {cle: valeurs[-1] for cle, valeurs in parse_qs(parties.query).items()}
+
+        if conditions.latence or conditions.gigue:
+            time.sleep(conditions.latence + conditions.uniforme(0, conditions.gigue))
+
+        # Liens d'archive renvoyés par /catalogues/{name} (hors API : pas d'authentification)
+        if chemin.startswith(PREFIXE_ARCHIVES):
+            self._servir(lambda: self._envoyer_archive(self.server.jeu.archive(chemin[len(PREFIXE_ARCHIVES):])),
+                         'archive')
+            return
+
+        if not chemin.startswith(self.server.prefixe + '/'):
+            self._erreur(404, "Not found.")
+            return
+        chemin = chemin[len(self.server.prefixe):]
+        for motif, operation, enums in self.server.routes:
+            correspondance = motif.match(chemin)
+            if correspondance:
+                break
+        else:
+            self._erreur(404, "Not found.")
+            return
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._erreur(403, "Access to this endpoint is not available.")
+            return
+        valeurs = correspondance.groupdict()
+        for nom, permises in enums.items():
+            if valeurs[nom] not in permises:
+                self._erreur(404, f"Unknown {nom} '{valeurs[nom]}'.")
+                return
+        if conditions.tirer(conditions.taux_429) or conditions.quota_depasse(operation):
+            self.server.compter('reponses_429')
+            self._erreur(429, "Too Many Requests.", en_tetes={'Retry-After': str(conditions.retry_after)})
+            return
+
+        traitement = getattr(self, "_op_" + operation.replace('-', '_'), None)
+        if traitement is None:
+            self._erreur(404, f"'{operation}' n'est pas simulé.")
+            return
+        self._servir(lambda: traitement(parametres, **valeurs), operation)
+
+    def _servir(self, traitement, operation: str):
+        self.server.compter_operation(operation)
+        try:
+            traitement()
+        except KeyError:
+            self._erreur(404, "File is not available.")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    # --- Opérations (operationId de openapi.json) ---
+
+    def _op_catalogue_list(self, parametres):
+        self._json(200, [self.server.jeu.catalogue(nom, self.server.url_racine)
+                         for nom in self.server.jeu.catalogues])
+
+    def _op_catalogue_details(self, parametres, name):
+        if name not in self.server.jeu.catalogues:
+            raise KeyError(name)
+        self._json(200, self.server.jeu.catalogue(name, self.server.url_racine))
+
+    def _op_catalogue_parts(self, parametres, name):
+        self._envoyer_archive(self.server.jeu.archive(f"catalogue_{name}.zip"))
+
+    def _op_inventory_download(self, parametres):
+        self._envoyer_archive(self.server.jeu.archive("inventory.zip"))
+
+    def _op_inventory_extended_download(self, parametres):
+        self._envoyer_archive(self.server.jeu.archive("inventory_extended.zip"))
+
+    def _op_inventory_quantities_download(self, parametres):
+        self._envoyer_archive(self.server.jeu.archive("quantities.zip"))
+
+    def _op_product_commodity_codes_download(self, parametres):
+        self._envoyer_archive(self.server.jeu.archive("commodity_codes.zip"))
+
+    def _op_product_features_download(self, parametres, catalogue):
+        # Rien de nouveau depuis start_date : l'API répond par un message texte
+        debut = parametres.get('start_date')
+        if debut and debut >= datetime.date.fromtimestamp(self.server.jeu.date).isoformat():
+            self._repondre(200, PAS_DE_MISE_A_JOUR.encode('utf-8'), 'text/plain; charset=utf-8')
+            return
+        self._envoyer_archive(self.server.jeu.archive(f"features_{catalogue}.zip"))
+
+    def _op_inventory_stock(self, parametres, part_number):
+        pieces = [p for p in part_number.split(',') if p]
+        stocks = [{'part_number': p, 'quantity': int(hashlib.sha1(p.encode()).hexdigest(), 16) % 50}
+                  for p in pieces]
+        self._json(200, stocks[0] if len(stocks) == 1 else stocks)
+
+    def _op_image_download(self, parametres, part_number):
+        # Petite archive générée à la demande : une image (octets pseudo-aléatoires) par pièce
+        tampon = os.path.join(self.server.jeu.dossier, f"images_{threading.get_ident()}.zip")
+        with zipfile.ZipFile(tampon, 'w') as zf:
+            for piece in (p for p in part_number.split(',') if p):
+                zf.writestr(f"{piece}.jpg", random.Random(piece).randbytes(20_000))
+        try:
+            self._envoyer_archive(Archive(tampon, self.server.jeu.date))
+        finally:
+            os.remove(tampon)
+
+
+def demarrer_serveur(port: int = 0, nb_lignes: int = 100_000, conditions: Conditions = None,
+                     hote: str = "127.0.0.1", dossier: str = None, verbeux: bool = False):
+    """
+    Démarre le serveur simulé dans un thread et le retourne (voir url_base).
+    port=0 choisit un port libre. Arrêter avec arreter_serveur().
+    """
+    dossier = dossier or tempfile.mkdtemp(prefix="api_simulee_")
+    jeu = JeuSimule(dossier, nb_lignes, catalogues_de_l_api())
+    serveur = ServeurApiSimule((hote, port), jeu, conditions or Conditions(), verbeux)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def arreter_serveur(serveur: ServeurApiSimule, supprimer_donnees: bool = True):
+    serveur.shutdown()
+    serveur.server_close()
+    if supprimer_donnees:
+        shutil.rmtree(serveur.jeu.dossier, ignore_errors=True)
+
+
+def ajouter_options_conditions(parser: argparse.ArgumentParser):
+    """
+    Options de ligne de commande des conditions réseau (partagées avec les benchmarks).
+    """
+    parser.add_argument("--latence", type=float, default=0.0, help="Délai avant chaque réponse (s).")
+    parser.add_argument("--gigue", type=float, default=0.0, help="Délai aléatoire supplémentaire (s).")
+    parser.add_argument("--debit", type=float, default=None, help="Débit maximal par connexion (octets/s).")
+    parser.add_argument("--coupures", type=float, default=0.0, help="Probabilité de couper un téléchargement.")
+    parser.add_argument("--taux-429", type=float, default=0.0, help="Probabilité de répondre 429.")
+    parser.add_argument("--quota", type=int, default=None, help="Requêtes permises par opération et par période.")
+    parser.add_argument("--periode", type=float, default=24 * 3600, help="Période du quota (s).")
+    parser.add_argument("--retry-after", type=int, default=1, help="En-tête Retry-After des réponses 429 (s).")
+    parser.add_argument("--graine", type=int, default=0)
+
+
+def conditions_depuis(args):
+    return Conditions(latence=args.latence, gigue=args.gigue, debit=args.debit, taux_coupures=args.coupures,
+                      taux_429=args.taux_429, quota=args.quota, periode=args.periode,
+                      retry_after=args.retry_after, graine=args.graine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--lignes", type=int, default=100_000, help="Pièces de l'inventaire généré.")
+    parser.add_argument("--dossier", help="Dossier des archives générées (temporaire par défaut).")
+    parser.add_argument("--verbeux", action="store_true", help="Journaliser chaque requête.")
+    ajouter_options_conditions(parser)
+    args = parser.parse_args()
+
+    serveur = demarrer_serveur(args.port, args.lignes, conditions_depuis(args), args.hote,
+                               args.dossier, args.verbeux)
+    print(f"API simulée sur {serveur.url_base} (données dans '{serveur.jeu.dossier}').")
+    print(f"  export API_BASE_URL={serveur.url_base} PARTS_CANADA_API_TOKEN=test")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\nArrêt. Statistiques : {json.dumps(serveur.stats, ensure_ascii=False)}")
+        arreter_serveur(serveur, supprimer_donnees=args.dossier is None)
@@ -0,0 +1,172 @@
+import os
+import json
+
+import pandas as pd
+
+from sources_csv import lire_csv_source, ouvrir_source_csv, chemin_sur_disque, SEPARATEUR_MEMBRE
+from schema_inventaire import types_pour, VERSION_SCHEMA
+
+# pyarrow est optionnel : sans lui, les lectures se font directement dans le CSV
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Clé des métadonnées Parquet contenant l'empreinte du CSV source
+CLE_EMPREINTE = b'parts_canada_source'
+
+# Lignes par groupe du fichier Parquet : un groupe est décodé en entier à la
+# lecture par blocs, il borne donc la mémoire de lire_par_blocs
+TAILLE_GROUPE_LIGNES = 100_000
+
+
+def parquet_disponible():
+    """
+    Indique si le cache Parquet peut être utilisé (pyarrow installé).
+    """
+    return pq is not None
+
+
+def chemin_parquet(source: str):
+    """
+    Retourne le chemin du cache Parquet d'une source CSV, rangé à côté d'elle
+    (ex: "PartsCanada_with_Features.csv" -> "PartsCanada_with_Features.parquet").
+    """
+    chemin, _, membre = str(source).partition(SEPARATEUR_MEMBRE)
+    if membre:
+        chemin = os.path.join(os.path.dirname(chemin), os.path.basename(membre))
+    return os.path.splitext(chemin)[0] + ".parquet"
+
+
+def empreinte_source(source: str):
+    """
+    Empreinte légère du fichier source (taille + date de modification).
+    """
+    stats = os.stat(chemin_sur_disque(source))
+    return {'source': str(source), 'taille': stats.st_size, 'mtime_ns': stats.st_mtime_ns}
+
+
+def _empreinte_attendue(source: str):
+    # Le cache dépend aussi du schéma des types : un changement de schéma le reconstruit
+    return dict(empreinte_source(source), schema=VERSION_SCHEMA)
+
+
+def _empreinte_cache(chemin: str):
+    try:
+        metadonnees = pq.read_schema(chemin).metadata or {}
+        return json.loads(metadonnees.get(CLE_EMPREINTE, b'null'))
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+
+def cache_a_jour(source: str):
+    """
+    Indique si le cache Parquet existe et correspond au CSV source actuel.
+    """
+    if not parquet_disponible():
+        return False
+    chemin = chemin_parquet(source)
+    return os.path.exists(chemin) and _empreinte_cache(chemin) == _empreinte_attendue(source)
+
+
+def _types_pour(source: str, dtype=None):
+    """
+    Types de lecture du CSV : ceux du schéma de l'inventaire, sauf indication contraire.
+    """
+    with ouvrir_source_csv(source) as f:
+        entete = pd.read_csv(f, nrows=0).columns
+    return types_pour(entete, dtype)
+
+
+def ecrire_cache(df: pd.DataFrame, source: str):
+    """
+    Écrit le cache Parquet d'un DataFrame correspondant au CSV `source`
+    (par ex. juste après l'avoir écrit, pour éviter de le relire).
+    """
+    if not parquet_disponible():
+        return None
+    chemin = chemin_parquet(source)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadonnees = dict(table.schema.metadata or {})
+    metadonnees[CLE_EMPREINTE] = json.dumps(_empreinte_attendue(source)).encode()
+    table = table.replace_schema_metadata(metadonnees)
+
+    pq.write_table(table, chemin + ".tmp", row_group_size=TAILLE_GROUPE_LIGNES)
+    os.replace(chemin + ".tmp", chemin)
+    return chemin
+
+
+def convertir_en_parquet(source: str, dtype=None):
+    """
+    Convertit une fois un CSV en fichier Parquet typé (voir schema_inventaire).
+
+    Returns:
+        str: Le chemin du fichier Parquet, ou None si pyarrow n'est pas installé.
+    """
+    if not parquet_disponible():
+        return None
+    print(f"Conversion de '{source}' en Parquet...")
+    df = lire_csv_source(source, dtype=_types_pour(source, dtype))
+    chemin = ecrire_cache(df, source)
+    print(f"     Cache colonnaire écrit : '{chemin}'.")
+    return chemin
+
+
+def colonnes_disponibles(source: str):
+    """
+    Retourne la liste des colonnes de la source (schéma Parquet ou en-tête CSV).
+    """
+    if cache_a_jour(source):
+        return pq.read_schema(chemin_parquet(source)).names
+    with ouvrir_source_csv(source) as f:
+        return list(pd.read_csv(f, nrows=0).columns)
+
+
+def lire_colonnes(source: str, colonnes=None, dtype=None):
+    """
+    Lit uniquement les colonnes demandées d'une source CSV, via son cache
+    Parquet (reconstruit automatiquement si le CSV a changé). Sans pyarrow,
+    lit directement le CSV avec les mêmes types.
+
+    Args:
+        colonnes: colonnes à lire (None = toutes). Les colonnes absentes sont ignorées.
+    """
+    if colonnes is not None:
+        disponibles = colonnes_disponibles(source)
+        colonnes = [col for col in colonnes if col in disponibles]
+
+    if parquet_disponible():
+        if not cache_a_jour(source):
+            convertir_en_parquet(source, dtype=dtype)
+        return pd.read_parquet(chemin_parquet(source), columns=colonnes)
+
+    return lire_csv_source(source, usecols=colonnes, dtype=_types_pour(source, dtype))
+
+
+def lire_par_blocs(source: str, colonnes=None, dtype=None, taille_bloc: int = 100_000):
+    """
+    Lit une source par blocs de `taille_bloc` lignes, pour garder une mémoire
+    bornée quelle que soit la taille du fichier. Utilise le cache Parquet s'il
+    est déjà à jour (sans le reconstruire) et découpé en groupes de lignes
+    bornés, sinon lit le CSV directement.
+
+    Yields:
+        pd.DataFrame: un bloc de lignes limité aux colonnes demandées.
+    """
+    if colonnes is not None:
+        disponibles = colonnes_disponibles(source)
+        colonnes = [col for col in colonnes if col in disponibles]
+
+    if cache_a_jour(source):
+        fichier = pq.ParquetFile(chemin_parquet(source))
+        groupes = [fichier.metadata.row_group(i).num_rows for i in range(fichier.num_row_groups)]
+        # Un cache écrit avec des groupes plus grands (ancienne version) chargerait un groupe entier à la fois
+        if max(groupes, default=0) <= max(taille_bloc, TAILLE_GROUPE_LIGNES):
+            for lot in fichier.iter_batches(batch_size=taille_bloc, columns=colonnes):
+                yield lot.to_pandas()
+            return
+
+    with ouvrir_source_csv(source) as f:
+        yield from pd.read_csv(f, usecols=colonnes, dtype=_types_pour(source, dtype), chunksize=taille_bloc)
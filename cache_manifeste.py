@@ -0,0 +1,67 @@
+import os
+import re
+import json
+import datetime
+
+from sources_csv import chemin_sur_disque
+
+# Dossier où sont stockés les manifestes (un fichier JSON par endpoint)
+DOSSIER_CACHE = ".cache-telechargements"
+
+
+def chemin_manifeste(cle: str):
+    """
+    Retourne le chemin du manifeste associé à une clé d'endpoint.
+    """
+    nom = re.sub(r'[^A-Za-z0-9._-]+', '_', cle).strip('_')
+    return os.path.join(DOSSIER_CACHE, f"{nom}.json")
+
+
+def lire_manifeste(cle: str):
+    """
+    Lit le manifeste d'un endpoint. Retourne None s'il n'existe pas.
+    """
+    try:
+        with open(chemin_manifeste(cle), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ecrire_manifeste(cle: str, manifeste: dict):
+    """
+    Enregistre le manifeste d'un endpoint (écriture atomique).
+    """
+    os.makedirs(DOSSIER_CACHE, exist_ok=True)
+    manifeste = dict(manifeste, date=datetime.datetime.now().isoformat(timespec='seconds'))
+    chemin = chemin_manifeste(cle)
+    with open(chemin + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, indent=2, ensure_ascii=False)
+    os.replace(chemin + ".tmp", chemin)
+
+
+def fichiers_presents(manifeste, target_folder: str):
+    """
+    Vérifie que les fichiers extraits (ou l'archive conservée) lors du
+    dernier téléchargement existent encore.
+    """
+    if not manifeste or not manifeste.get('fichiers'):
+        return False
+    return all(
+        os.path.exists(os.path.join(target_folder, chemin_sur_disque(nom)))
+        for nom in manifeste['fichiers']
+    )
+
+
+def en_tetes_conditionnels(manifeste):
+    """
+    Construit les en-têtes If-None-Match / If-Modified-Since d'une requête conditionnelle.
+    """
+    headers = {}
+    if not manifeste:
+        return headers
+    if manifeste.get('etag'):
+        headers['If-None-Match'] = manifeste['etag']
+    if manifeste.get('last_modified'):
+        headers['If-Modified-Since'] = manifeste['last_modified']
+    return headers
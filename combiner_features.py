@@ -1,5 +1,28 @@
 import pandas as pd
 import os
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from sources_csv import trouver_source
+from cache_colonnes import lire_colonnes, ecrire_cache, empreinte_source
+from index_inventaire import construire_index
+from schema_inventaire import valider_entete, memoire_mo
+from file_travaux import signaler
+from metriques import etape
+from instantane_quantites import lire_instantane, appliquer_quantites
+
+# Tous les fichiers de caractéristiques téléchargés, un par catalogue
+MOTIF_FEATURES = os.path.join("CATALOGUES-*", "product_features_*.csv")
+
+# Résultat de la dernière agrégation (Features et empreinte par pièce) et état des sources.
+# Seule l'agrégation est incrémentale : quand une source change, toutes les sources
+# sont relues et hachées et le fichier combiné est réécrit en entier.
+FICHIER_AGREGATION = os.path.join("INVENTAIRE-PARTS-CANADA", "features_agregees.csv")
+FICHIER_ETAT = os.path.join("INVENTAIRE-PARTS-CANADA", ".etat_combinaison.json")
+
+# Nombre de processus de chargement (surchargeable via PARTS_CANADA_PROCESSUS)
+MAX_PROCESSUS_DEFAUT = os.cpu_count() or 1
 
 def joindre_caracteristiques(series_de_textes):
     """
@@ -12,65 +35,231 @@ def joindre_caracteristiques(series_de_textes):
         
     return '\n• ' + '\n• '.join(textes_propres)
 
-def lancer_combinaison_caracteristiques():
+def agreger_caracteristiques(df_features):
+    """
+    Version vectorisée de groupby(...).apply(joindre_caracteristiques) :
+    même résultat, sans appel Python par groupe. Les pièces sans texte
+    non vide sont absentes du résultat (elles restent vides après la fusion).
+
+    Returns:
+        DataFrame: colonnes 'Part Number' et 'Features'.
+    """
+    textes = df_features['Feature Text'].dropna().astype(str)
+    textes = textes[textes.str.strip() != '']
+    pieces = df_features.loc[textes.index, 'Part Number']
+
+    # La somme groupée concatène les chaînes en Cython, dans l'ordre d'origine
+    features = ('\n• ' + textes).groupby(pieces, sort=True).sum()
+    return features.rename('Features').rename_axis('Part Number').reset_index()
+
+def charger_features(fichier):
+    """
+    Charge et dédoublonne un fichier de caractéristiques.
+    Exécutée dans un processus séparé : seules les deux colonnes utiles sont renvoyées.
+    """
+    df = lire_colonnes(fichier, ['Part Number', 'Feature Text'])
+    df['Part Number'] = df['Part Number'].astype(str)
+    df = df.drop_duplicates(subset=['Part Number', 'Feature Text'])
+    return df.dropna(subset=['Feature Text'])
+
+def trouver_fichiers_features():
+    """
+    Retourne les fichiers product_features_*.csv de tous les dossiers CATALOGUES-*.
+    """
+    return sorted(trouver_source(fichier) for fichier in glob.glob(MOTIF_FEATURES))
+
+def charger_toutes_les_features(fichiers, max_processus=None):
+    """
+    Charge les fichiers de caractéristiques en parallèle (un processus par
+    fichier, au plus max_processus) et les fusionne en une seule table dédoublonnée.
+    """
+    max_processus = int(max_processus or os.getenv("PARTS_CANADA_PROCESSUS", MAX_PROCESSUS_DEFAUT))
+    max_processus = max(1, min(max_processus, len(fichiers)))
+
+    if max_processus == 1:
+        frames = [charger_features(fichier) for fichier in fichiers]
+    else:
+        with ProcessPoolExecutor(max_workers=max_processus) as executor:
+            frames = list(executor.map(charger_features, fichiers))
+
+    # Une même caractéristique peut figurer dans plusieurs catalogues
+    df_features_all = pd.concat(frames, ignore_index=True)
+    return df_features_all.drop_duplicates(subset=['Part Number', 'Feature Text'])
+
+def empreintes_par_piece(df_features):
+    """
+    Empreinte des caractéristiques de chaque pièce (calcul vectorisé) : elle
+    change si un texte est ajouté, retiré, modifié ou déplacé.
+
+    Returns:
+        Series: empreinte (uint64) indexée par 'Part Number'.
+    """
+    pieces = df_features['Part Number']
+    lignes = pd.DataFrame({
+        'Part Number': pieces,
+        'Feature Text': df_features['Feature Text'].astype(str),
+        'rang': pieces.groupby(pieces, sort=False).cumcount(),
+    })
+    empreintes = pd.util.hash_pandas_object(lignes, index=False, categorize=False)
+    # Somme modulo 2**64 des empreintes de lignes (rang compris)
+    return empreintes.groupby(pieces.to_numpy(), sort=True).sum().rename_axis('Part Number')
+
+def lire_etat():
+    try:
+        with open(FICHIER_ETAT, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def ecrire_etat(etat: dict):
+    with open(FICHIER_ETAT + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(etat, f, indent=2, ensure_ascii=False)
+    os.replace(FICHIER_ETAT + ".tmp", FICHIER_ETAT)
+
+def etat_des_sources(fichier_principal, fichiers_features):
+    """
+    Empreintes (taille, date) de l'inventaire et des fichiers de caractéristiques.
+    """
+    return {
+        'inventaire': empreinte_source(fichier_principal),
+        'features': [empreinte_source(fichier) for fichier in fichiers_features],
+    }
+
+def lire_agregation():
+    """
+    Retourne l'agrégation enregistrée (Part Number, empreinte, Features), ou None.
+    """
+    if not os.path.exists(FICHIER_AGREGATION):
+        return None
+    return lire_colonnes(FICHIER_AGREGATION, dtype={'empreinte': 'uint64'})
+
+def agreger_incrementalement(df_features_all, precedente=None):
+    """
+    Agrège les caractéristiques en ne recalculant que les pièces dont
+    l'empreinte a changé depuis l'agrégation `precedente`. Les empreintes
+    sont calculées sur toutes les lignes de `df_features_all` : seul le
+    regroupement des textes est évité pour les pièces inchangées.
+
+    Returns:
+        tuple: (DataFrame Part Number / empreinte / Features, nombre de pièces recalculées)
+    """
+    empreintes = empreintes_par_piece(df_features_all).rename('empreinte').reset_index()
+
+    if precedente is None:
+        a_recalculer = empreintes
+        conservees = empreintes.iloc[0:0].assign(Features=pd.Series(dtype=object))
+    else:
+        fusion = empreintes.merge(precedente, on='Part Number', how='left', suffixes=('', '_precedente'))
+        inchangees = fusion['empreinte'] == fusion['empreinte_precedente']
+        a_recalculer = empreintes[~inchangees.to_numpy()]
+        conservees = fusion.loc[inchangees, ['Part Number', 'empreinte', 'Features']]
+
+    lignes = df_features_all[df_features_all['Part Number'].isin(a_recalculer['Part Number'])]
+    recalculees = a_recalculer.merge(agreger_caracteristiques(lignes), on='Part Number', how='left')
+    agregation = pd.concat([conservees, recalculees], ignore_index=True)
+    return agregation, len(a_recalculer)
+
+def lancer_combinaison_caracteristiques(complet: bool = False):
     """
     Fonction principale pour la logique de combinaison des caractéristiques.
+
+    Args:
+        complet (bool): Réagréger toutes les pièces, même celles dont les
+            caractéristiques n'ont pas changé depuis la dernière combinaison.
+            Sinon, rien n'est refait si aucune source n'a changé ; dans le cas
+            contraire, tout est relu et réécrit et seule l'agrégation est incrémentale.
     """
     print("Début de la combinaison des caractéristiques...")
     
     # --- 1. Définir les noms de fichiers (codés en dur) ---
-    fichier_principal = r"INVENTAIRE-PARTS-CANADA\PartsCanadaCSV_8374000.csv"
-    fichier_snow = r"CATALOGUES-snow\product_features_snow.csv"
-    fichier_atv = r"CATALOGUES-atv-utv\product_features_atv-utv.csv"
-    fichier_sortie = r"INVENTAIRE-PARTS-CANADA\PartsCanada_with_Features.csv"
+    fichier_principal = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanadaCSV_8374000.csv")
+    fichier_sortie = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanada_with_Features.csv")
+
+    # Chaque CSV peut aussi être lu directement dans l'archive conservée (mode streaming)
+    fichier_principal = trouver_source(fichier_principal)
+    fichiers_features = trouver_fichiers_features()
 
     try:
-        # --- 2. Charger les fichiers CSV ---
-        print(f"Chargement de {fichier_principal}...")
-        df_parts = pd.read_csv(fichier_principal)
+        if not fichiers_features:
+            raise FileNotFoundError(2, "Aucun fichier de caractéristiques trouvé", MOTIF_FEATURES)
 
-        print(f"Chargement de {fichier_snow}...")
-        df_snow = pd.read_csv(fichier_snow)
+        # Sources identiques à la dernière combinaison : rien à refaire
+        etat = etat_des_sources(fichier_principal, fichiers_features)
+        if not complet and lire_etat() == dict(etat, sortie=empreinte_source(fichier_sortie)
+                                               if os.path.exists(fichier_sortie) else None):
+            print(f"Aucune source modifiée depuis la dernière combinaison : '{fichier_sortie}' est à jour.")
+            return
 
-        print(f"Chargement de {fichier_atv}...")
-        df_atv = pd.read_csv(fichier_atv)
-        
-        print("Fichiers chargés avec succès.")
+        # --- 2. Charger les fichiers CSV ---
+        signaler(etape="lecture CSV")
+        print(f"Chargement de {fichier_principal}...")
+        with etape("lecture_csv") as mesure:
+            df_parts = lire_colonnes(fichier_principal)
+            mesure.ajouter(lignes=len(df_parts))
 
-        # --- 3. S'assurer que la colonne 'Part Number' est de type texte (str) ---
-        print("Standardisation des types de données pour 'Part Number'...")
-        df_parts['Part Number'] = df_parts['Part Number'].astype(str)
-        df_snow['Part Number'] = df_snow['Part Number'].astype(str)
-        df_atv['Part Number'] = df_atv['Part Number'].astype(str)
+        # --- 3. Vérifier l'en-tête (les types viennent du schéma de l'inventaire) ---
+        valider_entete(df_parts.columns, nom=f"'{fichier_principal}'")
+        print(f"{len(df_parts)} pièces chargées ({memoire_mo(df_parts):.0f} Mo en mémoire).")
 
-        # --- 4. Combiner les deux fichiers de caractéristiques ---
-        print("Combinaison des fichiers de caractéristiques (snow et atv)...")
-        df_features_all = pd.concat([df_snow, df_atv])
+        # Quantités rafraîchies depuis le téléchargement de l'inventaire : elles ne sont pas perdues
+        quantites = lire_instantane(plus_recent_que=fichier_principal)
+        if quantites is not None:
+            lignes = appliquer_quantites(df_parts, quantites)
+            print(f"Quantités plus récentes que l'inventaire appliquées à {lignes} pièces.")
 
-        df_features_all = df_features_all.drop_duplicates(subset=['Part Number', 'Feature Text'])
-        df_features_all = df_features_all.dropna(subset=['Feature Text'])
+        # --- 4. Charger et combiner tous les fichiers de caractéristiques (en parallèle) ---
+        print(f"Chargement de {len(fichiers_features)} fichier(s) de caractéristiques :")
+        for fichier in fichiers_features:
+            print(f"  - {fichier}")
+        with etape("lecture_features") as mesure:
+            df_features_all = charger_toutes_les_features(fichiers_features)
+            mesure.ajouter(lignes=len(df_features_all))
+        print("Fichiers chargés avec succès.")
 
         # --- 5. Agréger les caractéristiques ---
+        signaler(etape="agrégation des caractéristiques")
         print("Agrégation des caractéristiques par 'Part Number'...")
         
-        features_agg = df_features_all.groupby('Part Number')['Feature Text'].apply(joindre_caracteristiques).reset_index()
-        features_agg.rename(columns={'Feature Text': 'Features'}, inplace=True)
+        with etape("agregation_features") as mesure:
+            precedente = None if complet else lire_agregation()
+            agregation, recalculees = agreger_incrementalement(df_features_all, precedente)
+            mesure.ajouter(lignes=recalculees)
+        features_agg = agregation.loc[agregation['Features'].notna(), ['Part Number', 'Features']]
         
-        print("Agrégation terminée.")
+        print(f"Agrégation terminée ({recalculees} pièce(s) recalculée(s) sur {len(agregation)}).")
 
         # --- 6. Fusionner le fichier principal avec les caractéristiques agrégées ---
+        signaler(etape="fusion")
         print(f"Fusion de {fichier_principal} avec les nouvelles caractéristiques...")
         
-        df_final = pd.merge(
-            df_parts,
-            features_agg,
-            on='Part Number',
-            how='left'
-        )
+        with etape("fusion") as mesure:
+            df_final = pd.merge(
+                df_parts,
+                features_agg,
+                on='Part Number',
+                how='left'
+            )
+            mesure.ajouter(lignes=len(df_final))
 
         # --- 7. Sauvegarder le fichier résultant ---
+        signaler(etape="écriture CSV", lignes=len(df_final))
         print(f"Sauvegarde du fichier final sous : {fichier_sortie}")
-        df_final.to_csv(fichier_sortie, index=False)
+        with etape("ecriture_csv") as mesure:
+            df_final.to_csv(fichier_sortie, index=False)
+            mesure.ajouter(octets=os.path.getsize(fichier_sortie), lignes=len(df_final))
+        # Le cache colonnaire est écrit depuis la mémoire : le filtre Odoo ne reparse pas le CSV
+        with etape("ecriture_parquet"):
+            ecrire_cache(df_final, fichier_sortie)
+        # Index Commodity Code / Part Number -> position des lignes dans le CSV
+        signaler(etape="index")
+        with etape("index") as mesure:
+            construire_index(fichier_sortie)
+            mesure.ajouter(lignes=len(df_final))
+
+        # Agrégation et état des sources, pour la prochaine combinaison
+        agregation.to_csv(FICHIER_AGREGATION, index=False)
+        ecrire_cache(agregation, FICHIER_AGREGATION)
+        ecrire_etat(dict(etat, sortie=empreinte_source(fichier_sortie)))
 
         print("\nOpération de combinaison terminée avec succès !")
         print(f"Le fichier '{fichier_sortie}' a été créé.")
@@ -94,9 +283,10 @@ def lancer_combinaison_caracteristiques():
 
 # Ce bloc permet de tester ce module spécifiquement
 if __name__ == "__main__":
+    import sys
     print("Test du module de combinaison en mode autonome...")
     try:
-        lancer_combinaison_caracteristiques()
+        lancer_combinaison_caracteristiques(complet="--complet" in sys.argv[1:])
         print("Test de combinaison réussi.")
     except Exception as e:
         print(f"Test de combinaison a échoué : {e}")
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Sous-dossier (dans le répertoire des exports) où sont gardées les empreintes du dernier export
+DOSSIER_EMPREINTES = ".empreintes"
+
+# Sous-dossier des fichiers delta et des suppressions : hors de portée des
+# motifs MICPARTSONLINE/parts_canada_*.csv qui désignent les exports complets
+DOSSIER_DELTAS = "deltas"
+
+# Clé d'une ligne dans l'import Odoo
+CLE_ODOO = 'Internal Reference'
+
+
+def chemin_empreintes(chemin_export: str):
+    """
+    Retourne le fichier des empreintes d'un export
+    (ex: MICPARTSONLINE/.empreintes/parts_canada_1240.csv).
+    """
+    dossier, nom = os.path.split(chemin_export)
+    return os.path.join(dossier, DOSSIER_EMPREINTES, nom)
+
+
+def chemin_delta(chemin_export: str):
+    """
+    Retourne le fichier des produits nouveaux ou modifiés
+    (ex: MICPARTSONLINE/deltas/parts_canada_1240_delta.csv).
+    """
+    dossier, nom = os.path.split(chemin_export)
+    return os.path.join(dossier, DOSSIER_DELTAS, os.path.splitext(nom)[0] + "_delta.csv")
+
+
+def chemin_supprimes(chemin_export: str):
+    """
+    Retourne le fichier des produits disparus depuis le dernier export
+    (ex: MICPARTSONLINE/deltas/parts_canada_1240_supprimes.csv).
+    """
+    dossier, nom = os.path.split(chemin_export)
+    return os.path.join(dossier, DOSSIER_DELTAS, os.path.splitext(nom)[0] + "_supprimes.csv")
+
+
+def calculer_empreintes(df_odoo: pd.DataFrame):
+    """
+    Empreinte 64 bits du contenu de chaque ligne (calcul vectorisé).
+    """
+    # Les prix sont comparés sous leur forme texte (celle écrite dans l'export) :
+    # l'empreinte ne dépend pas du type de flottant (float32 ou float64)
+    flottants = df_odoo.select_dtypes('floating').columns
+    if len(flottants):
+        df_odoo = df_odoo.astype({col: str for col in flottants})
+    # categorize=False : plus rapide sur les descriptions presque toutes distinctes, même résultat
+    return pd.util.hash_pandas_object(df_odoo, index=False, categorize=False).to_numpy()
+
+
+def lire_empreintes(chemin_export: str):
+    """
+    Retourne les couples (Internal Reference, empreinte) du dernier export,
+    ou None s'il n'y en a pas encore.
+    """
+    try:
+        df = pd.read_csv(chemin_empreintes(chemin_export), dtype={CLE_ODOO: str, 'empreinte': 'uint64'})
+    except FileNotFoundError:
+        return None
+    return pd.MultiIndex.from_arrays([df[CLE_ODOO], df['empreinte']])
+
+
+class ExportDelta:
+    """
+    Compare un export Odoo, ajouté bloc par bloc, aux empreintes de l'export
+    précédent : seules les lignes nouvelles ou modifiées sont écrites dans le
+    fichier delta. Les empreintes ne sont remplacées qu'à la fin (terminer).
+
+    S'utilise comme gestionnaire de contexte : si le bloc échoue avant
+    terminer(), le delta en cours est supprimé et les empreintes restent intactes.
+    """
+
+    def __init__(self, chemin_export: str, liste_supprimes: bool = False):
+        self.chemin_export = chemin_export
+        self.liste_supprimes = liste_supprimes
+        self.precedentes = lire_empreintes(chemin_export)
+        self.references = []
+        self.empreintes = []
+        self.lignes = 0
+        self.modifiees = 0
+
+        os.makedirs(os.path.dirname(chemin_empreintes(chemin_export)), exist_ok=True)
+        os.makedirs(os.path.dirname(chemin_delta(chemin_export)), exist_ok=True)
+        self._termine = False
+        self._sortie = open(chemin_delta(chemin_export) + ".tmp", 'w', encoding='utf-8', newline='')
+        self._entete_ecrit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._termine:
+            self.abandonner()
+        return False
+
+    def abandonner(self):
+        """
+        Ferme et supprime le delta en cours, sans toucher aux empreintes.
+        """
+        self._sortie.close()
+        if os.path.exists(self._sortie.name):
+            os.remove(self._sortie.name)
+
+    def ajouter(self, df_odoo: pd.DataFrame):
+        empreintes = calculer_empreintes(df_odoo)
+        references = df_odoo[CLE_ODOO].astype(str).to_numpy()
+        self.references.append(references)
+        self.empreintes.append(empreintes)
+        self.lignes += len(df_odoo)
+
+        if self.precedentes is None:
+            modifiees = df_odoo
+        else:
+            inchangees = pd.MultiIndex.from_arrays([references, empreintes]).isin(self.precedentes)
+            modifiees = df_odoo[~inchangees]
+
+        if not self._entete_ecrit or not modifiees.empty:
+            modifiees.to_csv(self._sortie, index=False, header=not self._entete_ecrit)
+            self._entete_ecrit = True
+        self.modifiees += len(modifiees)
+
+    def terminer(self):
+        """
+        Finalise le delta, la liste des suppressions (optionnelle) et les empreintes.
+
+        Returns:
+            dict: compteurs 'lignes', 'modifiees', 'supprimees', 'premier_export'.
+        """
+        self._sortie.close()
+        os.replace(chemin_delta(self.chemin_export) + ".tmp", chemin_delta(self.chemin_export))
+
+        references = np.concatenate(self.references) if self.references else np.array([], dtype=object)
+        empreintes = np.concatenate(self.empreintes) if self.empreintes else np.array([], dtype=np.uint64)
+        supprimees = 0
+        liste_ecrite = False
+        if self.precedentes is not None:
+            anciennes = self.precedentes.get_level_values(0).unique()
+            disparues = anciennes[~anciennes.isin(references)]
+            supprimees = len(disparues)
+            if self.liste_supprimes:
+                pd.DataFrame({CLE_ODOO: disparues}).to_csv(chemin_supprimes(self.chemin_export), index=False)
+                liste_ecrite = True
+        # Une liste laissée par une exécution précédente passerait pour celle de cet export
+        if not liste_ecrite and os.path.exists(chemin_supprimes(self.chemin_export)):
+            os.remove(chemin_supprimes(self.chemin_export))
+
+        chemin = chemin_empreintes(self.chemin_export)
+        pd.DataFrame({CLE_ODOO: references, 'empreinte': empreintes}).to_csv(chemin + ".tmp", index=False)
+        os.replace(chemin + ".tmp", chemin)
+        self._termine = True
+
+        return {'lignes': self.lignes, 'modifiees': self.modifiees, 'supprimees': supprimees,
+                'premier_export': self.precedentes is None}
@@ -1,111 +1,159 @@
 import requests
 import zipfile
 import os
+import json
+import shutil
+import datetime
+import pandas as pd
 from dotenv import load_dotenv
 
+from moteur_telechargement import configuration_api, telecharger_et_extraire_zip
+from sources_csv import lire_csv_source
+
 # Charger les variables d'environnement à partir du fichier .env
 load_dotenv()
 
-def download_product_features_file(catalog_name: str):
+# Date de départ d'une synchronisation complète
+DATE_SYNCHRO_COMPLETE = "2000-01-01"
+
+# Clé d'unicité d'une ligne du magasin local de features
+CLE_FEATURE = ['Part Number', 'Feature Text']
+
+def chemin_magasin(catalog_name: str):
     """
-    Télécharge le fichier ZIP des 'features' pour un catalogue spécifique
-    et l'extrait directement dans le dossier parent du catalogue.
+    Retourne le chemin du magasin local de features d'un catalogue
+    (c'est le fichier lu par combiner_features).
+    """
+    return os.path.join(f"CATALOGUES-{catalog_name}", f"product_features_{catalog_name}.csv")
+
+def chemin_watermark(catalog_name: str):
+    """
+    Retourne le chemin du fichier contenant la date de dernière synchronisation.
+    """
+    return os.path.join(f"CATALOGUES-{catalog_name}", ".synchro_features.json")
+
+def lire_watermark(catalog_name: str):
+    """
+    Retourne la date (AAAA-MM-JJ) de la dernière synchronisation réussie, ou None.
+    """
+    try:
+        with open(chemin_watermark(catalog_name), 'r', encoding='utf-8') as f:
+            return json.load(f).get('derniere_synchro')
+    except (OSError, ValueError):
+        return None
+
+def ecrire_watermark(catalog_name: str, date_synchro: str):
+    """
+    Enregistre la date de la dernière synchronisation réussie.
+    """
+    with open(chemin_watermark(catalog_name), 'w', encoding='utf-8') as f:
+        json.dump({'derniere_synchro': date_synchro}, f)
+
+def fusionner_delta(catalog_name: str, sources_delta, complet: bool):
+    """
+    Fusionne les CSV téléchargés dans le magasin local, clé (Part Number, Feature Text).
+    En synchronisation complète, le magasin est remplacé.
+
+    Returns:
+        int: Le nombre de lignes du magasin après fusion.
+    """
+    magasin = chemin_magasin(catalog_name)
+    frames = [lire_csv_source(source, dtype={'Part Number': str}) for source in sources_delta]
+    if not complet and os.path.exists(magasin):
+        # Les lignes existantes d'abord : keep='last' garde la version du delta
+        frames.insert(0, pd.read_csv(magasin, dtype={'Part Number': str}))
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=CLE_FEATURE, keep='last')
+
+    # Écriture atomique pour ne jamais laisser un magasin à moitié écrit
+    df.to_csv(magasin + ".tmp", index=False)
+    os.replace(magasin + ".tmp", magasin)
+    return len(df)
+
+def reponse_est_un_zip(response):
+    """
+    Vérifie que le serveur renvoie bien une archive. Sinon (par ex.
+    "No updates since your last download."), affiche le message reçu.
+    """
+    content_type = response.headers.get('content-type', '').lower()
+    if 'application/octet-stream' in content_type or 'application/zip' in content_type:
+        return True
+
+    response_text = response.text
+    print(f"\n     Info: Le serveur a répondu (pas un fichier ZIP) : {response_text}")
+    try:
+        json_response = response.json()
+        print(f"     Message JSON reçu: {json_response}")
+    except requests.exceptions.JSONDecodeError:
+        pass
+    return False
+
+def download_product_features_file(catalog_name: str, complet: bool = False):
+    """
+    Télécharge les 'features' d'un catalogue modifiées depuis la dernière
+    synchronisation et les fusionne dans le magasin local du catalogue.
 
     Args:
         catalog_name (str): Le nom du catalogue (ex: "snow", "fatbook").
+        complet (bool): Forcer une resynchronisation complète (start_date=2000-01-01).
+
+    Returns:
+        str: Le dossier cible, ou None s'il n'y avait aucune mise à jour.
     """
     # Récupérer les configurations depuis les variables d'environnement
-    base_url = os.getenv("API_BASE_URL")
-    bearer_token = os.getenv("PARTS_CANADA_API_TOKEN")
+    base_url, headers = configuration_api()
 
-    
     # Le dossier cible est le dossier parent du catalogue
     target_folder = f"CATALOGUES-{catalog_name}"
-   
+    # Les deltas sont décompressés à part, puis fusionnés dans le magasin
+    delta_folder = os.path.join(target_folder, "features-delta")
 
     endpoint = f"/products/features/{catalog_name}/download"
 
-    if not base_url or not bearer_token:
-        raise ValueError("Les variables d'environnement API_BASE_URL et PARTS_CANADA_API_TOKEN doivent être définies.")
-
-    # Ajouter un paramètre 'start_date' pour forcer un téléchargement complet
+    # Sans watermark (ou sans magasin local), on repart d'une synchronisation complète
+    watermark = lire_watermark(catalog_name)
+    if not os.path.exists(chemin_magasin(catalog_name)):
+        watermark = None
+    complet = complet or watermark is None
     params = {
-        "start_date": "2000-01-01"
+        "start_date": DATE_SYNCHRO_COMPLETE if complet else watermark
     }
+    # Noté avant la requête : les mises à jour publiées pendant le téléchargement
+    # seront reprises à la prochaine synchronisation (doublons éliminés à la fusion).
+    date_synchro = datetime.date.today().isoformat()
 
     features_url = f"{base_url}{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {bearer_token}"
-    }
-
-    # Nom du fichier ZIP temporaire (placé dans le dossier cible)
-    # S'assurer que le dossier cible existe avant de définir le chemin temporaire
-    if not os.path.exists(target_folder):
-         os.makedirs(target_folder)
-         print(f"Dossier '{target_folder}' créé (pour fichier temporaire).") # Message ajusté
-    temp_zip_path = os.path.join(target_folder, f"{catalog_name}_features_temp.zip")
-    # --- FIN MODIFICATION ---
 
-
-    print(f"Début du téléchargement des features pour '{catalog_name}' depuis {features_url}...")
+    mode = "complète" if complet else f"incrémentale depuis {watermark}"
+    print(f"Début de la synchronisation {mode} des features pour '{catalog_name}' depuis {features_url}...")
 
     try:
-        # Étape 1 : Vérifier/Créer le dossier cible (déplacé avant temp_zip_path)
+        # Étape 1 : Vérifier/Créer le dossier cible
         if os.path.exists(target_folder):
-             print(f"1/4. Le dossier '{target_folder}' existe déjà.")
+             print(f"1/3. Le dossier '{target_folder}' existe déjà.")
         else:
-             print(f"1/4. Dossier '{target_folder}' N'existe pas")
-
-        # Étape 2 : Télécharger le fichier ZIP
-        print("2/4. Téléchargement du fichier ZIP en cours...")
-        downloaded_size = 0
-        chunk_size = 1024 * 128  # 128 Ko
-        update_interval = 5
-        chunk_count = 0
-
-        with requests.get(features_url, headers=headers, params=params, stream=True) as response:
-            response.raise_for_status()
-            content_type = response.headers.get('content-type', '').lower()
-
-            if 'application/octet-stream' not in content_type and 'application/zip' not in content_type:
-                response_text = response.text
-                print(f"\n     Info: Le serveur a répondu (pas un fichier ZIP) : {response_text}")
-                try:
-                    json_response = response.json()
-                    print(f"     Message JSON reçu: {json_response}")
-                except requests.exceptions.JSONDecodeError:
-                    pass
-                return
-
-            total_size = int(response.headers.get('content-length', 0))
-
-            with open(temp_zip_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        chunk_count += 1
-                        if chunk_count % update_interval == 0 or downloaded_size == total_size:
-                           progress = (downloaded_size / total_size) * 100 if total_size > 0 else 0
-                           downloaded_mb = downloaded_size / (1024 * 1024)
-                           total_mb = total_size / (1024 * 1024)
-                           print(f"\r     [{'=' * int(progress / 4):<25}] {downloaded_mb:.2f} Mo / {total_mb:.2f} Mo", end='')
-
-        print("Téléchargement du ZIP réussi.")
-
-        # Étape 3 : Décompresser le fichier ZIP
-        print("3/4. Décompression du fichier en cours...")
-        with zipfile.ZipFile(temp_zip_path, 'r') as zf:
-            
-            # Extrait directement dans target_folder
-            zf.extractall(target_folder)
-            print(f"     Fichiers extraits avec succès dans '{target_folder}'.")
-            
-
-        # Étape 4 : Nettoyage
-        print("4/4. Nettoyage du fichier ZIP temporaire...")
-        os.remove(temp_zip_path)
-        print(f"     '{temp_zip_path}' supprimé.")
+             os.makedirs(target_folder, exist_ok=True)
+             print(f"1/3. Dossier '{target_folder}' créé.")
+
+        # Étape 2 : Télécharger et décompresser le fichier ZIP
+        print("2/3. Téléchargement et décompression du fichier ZIP en cours...")
+        resultat = telecharger_et_extraire_zip(
+            features_url, delta_folder, f"{catalog_name}_features_temp.zip",
+            headers=headers, params=params, verifier_reponse=reponse_est_un_zip
+        )
+        if resultat is None:
+            # "No updates since your last download." : la synchronisation est à jour
+            ecrire_watermark(catalog_name, date_synchro)
+            return
+
+        # Étape 3 : Fusionner le delta dans le magasin local
+        noms, _ = resultat
+        sources = [os.path.join(delta_folder, nom) for nom in noms if nom.endswith('.csv')]
+        print(f"3/3. Fusion de {len(sources)} fichier(s) dans '{chemin_magasin(catalog_name)}'...")
+        lignes = fusionner_delta(catalog_name, sources, complet)
+        ecrire_watermark(catalog_name, date_synchro)
+        print(f"     Magasin à jour : {lignes} features.")
 
         return target_folder
 
@@ -114,25 +162,14 @@ def download_product_features_file(catalog_name: str):
         raise
     except zipfile.BadZipFile:
         print("\nErreur : Le fichier téléchargé n'est pas un fichier ZIP valide.")
-        # Nettoyer le fichier corrompu si possible
-        if os.path.exists(temp_zip_path):
-             try:
-                 os.remove(temp_zip_path)
-                 print(f"Nettoyage : Fichier ZIP temporaire corrompu '{temp_zip_path}' supprimé.")
-             except Exception as clean_e:
-                 print(f"Erreur lors du nettoyage du fichier ZIP corrompu : {clean_e}")
         raise
     except Exception as e:
         print(f"\nUne erreur inattendue est survenue : {e}")
         raise
     finally:
-        # Assurer la suppression finale du fichier temporaire
-        if os.path.exists(temp_zip_path):
-            try:
-                os.remove(temp_zip_path)
-                print(f"Nettoyage (finally) : '{temp_zip_path}' supprimé.")
-            except Exception as e:
-                print(f"Erreur lors du nettoyage final du fichier temporaire : {e}")
+        # Le delta n'est plus utile une fois fusionné (un partiel réseau reste pour reprise)
+        if os.path.isdir(delta_folder) and not any(n.endswith('.etat.json') for n in os.listdir(delta_folder)):
+            shutil.rmtree(delta_folder, ignore_errors=True)
 
 # Teste avec fatbook
 if __name__ == "__main__":
@@ -142,4 +179,3 @@ if __name__ == "__main__":
         print("\nTest autonome terminé.")
     except Exception as e:
         print(f"\nLe test autonome a échoué : {e}")
-
@@ -0,0 +1,258 @@
+import os
+import time
+import sqlite3
+import threading
+import multiprocessing
+import traceback
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Base SQLite contenant la table des travaux (conservée entre deux lancements)
+FICHIER_TRAVAUX = "travaux.sqlite3"
+
+# Nombre de travaux exécutés simultanément (surchargeable via PARTS_CANADA_JOB_WORKERS)
+WORKERS_TRAVAUX_DEFAUT = 2
+
+# États possibles d'un travail
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+TERMINE = "termine"
+ECHEC = "echec"
+INTERROMPU = "interrompu"
+
+_verrou = threading.Lock()
+_verrou_executor = threading.Lock()
+_executor = None
+_actifs = {}  # id -> Travail (travaux en attente ou en cours)
+_contexte = threading.local()
+_abonnes_fin = []  # fonctions appelées à la fin de chaque travail
+
+
+class Travail:
+    """
+    Un travail du pipeline et ses compteurs de progression.
+    """
+
+    def __init__(self, id_travail, dataset):
+        self.id = id_travail
+        self.dataset = dataset
+        self.etat = EN_ATTENTE
+        self.etape = None
+        self.octets = 0
+        self.lignes = 0
+        self.debut = None
+        self.fin = None
+        self.erreur = None
+        self._verrou = threading.Lock()
+
+    def signaler(self, etape=None, octets=0, lignes=0):
+        with self._verrou:
+            if etape is not None:
+                self.etape = etape
+            self.octets += octets
+            self.lignes += lignes
+
+    def en_dict(self):
+        with self._verrou:
+            return {
+                'id': self.id,
+                'dataset': self.dataset,
+                'etat': self.etat,
+                'etape': self.etape,
+                'octets': self.octets,
+                'lignes': self.lignes,
+                'debut': self.debut,
+                'fin': self.fin,
+                'duree': _duree(self.debut, self.fin),
+                'erreur': self.erreur,
+            }
+
+
+def _duree(debut, fin):
+    if debut is None:
+        return None
+    return round((fin or time.time()) - debut, 1)
+
+
+@contextlib.contextmanager
+def _connexion():
+    """
+    Ouvre la base des travaux, valide (ou annule) la transaction en sortie
+    du bloc puis ferme la connexion.
+    """
+    connexion = sqlite3.connect(FICHIER_TRAVAUX, timeout=30)
+    connexion.row_factory = sqlite3.Row
+    try:
+        with connexion:
+            yield connexion
+    finally:
+        connexion.close()
+
+
+def initialiser():
+    """
+    Crée la table des travaux et marque comme interrompus les travaux
+    restés actifs lors du précédent arrêt de l'application.
+    """
+    # Un processus enfant (ex: chargement parallèle des features) réimporte
+    # l'application : il ne doit pas toucher aux travaux du processus parent.
+    if multiprocessing.parent_process() is not None:
+        return
+    with _verrou, _connexion() as connexion:
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS travaux (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dataset TEXT NOT NULL,
+                etat TEXT NOT NULL,
+                etape TEXT,
+                octets INTEGER DEFAULT 0,
+                lignes INTEGER DEFAULT 0,
+                debut REAL,
+                fin REAL,
+                erreur TEXT,
+                cree_le REAL NOT NULL
+            )
+        """)
+        connexion.execute(
+            "UPDATE travaux SET etat = ?, fin = ? WHERE etat IN (?, ?)",
+            (INTERROMPU, time.time(), EN_ATTENTE, EN_COURS),
+        )
+
+
+def _enregistrer(travail: Travail):
+    d = travail.en_dict()
+    with _connexion() as connexion:
+        connexion.execute(
+            "UPDATE travaux SET etat = ?, etape = ?, octets = ?, lignes = ?, debut = ?, fin = ?, erreur = ? WHERE id = ?",
+            (d['etat'], d['etape'], d['octets'], d['lignes'], d['debut'], d['fin'], d['erreur'], d['id']),
+        )
+
+
+def _obtenir_executor():
+    global _executor
+    with _verrou_executor:
+        if _executor is None:
+            workers = int(os.getenv("PARTS_CANADA_JOB_WORKERS", WORKERS_TRAVAUX_DEFAUT))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="travail")
+        return _executor
+
+
+def soumettre(dataset: str, fonction, *args, **kwargs):
+    """
+    Met un travail en file et retourne immédiatement son identifiant.
+    Si un travail est déjà en attente ou en cours pour le même dataset,
+    aucun nouveau travail n'est créé : l'identifiant existant est retourné.
+    """
+    with _verrou:
+        for travail in _actifs.values():
+            if travail.dataset == dataset:
+                print(f"Travail #{travail.id} déjà actif pour '{dataset}' : demande regroupée.")
+                return travail.id
+
+        with _connexion() as connexion:
+            curseur = connexion.execute(
+                "INSERT INTO travaux (dataset, etat, cree_le) VALUES (?, ?, ?)",
+                (dataset, EN_ATTENTE, time.time()),
+            )
+            travail = Travail(curseur.lastrowid, dataset)
+        _actifs[travail.id] = travail
+
+    _obtenir_executor().submit(_executer, travail, fonction, args, kwargs)
+    print(f"Travail #{travail.id} mis en file pour '{dataset}'.")
+    return travail.id
+
+
+def _executer(travail: Travail, fonction, args, kwargs):
+    definir_travail_courant(travail)
+    travail.etat = EN_COURS
+    travail.debut = time.time()
+    _enregistrer(travail)
+    try:
+        fonction(*args, **kwargs)
+        travail.etat = TERMINE
+    except Exception as e:
+        travail.etat = ECHEC
+        travail.erreur = str(e)
+        print(f"Le travail #{travail.id} ('{travail.dataset}') a échoué : {e}")
+        traceback.print_exc()
+    finally:
+        travail.fin = time.time()
+        _enregistrer(travail)
+        with _verrou:
+            _actifs.pop(travail.id, None)
+        definir_travail_courant(None)
+        _notifier_fin(travail)
+
+
+def abonner_fin_travail(fonction):
+    """
+    Enregistre une fonction appelée avec le Travail à la fin de chaque
+    travail (réussi ou non), par ex. pour invalider un cache.
+    """
+    _abonnes_fin.append(fonction)
+
+
+def _notifier_fin(travail: Travail):
+    for fonction in list(_abonnes_fin):
+        try:
+            fonction(travail)
+        except Exception as e:
+            print(f"Erreur d'un abonné à la fin du travail #{travail.id} : {e}")
+
+
+def definir_travail_courant(travail):
+    """
+    Associe un travail au thread courant (utilisé aussi par les sous-threads
+    d'un travail, par ex. le rafraîchissement parallèle des catalogues).
+    """
+    _contexte.travail = travail
+
+
+def travail_courant():
+    """
+    Retourne le travail exécuté par le thread courant, ou None.
+    """
+    return getattr(_contexte, 'travail', None)
+
+
+def signaler(etape=None, octets=0, lignes=0):
+    """
+    Met à jour l'étape et les compteurs du travail courant.
+    Sans travail courant (script lancé seul), ne fait rien.
+    """
+    travail = travail_courant()
+    if travail is None:
+        return
+    travail.signaler(etape=etape, octets=octets, lignes=lignes)
+    if etape is not None:
+        _enregistrer(travail)
+
+
+def statut(id_travail: int):
+    """
+    Retourne l'état d'un travail (dict), ou None s'il est inconnu.
+    """
+    with _verrou:
+        travail = _actifs.get(id_travail)
+    if travail is not None:
+        return travail.en_dict()
+
+    with _connexion() as connexion:
+        ligne = connexion.execute("SELECT * FROM travaux WHERE id = ?", (id_travail,)).fetchone()
+    if ligne is None:
+        return None
+    d = dict(ligne)
+    d.pop('cree_le', None)
+    d['duree'] = _duree(d['debut'], d['fin'])
+    return d
+
+
+def derniers_travaux(limite: int = 20):
+    """
+    Retourne les travaux les plus récents, du plus récent au plus ancien.
+    """
+    with _connexion() as connexion:
+        ids = [ligne['id'] for ligne in connexion.execute(
+            "SELECT id FROM travaux ORDER BY id DESC LIMIT ?", (limite,)
+        )]
+    return [statut(id_travail) for id_travail in ids]
@@ -1,37 +1,82 @@
 import os
 import datetime
+import threading
 
-def get_folder_content(folder_name):
+# Contenu des dossiers gardé en mémoire : {dossier: (mtime_ns du dossier, contenu)}
+_cache = {}
+_verrou = threading.Lock()
+
+
+def invalider(folder_name=None):
     """
-    Analyse un dossier et retourne les propriétés des fichiers et dossiers qu'il contient.
+    Oublie le contenu mémorisé d'un dossier (ou de tous les dossiers), par
+    exemple à la fin d'un travail qui a pu réécrire des fichiers existants.
+    """
+    with _verrou:
+        if folder_name is None:
+            _cache.clear()
+        else:
+            _cache.pop(folder_name, None)
+
+
+def _lire_dossier(folder_name):
+    """
+    Parcourt un dossier avec os.scandir : le type de chaque entrée est connu
+    sans appel système supplémentaire, et un seul stat est fait par entrée.
     """
     items_properties = []
-    if os.path.exists(folder_name):
-        for item_name in os.listdir(folder_name):
-            item_path = os.path.join(folder_name, item_name)
+    with os.scandir(folder_name) as entrees:
+        for entree in entrees:
             try:
-                stats = os.stat(item_path)
-                mod_time = datetime.datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-
-                if os.path.isfile(item_path):
+                if entree.is_file():
                     item_type = 'Fichier'
-                    size_mo = round(stats.st_size / (1024 * 1024), 2)
-                elif os.path.isdir(item_path):
+                elif entree.is_dir():
                     item_type = 'Dossier'
-                    size_mo = '-' # Les dossiers n'ont pas de taille directe
                 else:
                     continue # Ignorer les autres types (liens symboliques, etc.)
 
+                stats = entree.stat()
+                mod_time = datetime.datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                # Les dossiers n'ont pas de taille directe
+                size_mo = round(stats.st_size / (1024 * 1024), 2) if item_type == 'Fichier' else '-'
+
                 items_properties.append({
-                    'name': item_name,
+                    'name': entree.name,
                     'type': item_type,
                     'mod_date': mod_time,
                     'size_mo': size_mo
                 })
-            except Exception as e:
-                print(f"Impossible de lire les propriétés de {item_name}: {e}")
+            except OSError as e:
+                print(f"Impossible de lire les propriétés de {entree.name}: {e}")
     return items_properties
 
+
+def get_folder_content(folder_name):
+    """
+    Analyse un dossier et retourne les propriétés des fichiers et dossiers qu'il contient.
+    Le résultat est servi depuis la mémoire tant que la date de modification du
+    dossier ne change pas et qu'il n'a pas été invalidé (voir invalider).
+    """
+    try:
+        mtime = os.stat(folder_name).st_mtime_ns
+    except OSError:
+        invalider(folder_name)
+        return []
+
+    with _verrou:
+        en_cache = _cache.get(folder_name)
+    if en_cache is not None and en_cache[0] == mtime:
+        return list(en_cache[1])
+
+    try:
+        items_properties = _lire_dossier(folder_name)
+    except OSError as e:
+        print(f"Impossible de lire le dossier {folder_name}: {e}")
+        return []
+    with _verrou:
+        _cache[folder_name] = (mtime, items_properties)
+    return list(items_properties)
+
 if __name__ == "__main__":
     # Ce bloc est exécuté uniquement lorsque le script est lancé directement.
     # Il sert à tester la fonction get_folder_content de manière autonome.
@@ -0,0 +1,212 @@
+import os
+import io
+import csv
+import sqlite3
+import argparse
+
+import pandas as pd
+
+from sources_csv import SEPARATEUR_MEMBRE
+from cache_colonnes import empreinte_source
+from schema_inventaire import types_pour
+from metriques import etape
+
+# Fichier combiné indexé par défaut (produit par combiner_features)
+FICHIER_COMBINE = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanada_with_Features.csv")
+
+# Lignes insérées à la fois dans l'index pendant sa construction
+TAILLE_LOT_INDEX = 50_000
+
+
+def chemin_index(source: str):
+    """
+    Retourne le chemin de l'index d'un CSV, rangé à côté de lui
+    (ex: "PartsCanada_with_Features.csv" -> "PartsCanada_with_Features.index.sqlite3").
+    """
+    return os.path.splitext(str(source))[0] + ".index.sqlite3"
+
+
+def _parcourir_lignes(f):
+    """
+    Parcourt un CSV ouvert en binaire et retourne (debut, octets) pour chaque
+    enregistrement. Un champ entre guillemets peut contenir des retours à la
+    ligne : l'enregistrement continue tant que le nombre de guillemets est impair.
+    """
+    debut = position = 0
+    morceaux = []
+    guillemets = 0
+    for ligne in f:
+        morceaux.append(ligne)
+        guillemets += ligne.count(b'"')
+        position += len(ligne)
+        if guillemets % 2 == 0:
+            yield debut, b''.join(morceaux)
+            debut = position
+            morceaux = []
+            guillemets = 0
+    if morceaux:
+        yield debut, b''.join(morceaux)
+
+
+def _champs(octets: bytes):
+    if b'"' not in octets:
+        # Cas le plus courant : aucun champ entre guillemets, un simple découpage suffit
+        return octets.rstrip(b'\r\n').decode('utf-8-sig').split(',')
+    return next(csv.reader(io.StringIO(octets.decode('utf-8-sig'), newline='')), [])
+
+
+def construire_index(source: str = FICHIER_COMBINE):
+    """
+    Construit l'index Commodity Code / Part Number -> position (octets) des
+    lignes d'un CSV, pour relire directement les lignes voulues sans parcourir
+    tout le fichier.
+
+    Returns:
+        str: Le chemin de l'index, ou None si la source ne peut pas être indexée.
+    """
+    if SEPARATEUR_MEMBRE in str(source) or str(source).lower().endswith('.zip'):
+        # Une archive compressée ne permet pas d'accéder directement à une position
+        print(f"Index non construit : '{source}' n'est pas un CSV sur disque.")
+        return None
+
+    print(f"Construction de l'index de '{source}'...")
+    chemin = chemin_index(source)
+    if os.path.exists(chemin + ".tmp"):
+        os.remove(chemin + ".tmp")
+
+    nb_lignes = 0
+    with open(source, 'rb') as f, sqlite3.connect(chemin + ".tmp") as connexion:
+        connexion.execute("CREATE TABLE meta (cle TEXT PRIMARY KEY, valeur TEXT)")
+        connexion.execute(
+            "CREATE TABLE lignes (part_number TEXT, commodity_code TEXT, debut INTEGER, longueur INTEGER)"
+        )
+
+        lignes = _parcourir_lignes(f)
+        _, entete = next(lignes)
+        colonnes = _champs(entete)
+        col_piece = colonnes.index('Part Number')
+        col_code = colonnes.index('Commodity Code') if 'Commodity Code' in colonnes else None
+
+        lot = []
+        for debut, octets in lignes:
+            champs = _champs(octets)
+            if len(champs) <= col_piece:
+                continue
+            code = champs[col_code] if col_code is not None and len(champs) > col_code else ''
+            lot.append((champs[col_piece], code, debut, len(octets)))
+            if len(lot) >= TAILLE_LOT_INDEX:
+                connexion.executemany("INSERT INTO lignes VALUES (?, ?, ?, ?)", lot)
+                nb_lignes += len(lot)
+                lot = []
+        connexion.executemany("INSERT INTO lignes VALUES (?, ?, ?, ?)", lot)
+        nb_lignes += len(lot)
+
+        connexion.execute("CREATE INDEX idx_code ON lignes (commodity_code, debut)")
+        connexion.execute("CREATE INDEX idx_piece ON lignes (part_number)")
+        empreinte = empreinte_source(source)
+        connexion.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('entete', entete.decode('utf-8')),
+            ('taille', str(empreinte['taille'])),
+            ('mtime_ns', str(empreinte['mtime_ns'])),
+        ])
+    os.replace(chemin + ".tmp", chemin)
+    print(f"     Index écrit : '{chemin}' ({nb_lignes} lignes).")
+    return chemin
+
+
+def index_a_jour(source: str = FICHIER_COMBINE):
+    """
+    Indique si l'index existe et correspond au CSV actuel.
+    """
+    if not isinstance(source, str) or SEPARATEUR_MEMBRE in source:
+        return False
+    chemin = chemin_index(source)
+    if not os.path.exists(chemin) or not os.path.exists(source):
+        return False
+    try:
+        with sqlite3.connect(chemin) as connexion:
+            meta = dict(connexion.execute("SELECT cle, valeur FROM meta"))
+    except sqlite3.Error:
+        return False
+    empreinte = empreinte_source(source)
+    return meta.get('taille') == str(empreinte['taille']) and meta.get('mtime_ns') == str(empreinte['mtime_ns'])
+
+
+def _lire_positions(source: str, requete: str, valeurs, colonnes=None, dtype=None):
+    """
+    Relit les lignes désignées par l'index (un seek par ligne) dans un DataFrame.
+    """
+    with etape("lecture_index") as mesure:
+        df = _lire_lignes(source, requete, valeurs, colonnes, dtype)
+        mesure.ajouter(lignes=len(df))
+    return df
+
+
+def _lire_lignes(source: str, requete: str, valeurs, colonnes=None, dtype=None):
+    valeurs = [str(v) for v in valeurs]
+    with sqlite3.connect(chemin_index(source)) as connexion:
+        entete = connexion.execute("SELECT valeur FROM meta WHERE cle = 'entete'").fetchone()[0]
+        positions = []
+        # Découpage pour rester sous la limite de paramètres de SQLite
+        for i in range(0, len(valeurs), 500):
+            morceau = valeurs[i:i + 500]
+            marqueurs = ",".join("?" * len(morceau))
+            positions += connexion.execute(requete.format(marqueurs), morceau).fetchall()
+    positions.sort()
+
+    tampon = io.BytesIO()
+    tampon.write(entete.encode('utf-8'))
+    with open(source, 'rb') as f:
+        for debut, longueur in positions:
+            f.seek(debut)
+            tampon.write(f.read(longueur))
+    tampon.seek(0)
+
+    noms = _champs(entete.encode('utf-8'))
+    if colonnes is not None:
+        colonnes = [col for col in colonnes if col in noms]
+    return pd.read_csv(tampon, usecols=colonnes, dtype=types_pour(noms, dtype))
+
+
+def lire_par_codes(codes, source: str = FICHIER_COMBINE, colonnes=None, dtype=None):
+    """
+    Lit uniquement les lignes d'un ou plusieurs 'Commodity Code' via l'index.
+    Retourne None si l'index est absent ou périmé (lecture complète nécessaire).
+    """
+    if not index_a_jour(source):
+        return None
+    if isinstance(codes, str):
+        codes = [codes]
+    return _lire_positions(
+        source, "SELECT debut, longueur FROM lignes WHERE commodity_code IN ({})", codes, colonnes, dtype
+    )
+
+
+def lire_pieces(part_numbers, source: str = FICHIER_COMBINE, colonnes=None, dtype=None):
+    """
+    Lit uniquement les lignes d'une ou plusieurs pièces (Part Number) via l'index.
+    Retourne None si l'index est absent ou périmé.
+    """
+    if not index_a_jour(source):
+        return None
+    if isinstance(part_numbers, str):
+        part_numbers = [part_numbers]
+    return _lire_positions(
+        source, "SELECT debut, longueur FROM lignes WHERE part_number IN ({})", part_numbers, colonnes, dtype
+    )
+
+
+# Ce bloc permet de tester le module de manière autonome
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index Commodity Code / Part Number du fichier combiné.")
+    parser.add_argument("--source", default=FICHIER_COMBINE)
+    parser.add_argument("--code", help="Afficher les lignes d'un Commodity Code.")
+    parser.add_argument("--piece", nargs="+", help="Afficher les lignes d'une ou plusieurs pièces.")
+    args = parser.parse_args()
+
+    if not index_a_jour(args.source):
+        construire_index(args.source)
+    if args.code:
+        print(lire_par_codes(args.code, args.source))
+    if args.piece:
+        print(lire_pieces(args.piece, args.source).T)
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+
+from sources_csv import chemin_sur_disque
+
+# Dernières quantités téléchargées (/inventory/quantities), conservées pour être
+# réappliquées à l'inventaire tant qu'un inventaire plus récent n'est pas téléchargé
+FICHIER_INSTANTANE = os.path.join("INVENTAIRE-QUANTITES-PARTS-CANADA", "dernieres_quantites.csv")
+
+# Colonne clé dans le fichier des quantités et dans l'inventaire
+CLE_PIECE = 'Part Number'
+
+
+def enregistrer_instantane(quantites: pd.DataFrame):
+    """
+    Enregistre les quantités (indexées par Part Number) comme dernier instantané.
+    """
+    os.makedirs(os.path.dirname(FICHIER_INSTANTANE), exist_ok=True)
+    quantites.to_csv(FICHIER_INSTANTANE + ".tmp", index_label=CLE_PIECE, encoding='utf-8')
+    os.replace(FICHIER_INSTANTANE + ".tmp", FICHIER_INSTANTANE)
+
+
+def date_instantane():
+    """
+    Date de modification du dernier instantané, ou None s'il n'y en a pas.
+    """
+    try:
+        return os.path.getmtime(FICHIER_INSTANTANE)
+    except OSError:
+        return None
+
+
+def lire_instantane(plus_recent_que: str = None):
+    """
+    Retourne le dernier instantané (texte, indexé par Part Number), ou None
+    s'il n'y en a pas ou s'il est plus ancien que la source `plus_recent_que`
+    (un inventaire téléchargé après lui contient déjà des quantités plus récentes).
+    """
+    date = date_instantane()
+    if date is None:
+        return None
+    if plus_recent_que is not None and os.path.getmtime(chemin_sur_disque(plus_recent_que)) >= date:
+        return None
+    return pd.read_csv(FICHIER_INSTANTANE, dtype=str, keep_default_na=False).set_index(CLE_PIECE)
+
+
+def appliquer_quantites(df: pd.DataFrame, quantites: pd.DataFrame, cle: str = CLE_PIECE):
+    """
+    Remplace, en place, les colonnes de `df` présentes dans `quantites` (texte,
+    indexé par Part Number) pour les pièces trouvées. Chaque colonne garde son
+    type ; une quantité vide ou non numérique ne remplace pas une colonne numérique.
+
+    Returns:
+        int: Le nombre de lignes mises à jour.
+    """
+    colonnes = [col for col in quantites.columns if col in df.columns]
+    if cle not in df.columns or not colonnes:
+        return 0
+
+    cles = df[cle]
+    trouvees = cles.isin(quantites.index)
+    if not trouvees.any():
+        return 0
+    for col in colonnes:
+        valeurs = quantites[col]
+        if pd.api.types.is_numeric_dtype(df[col].dtype):
+            valeurs = pd.to_numeric(valeurs, errors='coerce')
+        nouvelles = cles.map(valeurs)
+        df[col] = nouvelles.where(trouvees & nouvelles.notna(), df[col]).astype(df[col].dtype)
+    return int(trouvees.sum())
@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import atexit
+import datetime
+import threading
+import contextlib
+import multiprocessing
+
+from file_travaux import travail_courant, abonner_fin_travail, TERMINE, ECHEC
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Résumés JSON des exécutions du pipeline (un fichier par travail terminé)
+DOSSIER_RESUMES = os.path.join(".metriques", "executions")
+
+# Préfixe des métriques exposées au format Prometheus
+PREFIXE = "parts_canada"
+
+# Écrire "5" dans ce fichier remet le pic de mémoire du processus (VmHWM) à sa
+# mémoire actuelle (Linux) : le pic d'une étape est alors mesuré depuis son début
+FICHIER_CLEAR_REFS = "/proc/self/clear_refs"
+
+_verrou = threading.Lock()
+_verrou_memoire = threading.Lock()
+_contexte = threading.local()
+_cumuls = {}      # (etape, dataset) -> compteurs cumulés depuis le démarrage
+_par_travail = {}  # id du travail -> liste des étapes terminées
+_hors_travail = []  # étapes terminées hors file des travaux (ex: ligne de commande)
+_actives = set()   # étapes en cours, tous threads confondus
+_debut_processus = time.time()
+
+
+def memoire_pic():
+    """
+    Mémoire maximale (RSS) atteinte par le processus depuis son démarrage, en octets,
+    ou None si elle n'est pas mesurable sur ce système.
+    """
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            for ligne in f:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1]) * 1024
+    if resource is None:
+        return None
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def _reinitialiser_pic():
+    """
+    Remet le pic de mémoire du processus à sa mémoire actuelle.
+    Retourne False si le système ne le permet pas.
+    """
+    try:
+        with open(FICHIER_CLEAR_REFS, 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class Etape:
+    """
+    Une étape mesurée du pipeline : durée, octets, lignes et mémoire.
+    """
+
+    def __init__(self, nom, dataset, id_travail):
+        self.nom = nom
+        self.dataset = dataset
+        self.id_travail = id_travail
+        self.octets = 0
+        self.lignes = 0
+        self.debut = time.time()
+        self._horloge = time.perf_counter()
+        self.duree = None
+        self.succes = None
+        self.memoire_pic = None
+        self._pic_initial = None
+        self._pic_reinitialise = False
+
+    def _demarrer_mesure_memoire(self):
+        with _verrou_memoire:
+            pic = memoire_pic()
+            if _reinitialiser_pic():
+                # Le pic atteint jusqu'ici revient aux étapes déjà en cours
+                for autre in _actives:
+                    if pic is not None:
+                        autre.memoire_pic = max(autre.memoire_pic or 0, pic)
+                self._pic_reinitialise = True
+            self._pic_initial = pic
+            _actives.add(self)
+
+    def _terminer_mesure_memoire(self):
+        with _verrou_memoire:
+            _actives.discard(self)
+            pic = memoire_pic()
+            if pic is None:
+                return None
+            if self._pic_reinitialise:
+                return max(self.memoire_pic or 0, pic)
+            # Sans remise à zéro, seul un pic dépassé pendant l'étape lui est attribuable
+            return pic if self._pic_initial is not None and pic > self._pic_initial else None
+
+    def ajouter(self, octets=0, lignes=0):
+        self.octets += octets
+        self.lignes += lignes
+
+    def terminer(self, succes):
+        self.duree = time.perf_counter() - self._horloge
+        self.succes = succes
+        self.memoire_pic = self._terminer_mesure_memoire()
+
+    def en_dict(self):
+        return {
+            'etape': self.nom,
+            'dataset': self.dataset,
+            'debut': datetime.datetime.fromtimestamp(self.debut).isoformat(timespec='seconds'),
+            'duree': round(self.duree, 3),
+            'octets': self.octets,
+            'debit_octets_s': round(self.octets / self.duree) if self.duree else 0,
+            'lignes': self.lignes,
+            'memoire_pic_octets': self.memoire_pic,
+            'succes': self.succes,
+        }
+
+
+def _pile():
+    if not hasattr(_contexte, 'pile'):
+        _contexte.pile = []
+    return _contexte.pile
+
+
+@contextlib.contextmanager
+def etape(nom: str, dataset: str = None):
+    """
+    Mesure un bloc du pipeline :
+
+        with etape("lecture_csv") as e:
+            df = ...
+            e.ajouter(lignes=len(df))
+
+    Le dataset est celui du travail courant, sauf s'il est précisé.
+    """
+    travail = travail_courant()
+    if dataset is None:
+        dataset = travail.dataset if travail is not None else ""
+    mesure = Etape(nom, dataset, travail.id if travail is not None else None)
+    mesure._demarrer_mesure_memoire()
+
+    pile = _pile()
+    pile.append(mesure)
+    succes = False
+    try:
+        yield mesure
+        succes = True
+    finally:
+        pile.pop()
+        mesure.terminer(succes)
+        _enregistrer(mesure)
+
+
+def ajouter(octets=0, lignes=0):
+    """
+    Ajoute des octets ou des lignes à l'étape en cours dans ce thread (s'il y en a une).
+    """
+    pile = _pile()
+    if pile:
+        pile[-1].ajouter(octets=octets, lignes=lignes)
+
+
+def _enregistrer(mesure: Etape):
+    with _verrou:
+        cumul = _cumuls.setdefault((mesure.nom, mesure.dataset), {
+            'executions': 0, 'echecs': 0, 'duree': 0.0, 'octets': 0, 'lignes': 0,
+            'derniere_duree': 0.0, 'dernier_debit': 0.0, 'memoire_pic': 0,
+        })
+        cumul['executions'] += 1
+        cumul['echecs'] += 0 if mesure.succes else 1
+        cumul['duree'] += mesure.duree
+        cumul['octets'] += mesure.octets
+        cumul['lignes'] += mesure.lignes
+        cumul['derniere_duree'] = mesure.duree
+        cumul['dernier_debit'] = mesure.octets / mesure.duree if mesure.duree else 0.0
+        cumul['memoire_pic'] = max(cumul['memoire_pic'], mesure.memoire_pic or 0)
+        if mesure.id_travail is not None:
+            _par_travail.setdefault(mesure.id_travail, []).append(mesure.en_dict())
+        else:
+            _hors_travail.append(mesure.en_dict())
+
+
+# (nom, type, description, clé du cumul)
+_METRIQUES = [
+    ("etape_executions_total", "counter", "Nombre d'exécutions de l'étape.", 'executions'),
+    ("etape_echecs_total", "counter", "Nombre d'exécutions de l'étape terminées en erreur.", 'echecs'),
+    ("etape_duree_secondes_total", "counter", "Durée cumulée de l'étape.", 'duree'),
+    ("etape_octets_total", "counter", "Octets transférés pendant l'étape.", 'octets'),
+    ("etape_lignes_total", "counter", "Lignes traitées pendant l'étape.", 'lignes'),
+    ("etape_derniere_duree_secondes", "gauge", "Durée de la dernière exécution de l'étape.", 'derniere_duree'),
+    ("etape_dernier_debit_octets_par_seconde", "gauge", "Débit de la dernière exécution de l'étape.",
+     'dernier_debit'),
+    ("etape_memoire_pic_octets", "gauge", "Mémoire maximale atteinte pendant une exécution de l'étape.",
+     'memoire_pic'),
+]
+
+
+def _echapper(valeur: str):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus():
+    """
+    Retourne les métriques cumulées au format texte de Prometheus.
+    """
+    with _verrou:
+        cumuls = {cle: dict(valeurs) for cle, valeurs in _cumuls.items()}
+
+    lignes = []
+    for nom, type_metrique, description, cle in _METRIQUES:
+        lignes.append(f"# HELP {PREFIXE}_{nom} {description}")
+        lignes.append(f"# TYPE {PREFIXE}_{nom} {type_metrique}")
+        for (nom_etape, dataset), valeurs in sorted(cumuls.items()):
+            etiquettes = f'etape="{_echapper(nom_etape)}",dataset="{_echapper(dataset)}"'
+            valeur = valeurs[cle]
+            valeur = valeur if isinstance(valeur, int) else round(valeur, 6)
+            lignes.append(f"{PREFIXE}_{nom}{{{etiquettes}}} {valeur}")
+    return "\n".join(lignes) + "\n"
+
+
+def _memoire_max(etapes):
+    valeurs = [e['memoire_pic_octets'] for e in etapes if e['memoire_pic_octets'] is not None]
+    return max(valeurs) if valeurs else None
+
+
+def resume_travail(travail):
+    """
+    Construit le résumé d'un travail terminé : état, durée totale et étapes mesurées.
+    """
+    with _verrou:
+        etapes = _par_travail.pop(travail.id, [])
+    d = travail.en_dict()
+    return {
+        'id': d['id'],
+        'dataset': d['dataset'],
+        'etat': d['etat'],
+        'erreur': d['erreur'],
+        'debut': datetime.datetime.fromtimestamp(d['debut']).isoformat(timespec='seconds') if d['debut'] else None,
+        'duree': d['duree'],
+        'memoire_pic_octets': _memoire_max(etapes),
+        'etapes': etapes,
+    }
+
+
+def _ecrire_resume(resume: dict, nom: str):
+    os.makedirs(DOSSIER_RESUMES, exist_ok=True)
+    horodatage = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    chemin = os.path.join(DOSSIER_RESUMES, f"{horodatage}_{nom}.json")
+    with open(chemin + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(resume, f, indent=2, ensure_ascii=False)
+    os.replace(chemin + ".tmp", chemin)
+    return chemin
+
+
+def ecrire_resume_travail(travail):
+    """
+    Enregistre le résumé JSON d'un travail terminé dans DOSSIER_RESUMES.
+    """
+    return _ecrire_resume(resume_travail(travail), f"travail-{travail.id}_{travail.dataset}")
+
+
+def ecrire_resume_processus():
+    """
+    Enregistre le résumé JSON des étapes exécutées hors file des travaux
+    (lancement en ligne de commande : orchestrateur, rafraîchissement des
+    catalogues...). Appelé à la fin du processus ; rien n'est écrit sans étape.
+    """
+    with _verrou:
+        etapes = list(_hors_travail)
+        _hors_travail.clear()
+    if not etapes:
+        return None
+    programme = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+    return _ecrire_resume({
+        'id': None,
+        'dataset': programme,
+        'etat': TERMINE if all(e['succes'] for e in etapes) else ECHEC,
+        'erreur': None,
+        'debut': datetime.datetime.fromtimestamp(_debut_processus).isoformat(timespec='seconds'),
+        'duree': round(time.time() - _debut_processus, 1),
+        'memoire_pic_octets': _memoire_max(etapes),
+        'etapes': etapes,
+    }, f"processus-{os.getpid()}_{programme}")
+
+
+# Chaque exécution a son résumé : les travaux à leur fin, les lancements
+# directs à la sortie du processus (pas les processus enfants de chargement)
+abonner_fin_travail(ecrire_resume_travail)
+if multiprocessing.parent_process() is None:
+    atexit.register(ecrire_resume_processus)
@@ -0,0 +1,525 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import threading
+import email.utils
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from cache_manifeste import lire_manifeste, ecrire_manifeste, fichiers_presents, en_tetes_conditionnels
+from sources_csv import SEPARATEUR_MEMBRE
+from file_travaux import signaler
+from metriques import etape, ajouter as ajouter_metrique
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# Taille du tampon d'écriture (octets). Réglable via PARTS_CANADA_CHUNK_SIZE
+# pour pouvoir comparer plusieurs valeurs sans toucher au code.
+TAILLE_TAMPON_DEFAUT = 1024 * 1024  # 1 Mo
+
+# Nombre maximal de connexions gardées ouvertes par hôte
+TAILLE_POOL_DEFAUT = 10
+
+# Nombre de tentatives par téléchargement (surchargeable via PARTS_CANADA_RETRIES).
+# Chaque nouvelle tentative reprend là où la précédente s'est arrêtée.
+NOMBRE_TENTATIVES_DEFAUT = 3
+
+# Erreurs réseau après lesquelles un téléchargement partiel est conservé et repris
+ERREURS_TRANSITOIRES = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+# Réponses HTTP temporaires (limite de débit, service indisponible) : la requête
+# est retentée après le délai Retry-After s'il est fourni, sinon après le backoff
+CODES_REESSAYABLES = (429, 503)
+
+# Attente maximale accordée à un en-tête Retry-After (secondes)
+ATTENTE_MAX_RETRY_AFTER = 300
+
+# Valeur retournée par telecharger_fichier quand le serveur répond 304
+NON_MODIFIE = "non-modifie"
+
+# Une session HTTP persistante (keep-alive) par hôte
+_sessions = {}
+_verrou_sessions = threading.Lock()
+
+# Drapeau par thread : les téléchargements concurrents n'affichent pas de
+# barre de progression (les lignes se mélangeraient dans la console).
+_etat_thread = threading.local()
+
+
+def taille_tampon():
+    """
+    Retourne la taille du tampon de téléchargement configurée.
+    """
+    valeur = os.getenv("PARTS_CANADA_CHUNK_SIZE")
+    if not valeur:
+        return TAILLE_TAMPON_DEFAUT
+    try:
+        taille = int(valeur)
+    except ValueError:
+        raise ValueError(f"PARTS_CANADA_CHUNK_SIZE doit être un entier (reçu : '{valeur}').")
+    if taille <= 0:
+        raise ValueError("PARTS_CANADA_CHUNK_SIZE doit être strictement positif.")
+    return taille
+
+
+def nombre_tentatives():
+    """
+    Retourne le nombre de tentatives configuré pour un téléchargement.
+    """
+    return max(1, int(os.getenv("PARTS_CANADA_RETRIES", NOMBRE_TENTATIVES_DEFAUT)))
+
+
+class TelechargementIncomplet(requests.exceptions.ConnectionError):
+    """
+    Le fichier reçu est plus court que la taille annoncée par le serveur.
+    """
+
+
+class ReponseTemporaire(requests.exceptions.HTTPError):
+    """
+    Le serveur a répondu 429 ou 503 ; `attente` est le délai demandé par
+    l'en-tête Retry-After (secondes), ou None s'il est absent.
+    """
+
+    def __init__(self, *args, attente=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attente = attente
+
+
+def delai_retry_after(valeur: str):
+    """
+    Convertit un en-tête Retry-After (secondes ou date HTTP) en délai en
+    secondes, borné à ATTENTE_MAX_RETRY_AFTER. Retourne None si l'en-tête est
+    absent ou illisible.
+    """
+    if not valeur:
+        return None
+    valeur = valeur.strip()
+    if valeur.isdigit():
+        delai = float(valeur)
+    else:
+        try:
+            date = email.utils.parsedate_to_datetime(valeur)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        delai = (date - datetime.now(timezone.utc)).total_seconds()
+    return min(max(0.0, delai), ATTENTE_MAX_RETRY_AFTER)
+
+
+def extraction_activee():
+    """
+    Indique si les archives doivent être extraites sur disque.
+    PARTS_CANADA_EXTRAIRE=0 active le mode streaming : l'archive est
+    conservée et ses CSV sont lus directement depuis le ZIP.
+    """
+    return os.getenv("PARTS_CANADA_EXTRAIRE", "1").strip().lower() not in ("0", "false", "non", "no")
+
+
+def nom_archive_conservee(nom_zip_temp: str):
+    """
+    Nom sous lequel une archive est conservée en mode streaming
+    (ex: "temp_inventory.zip" -> "inventory.zip").
+    """
+    return nom_zip_temp.replace("temp_", "").replace("_temp", "")
+
+
+def configuration_api():
+    """
+    Retourne l'URL de base de l'API et les en-têtes d'authentification.
+    """
+    base_url = os.getenv("API_BASE_URL")
+    bearer_token = os.getenv("PARTS_CANADA_API_TOKEN")
+
+    if not base_url or not bearer_token:
+        raise ValueError("Les variables d'environnement API_BASE_URL et PARTS_CANADA_API_TOKEN doivent être définies.")
+
+    headers = {
+        "Authorization": f"Bearer {bearer_token}"
+    }
+    return base_url, headers
+
+
+def obtenir_session(url: str):
+    """
+    Retourne la session persistante associée à l'hôte de l'URL,
+    en la créant au premier appel.
+    """
+    parties = urlsplit(url)
+    hote = f"{parties.scheme}://{parties.netloc}"
+
+    with _verrou_sessions:
+        session = _sessions.get(hote)
+        if session is None:
+            session = requests.Session()
+            adaptateur = HTTPAdapter(pool_connections=1, pool_maxsize=TAILLE_POOL_DEFAUT)
+            session.mount(f"{parties.scheme}://", adaptateur)
+            _sessions[hote] = session
+    return session
+
+
+def fermer_sessions():
+    """
+    Ferme toutes les sessions ouvertes (utile en fin de script).
+    """
+    with _verrou_sessions:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def desactiver_progression():
+    """
+    Désactive la barre de progression pour les téléchargements du thread courant.
+    """
+    _etat_thread.silencieux = True
+
+
+def progression_active():
+    """
+    Indique si la barre de progression doit être affichée dans ce thread.
+    """
+    return not getattr(_etat_thread, 'silencieux', False)
+
+
+def afficher_progression(telecharge: int, total: int):
+    """
+    Affiche la barre de progression du téléchargement sur une seule ligne.
+    """
+    progression = (telecharge / total) * 100 if total > 0 else 0
+    telecharge_mo = telecharge / (1024 * 1024)
+    total_mo = total / (1024 * 1024)
+    sys.stdout.write(f"\r     [{'=' * int(progression / 4):<25}] {telecharge_mo:.2f} Mo / {total_mo:.2f} Mo")
+    sys.stdout.flush()
+
+
+def ecrire_flux(response, destination: str, chunk_size: int = None, afficher: bool = None,
+                mode: str = "wb", deja_telecharge: int = 0, hacheur=None):
+    """
+    Écrit le corps d'une réponse en streaming dans un fichier.
+    C'est l'unique chemin d'écriture utilisé par tous les téléchargeurs.
+
+    Args:
+        mode: "wb" pour un nouveau fichier, "ab" pour compléter un fichier partiel.
+        deja_telecharge: octets déjà présents sur disque (reprise).
+        hacheur: objet hashlib optionnel mis à jour avec chaque bloc écrit.
+
+    Returns:
+        dict: 'octets' écrits, 'duree' (s) et 'debit' (octets/s).
+    """
+    chunk_size = chunk_size or taille_tampon()
+    if afficher is None:
+        afficher = progression_active()
+    total = deja_telecharge + int(response.headers.get('content-length', 0))
+    telecharge = 0
+    debut = time.perf_counter()
+
+    with open(destination, mode) as f:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            f.write(chunk)
+            if hacheur is not None:
+                hacheur.update(chunk)
+            telecharge += len(chunk)
+            signaler(octets=len(chunk))
+            ajouter_metrique(octets=len(chunk))
+            if afficher:
+                afficher_progression(deja_telecharge + telecharge, total)
+
+    duree = time.perf_counter() - debut
+    if afficher:
+        sys.stdout.write('\n')
+
+    return {
+        'octets': telecharge,
+        'duree': duree,
+        'debit': telecharge / duree if duree > 0 else 0,
+    }
+
+
+def chemin_etat(destination: str):
+    """
+    Retourne le chemin du fichier d'état (sidecar) d'un téléchargement partiel.
+    """
+    return destination + ".etat.json"
+
+
+def hacher_fichier(chemin: str, hacheur=None, chunk_size: int = None):
+    """
+    Calcule (ou complète) l'empreinte SHA-256 d'un fichier local.
+    """
+    hacheur = hacheur or hashlib.sha256()
+    chunk_size = chunk_size or taille_tampon()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(chunk_size), b''):
+            hacheur.update(bloc)
+    return hacheur
+
+
+def _lire_etat(destination: str):
+    try:
+        with open(chemin_etat(destination), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _ecrire_etat(destination: str, etat: dict):
+    with open(chemin_etat(destination), 'w', encoding='utf-8') as f:
+        json.dump(etat, f)
+
+
+def supprimer_partiel(destination: str):
+    """
+    Supprime un fichier partiel et son fichier d'état.
+    """
+    for chemin in (destination, chemin_etat(destination)):
+        if os.path.exists(chemin):
+            os.remove(chemin)
+
+
+def _telecharger_une_fois(url, destination, headers, params, verifier_reponse, chunk_size):
+    """
+    Une tentative de téléchargement, en reprenant le fichier partiel
+    existant (requête Range) quand c'est possible.
+    """
+    url_complete = requests.Request('GET', url, params=params).prepare().url
+    headers = dict(headers or {})
+    etat = _lire_etat(destination)
+    deja_telecharge = 0
+
+    # Reprise seulement si le partiel vient de la même URL et qu'un validateur
+    # (ETag / Last-Modified) garantit que le fichier distant n'a pas changé.
+    if etat and etat.get('url') == url_complete and os.path.exists(destination):
+        validateur = etat.get('etag') or etat.get('last_modified')
+        taille_partielle = os.path.getsize(destination)
+        if validateur and 0 < taille_partielle:
+            deja_telecharge = taille_partielle
+            headers['Range'] = f"bytes={deja_telecharge}-"
+            headers['If-Range'] = validateur
+
+    session = obtenir_session(url)
+    with session.get(url, headers=headers, params=params, stream=True) as response:
+        # Requête conditionnelle : le fichier distant n'a pas changé
+        if response.status_code == 304:
+            supprimer_partiel(destination)
+            return NON_MODIFIE
+
+        # Le partiel est déjà complet : rien à télécharger
+        if response.status_code == 416 and deja_telecharge and deja_telecharge == etat.get('taille'):
+            return dict(etat, octets=0, duree=0, debit=0,
+                        sha256=hacher_fichier(destination).hexdigest())
+
+        if response.status_code in CODES_REESSAYABLES:
+            raise ReponseTemporaire(
+                f"{response.status_code} {response.reason} : {url}", response=response,
+                attente=delai_retry_after(response.headers.get('Retry-After')),
+            )
+        response.raise_for_status()
+        if verifier_reponse is not None and not verifier_reponse(response):
+            return None
+
+        hacheur = hashlib.sha256()
+        if response.status_code == 206:
+            print(f"     Reprise du téléchargement à {deja_telecharge / (1024 * 1024):.2f} Mo.")
+            mode = "ab"
+            hacher_fichier(destination, hacheur)
+        else:
+            # Le serveur renvoie le fichier complet : on repart de zéro
+            deja_telecharge = 0
+            mode = "wb"
+            content_length = response.headers.get('content-length')
+            etat = {
+                'url': url_complete,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'taille': int(content_length) if content_length else None,
+            }
+            _ecrire_etat(destination, etat)
+
+        stats = ecrire_flux(response, destination, chunk_size=chunk_size,
+                            mode=mode, deja_telecharge=deja_telecharge, hacheur=hacheur)
+
+    # Vérification de la taille avant de déclarer le téléchargement terminé
+    taille_attendue = etat.get('taille')
+    taille_recue = os.path.getsize(destination)
+    if taille_attendue is not None and taille_recue != taille_attendue:
+        raise TelechargementIncomplet(
+            f"Téléchargement incomplet : {taille_recue} octets reçus sur {taille_attendue}."
+        )
+    stats.update(etag=etat.get('etag'), last_modified=etat.get('last_modified'),
+                 taille=taille_recue, sha256=hacheur.hexdigest())
+    return stats
+
+
+def telecharger_fichier(url: str, destination: str, headers=None, params=None,
+                        verifier_reponse=None, chunk_size: int = None):
+    """
+    Télécharge une URL vers un fichier local via la session de l'hôte.
+    En cas de coupure réseau, le fichier partiel et son état sont conservés
+    et la tentative suivante reprend avec une requête Range. Les réponses
+    429 et 503 sont retentées après le délai Retry-After, ou le backoff s'il
+    est absent.
+
+    Args:
+        verifier_reponse: fonction optionnelle appelée avec la réponse avant
+            l'écriture ; si elle retourne False, rien n'est écrit.
+
+    Returns:
+        dict: statistiques de ecrire_flux (avec etag, last_modified, taille et
+        sha256), NON_MODIFIE sur une réponse 304, ou None si la réponse a été refusée.
+    """
+    tentatives = nombre_tentatives()
+    with etape("telechargement"):
+        for tentative in range(1, tentatives + 1):
+            try:
+                return _telecharger_une_fois(url, destination, headers, params, verifier_reponse, chunk_size)
+            except ERREURS_TRANSITOIRES + (ReponseTemporaire,) as e:
+                if tentative == tentatives:
+                    raise
+                attente = getattr(e, 'attente', None)
+                if attente is None:
+                    attente = 2 ** (tentative - 1)
+                print(f"\n     Tentative {tentative}/{tentatives} interrompue ({e}). Reprise dans {attente} s...")
+                time.sleep(attente)
+
+
+def verifier_zip(chemin_zip: str):
+    """
+    Vérifie l'intégrité (CRC) de tous les membres d'une archive ZIP.
+    """
+    with zipfile.ZipFile(chemin_zip, 'r') as zf:
+        membre_corrompu = zf.testzip()
+    if membre_corrompu is not None:
+        raise zipfile.BadZipFile(f"Membre corrompu dans l'archive : {membre_corrompu}")
+
+
+def telecharger_et_extraire_zip(url: str, target_folder: str, nom_zip_temp: str,
+                                headers=None, params=None, verifier_reponse=None,
+                                cle_cache: str = None, metadonnees=None, force: bool = False,
+                                extraire: bool = None):
+    """
+    Télécharge une archive ZIP dans un fichier temporaire, vérifie son
+    intégrité, l'extrait dans target_folder puis supprime le fichier temporaire.
+    Après une erreur réseau, le fichier temporaire est conservé pour être
+    repris au prochain appel.
+
+    Avec cle_cache, la requête est conditionnelle (ETag / Last-Modified du
+    manifeste) et l'extraction est sautée si le contenu n'a pas changé.
+
+    Avec extraire=False (ou PARTS_CANADA_EXTRAIRE=0), rien n'est extrait :
+    l'archive est conservée et les noms retournés sont de la forme
+    "archive.zip::membre.csv", lisibles via sources_csv.ouvrir_source_csv.
+
+    Returns:
+        tuple: (noms des fichiers extraits, True si le contenu a changé),
+        ou None si la réponse a été refusée.
+    """
+    if extraire is None:
+        extraire = extraction_activee()
+    os.makedirs(target_folder, exist_ok=True)
+    temp_zip_path = os.path.join(target_folder, nom_zip_temp)
+
+    manifeste = None
+    if cle_cache and not force:
+        manifeste = lire_manifeste(cle_cache)
+        if not fichiers_presents(manifeste, target_folder):
+            manifeste = None
+    headers = dict(headers or {}, **en_tetes_conditionnels(manifeste))
+
+    try:
+        signaler(etape=f"téléchargement {os.path.basename(nom_zip_temp)}")
+        stats = telecharger_fichier(url, temp_zip_path, headers=headers, params=params,
+                                    verifier_reponse=verifier_reponse)
+        if stats is None:
+            supprimer_partiel(temp_zip_path)
+            return None
+        if stats == NON_MODIFIE:
+            print("     Archive inchangée depuis le dernier téléchargement (304).")
+            return manifeste['fichiers'], False
+        print(f"     Téléchargement du ZIP réussi ({stats['debit'] / (1024 * 1024):.2f} Mo/s).")
+
+        if manifeste and manifeste.get('sha256') == stats['sha256']:
+            print("     Contenu identique au dernier téléchargement : extraction sautée.")
+            noms, modifie = manifeste['fichiers'], False
+        elif extraire:
+            signaler(etape=f"extraction {os.path.basename(nom_zip_temp)}")
+            with etape("extraction") as mesure:
+                verifier_zip(temp_zip_path)
+                with zipfile.ZipFile(temp_zip_path, 'r') as zf:
+                    zf.extractall(target_folder)
+                    noms = zf.namelist()
+                    mesure.ajouter(octets=sum(info.file_size for info in zf.infolist()))
+            modifie = True
+            print(f"     Fichiers extraits avec succès dans '{target_folder}'.")
+        else:
+            with etape("verification_archive"):
+                verifier_zip(temp_zip_path)
+            nom_archive = nom_archive_conservee(nom_zip_temp)
+            with zipfile.ZipFile(temp_zip_path, 'r') as zf:
+                noms = [f"{nom_archive}{SEPARATEUR_MEMBRE}{nom}" for nom in zf.namelist()]
+            os.replace(temp_zip_path, os.path.join(target_folder, nom_archive))
+            modifie = True
+            print(f"     Archive conservée sans extraction : '{nom_archive}'.")
+    except ERREURS_TRANSITOIRES:
+        if os.path.exists(temp_zip_path):
+            print(f"     Fichier partiel '{os.path.basename(temp_zip_path)}' conservé pour reprise.")
+        raise
+    except zipfile.BadZipFile:
+        # Un partiel corrompu ne doit pas être repris
+        supprimer_partiel(temp_zip_path)
+        raise
+
+    if os.path.exists(temp_zip_path):
+        print(f"     Fichier temporaire '{os.path.basename(temp_zip_path)}' supprimé.")
+    supprimer_partiel(temp_zip_path)
+
+    if cle_cache:
+        ecrire_manifeste(cle_cache, {
+            'url': url,
+            'etag': stats['etag'],
+            'last_modified': stats['last_modified'],
+            'taille': stats['taille'],
+            'sha256': stats['sha256'],
+            'fichiers': noms,
+            'metadonnees': metadonnees,
+        })
+    return noms, modifie
+
+
+def metadonnees_inchangees(cle_cache: str, metadonnees, target_folder: str):
+    """
+    Indique si les métadonnées d'une ressource (par ex. la réponse de
+    GET /catalogues/{name}) sont identiques à celles du dernier téléchargement
+    et que les fichiers extraits sont toujours présents.
+    """
+    manifeste = lire_manifeste(cle_cache)
+    return (
+        manifeste is not None
+        and manifeste.get('metadonnees') == metadonnees
+        and fichiers_presents(manifeste, target_folder)
+    )
+
+
+def premier_csv(noms):
+    """
+    Retourne le premier nom de fichier .csv d'une liste de membres ZIP.
+    """
+    csv_files = [name for name in noms if name.endswith('.csv')]
+    if not csv_files:
+        raise FileNotFoundError("Aucun fichier CSV trouvé dans l'archive.")
+    return csv_files[0]
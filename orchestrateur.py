@@ -0,0 +1,396 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+from sources_csv import trouver_source, chemin_sur_disque
+from moteur_telechargement import hacher_fichier
+from file_travaux import travail_courant, signaler
+from rafraichir_catalogues import CATALOGUES_A_GERER
+from parallelisme import nombre_workers, preparer_worker
+from telecharger_inventaire import download_inventory_file
+from download_extended_inventory import download_extended_inventory_file
+from download_commodity_codes import download_commodity_codes_file
+from download_and_save_catalog_details import download_and_save_catalog_files
+from download_product_features import download_product_features_file, chemin_magasin
+from transform_commodity import transformer_codes_commodite, COMMODITY_FOLDER
+from combiner_features import lancer_combinaison_caracteristiques, MOTIF_FEATURES
+from Filtrer_CSV_par_Code import (filtrer_par_codes, chemin_export, CODE_A_FILTRER_DEFAUT, FICHIER_ENTREE,
+                                  REPERTOIRE_SORTIE)
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# Empreintes des entrées et sorties de chaque étape lors de sa dernière exécution réussie
+FICHIER_ETAT = ".etat_orchestrateur.json"
+
+# Un téléchargement réussi depuis moins longtemps est considéré à jour
+# (l'API limite le nombre de requêtes par jour ; --rafraichir ignore ce délai)
+VALIDITE_TELECHARGEMENT = 12 * 3600
+
+FICHIER_INVENTAIRE = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanadaCSV_8374000.csv")
+FICHIER_CODES = os.path.join(COMMODITY_FOLDER, "commodity_codes.csv")
+FICHIER_CODES_FUSIONNES = os.path.join(COMMODITY_FOLDER, "commodity_codes_fusionnes.csv")
+
+# Issue de chaque étape
+A_JOUR = "a_jour"
+EXECUTEE = "executee"
+ECHEC = "echec"
+ANNULEE = "annulee"
+
+_verrou_etat = threading.Lock()
+
+
+class Tache:
+    """
+    Une étape du pipeline : ce qu'elle lit (entrees), ce qu'elle produit
+    (sorties) et les étapes qui produisent ses entrées (dependances).
+    Entrées et sorties sont des chemins de CSV (éventuellement lus dans une
+    archive, voir sources_csv.trouver_source) ou des motifs glob.
+
+    Une tâche distante (téléchargement) n'a pas d'entrée locale : elle est
+    à jour pendant VALIDITE_TELECHARGEMENT après sa dernière exécution.
+    """
+
+    def __init__(self, nom, fonction, entrees=(), sorties=(), dependances=(), distante=False, parametres=None):
+        self.nom = nom
+        self.fonction = fonction
+        self.entrees = list(entrees)
+        self.sorties = list(sorties)
+        self.dependances = list(dependances)
+        self.distante = distante
+        self.parametres = parametres
+
+
+def _transformer_codes():
+    if transformer_codes_commodite() is None:
+        raise RuntimeError("La transformation des codes de commodité a échoué.")
+
+
+def _exporter_odoo(codes):
+    resultats = filtrer_par_codes(codes)
+    if not resultats:
+        raise RuntimeError("Aucun export Odoo écrit.")
+    echecs = sorted(code for code, lignes in resultats.items() if lignes is None)
+    if echecs:
+        raise RuntimeError(f"Export Odoo en échec pour : {', '.join(echecs)}")
+
+
+def definir_taches(codes=None, catalogues=None):
+    """
+    Déclare les étapes du pipeline et leurs dépendances.
+
+    Args:
+        codes: Codes exportés par 'export-odoo' (liste, ou "all" pour tous).
+        catalogues: Catalogues dont les 'features' alimentent la combinaison.
+
+    Returns:
+        dict: {nom: Tache}
+    """
+    codes = codes or [CODE_A_FILTRER_DEFAUT]
+    catalogues = list(catalogues or CATALOGUES_A_GERER)
+    if codes == "all" or codes == ["all"]:
+        codes, exports = "all", [os.path.join(REPERTOIRE_SORTIE, "parts_canada_*.csv")]
+    else:
+        codes = [str(code) for code in codes]
+        exports = [chemin_export(code) for code in codes]
+
+    taches = [
+        Tache("inventaire", lambda: download_inventory_file(endpoint="/inventory"),
+              sorties=[FICHIER_INVENTAIRE], distante=True),
+        Tache("inventaire-etendu", download_extended_inventory_file,
+              sorties=[os.path.join("INVENTAIRE-ETENDU-PARTS-CANADA", "*.csv")], distante=True),
+        Tache("codes-commodite", lambda: download_commodity_codes_file(transformer=False),
+              sorties=[FICHIER_CODES], distante=True),
+        Tache("transformation-codes", _transformer_codes,
+              entrees=[FICHIER_CODES], sorties=[FICHIER_CODES_FUSIONNES], dependances=["codes-commodite"]),
+    ]
+    for nom in catalogues:
+        taches.append(Tache(f"catalogue-{nom}",
+                            lambda nom=nom: download_and_save_catalog_files(nom, avec_features=False),
+                            distante=True))
+        taches.append(Tache(f"features-{nom}", lambda nom=nom: download_product_features_file(nom),
+                            sorties=[chemin_magasin(nom)], distante=True))
+    taches += [
+        Tache("combinaison", lancer_combinaison_caracteristiques,
+              entrees=[FICHIER_INVENTAIRE, MOTIF_FEATURES], sorties=[FICHIER_ENTREE],
+              dependances=["inventaire"] + [f"features-{nom}" for nom in catalogues]),
+        # La catégorie Odoo vient de la hiérarchie des codes (commodity_codes.csv)
+        Tache("export-odoo", lambda: _exporter_odoo(codes),
+              entrees=[FICHIER_ENTREE, FICHIER_CODES], sorties=exports,
+              dependances=["combinaison", "codes-commodite"], parametres={'codes': codes}),
+    ]
+    return {tache.nom: tache for tache in taches}
+
+
+def ordre_execution(cibles, taches):
+    """
+    Retourne les cibles et toutes leurs dépendances, chaque étape après
+    celles dont elle dépend.
+
+    Raises:
+        ValueError: cible inconnue ou dépendance circulaire.
+    """
+    ordre, en_cours = [], set()
+
+    def visiter(nom):
+        if nom in ordre:
+            return
+        if nom not in taches:
+            raise ValueError(f"Étape inconnue : '{nom}'. Étapes disponibles : {', '.join(taches)}")
+        if nom in en_cours:
+            raise ValueError(f"Dépendance circulaire autour de '{nom}'.")
+        en_cours.add(nom)
+        for dependance in taches[nom].dependances:
+            visiter(dependance)
+        en_cours.discard(nom)
+        ordre.append(nom)
+
+    for cible in cibles:
+        visiter(cible)
+    return ordre
+
+
+# --- Empreintes de contenu ---
+
+def lire_etat():
+    try:
+        with open(FICHIER_ETAT, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'fichiers': {}, 'taches': {}}
+
+
+def enregistrer_etat(etat: dict):
+    with _verrou_etat:
+        with open(FICHIER_ETAT + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(etat, f, indent=2, ensure_ascii=False)
+        os.replace(FICHIER_ETAT + ".tmp", FICHIER_ETAT)
+
+
+def fichiers_de(motif: str):
+    """
+    Fichiers présents sur disque pour une entrée ou une sortie : ceux du motif
+    glob, ou le CSV (ou l'archive qui le contient en mode streaming).
+    """
+    if any(caractere in motif for caractere in "*?["):
+        return sorted(glob.glob(motif))
+    chemin = chemin_sur_disque(trouver_source(motif))
+    return [chemin] if os.path.exists(chemin) else []
+
+
+def empreinte_fichier(chemin: str, connues: dict):
+    """
+    SHA-256 du contenu d'un fichier. Le calcul n'est refait que si la taille
+    ou la date du fichier ont changé depuis la dernière empreinte (`connues`).
+    """
+    stat = os.stat(chemin)
+    connue = connues.get(chemin)
+    if connue and connue['taille'] == stat.st_size and connue['mtime_ns'] == stat.st_mtime_ns:
+        return connue['sha256']
+    sha256 = hacher_fichier(chemin).hexdigest()
+    with _verrou_etat:
+        connues[chemin] = {'taille': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return sha256
+
+
+def empreintes(motifs, connues: dict):
+    """
+    Empreintes des fichiers de chaque motif : {motif: {chemin: sha256}}.
+    Un motif sans fichier vaut None.
+    """
+    return {motif: {chemin: empreinte_fichier(chemin, connues) for chemin in fichiers_de(motif)} or None
+            for motif in motifs}
+
+
+def raison_d_executer(tache: Tache, etat: dict, rafraichir: bool = False):
+    """
+    Retourne pourquoi l'étape doit être exécutée, ou None si elle est à jour.
+    """
+    precedente = etat['taches'].get(tache.nom)
+    if precedente is None:
+        return "jamais exécutée"
+    sorties = empreintes(tache.sorties, etat['fichiers'])
+    if any(fichiers is None for fichiers in sorties.values()):
+        return "sortie absente"
+    if sorties != precedente['sorties']:
+        return "sortie modifiée depuis la dernière exécution"
+    if tache.distante:
+        if rafraichir:
+            return "rafraîchissement demandé"
+        if time.time() - precedente['date'] > VALIDITE_TELECHARGEMENT:
+            return f"téléchargement de plus de {VALIDITE_TELECHARGEMENT // 3600} h"
+        return None
+    if tache.parametres != precedente.get('parametres'):
+        return "paramètres modifiés"
+    if empreintes(tache.entrees, etat['fichiers']) != precedente['entrees']:
+        return "entrées modifiées"
+    return None
+
+
+# --- Exécution ---
+
+def _executer_tache(tache: Tache, etat: dict, rafraichir: bool, force: bool, travail=None):
+    """
+    Exécute une étape si elle n'est pas à jour, dans un worker, et retourne son résultat.
+    """
+    preparer_worker(travail)
+    debut = time.perf_counter()
+    try:
+        raison = "exécution forcée" if force else raison_d_executer(tache, etat, rafraichir)
+        if raison is None:
+            print(f"[{tache.nom}] à jour.")
+            return {'statut': A_JOUR, 'raison': None, 'erreur': None, 'duree': time.perf_counter() - debut}
+
+        print(f"[{tache.nom}] exécution ({raison})...")
+        signaler(etape=tache.nom)
+        # Empreintes des entrées telles que l'étape les a lues
+        entrees = empreintes(tache.entrees, etat['fichiers'])
+        tache.fonction()
+
+        sorties = empreintes(tache.sorties, etat['fichiers'])
+        manquantes = [motif for motif, fichiers in sorties.items() if fichiers is None]
+        if manquantes:
+            raise RuntimeError(f"Sorties absentes après l'exécution : {', '.join(manquantes)}")
+        with _verrou_etat:
+            etat['taches'][tache.nom] = {'entrees': entrees, 'sorties': sorties,
+                                         'parametres': tache.parametres, 'date': time.time()}
+        enregistrer_etat(etat)
+        return {'statut': EXECUTEE, 'raison': raison, 'erreur': None, 'duree': time.perf_counter() - debut}
+    except Exception as e:
+        print(f"[{tache.nom}] échec : {e}")
+        return {'statut': ECHEC, 'raison': None, 'erreur': str(e), 'duree': time.perf_counter() - debut}
+
+
+def executer(cibles, taches=None, max_workers=None, rafraichir: bool = False, force: bool = False):
+    """
+    Met les cibles à jour : leurs dépendances d'abord, les branches
+    indépendantes en parallèle (au plus max_workers étapes à la fois).
+    Une étape dont les entrées n'ont pas changé depuis sa dernière exécution
+    est sautée ; les dépendants d'une étape en échec sont annulés.
+
+    Args:
+        rafraichir (bool): Relancer les téléchargements même récents (requêtes conditionnelles).
+        force (bool): Exécuter toutes les étapes, même à jour.
+
+    Returns:
+        dict: pour chaque étape, 'statut', 'raison', 'erreur' et 'duree'.
+    """
+    taches = taches or definir_taches()
+    ordre = ordre_execution(cibles, taches)
+    max_workers = nombre_workers(max_workers)
+    etat = lire_etat()
+    travail = travail_courant()
+
+    print(f"{len(ordre)} étape(s) pour {', '.join(cibles)}, {max_workers} à la fois...")
+    debut = time.perf_counter()
+    rapport = {}
+    restantes = list(ordre)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etape") as executor:
+        en_cours = {}
+        while restantes or en_cours:
+            # L'ordre topologique propage les annulations en un seul passage
+            for nom in list(restantes):
+                dependances = taches[nom].dependances
+                if any(rapport.get(d, {}).get('statut') in (ECHEC, ANNULEE) for d in dependances):
+                    restantes.remove(nom)
+                    rapport[nom] = {'statut': ANNULEE, 'raison': None, 'erreur': "dépendance en échec",
+                                    'duree': 0.0}
+                elif all(d in rapport for d in dependances):
+                    restantes.remove(nom)
+                    future = executor.submit(_executer_tache, taches[nom], etat, rafraichir, force, travail)
+                    en_cours[future] = nom
+            if not en_cours:
+                continue
+            terminees, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in terminees:
+                rapport[en_cours.pop(future)] = future.result()
+
+    enregistrer_etat(etat)
+    afficher_rapport({nom: rapport[nom] for nom in ordre})
+    print(f"Pipeline terminé en {time.perf_counter() - debut:.1f} s.")
+    return rapport
+
+
+def plan(cibles, taches=None, rafraichir: bool = False, force: bool = False):
+    """
+    Retourne, sans rien exécuter, la raison d'exécuter chaque étape
+    (None si elle est à jour). Une étape dont une dépendance sera exécutée
+    est marquée comme pouvant l'être : ses entrées changeront peut-être.
+    """
+    taches = taches or definir_taches()
+    etat = lire_etat()
+    raisons = {}
+    for nom in ordre_execution(cibles, taches):
+        raison = "exécution forcée" if force else raison_d_executer(taches[nom], etat, rafraichir)
+        if raison is None and any(raisons[d] is not None for d in taches[nom].dependances):
+            raison = "selon les dépendances"
+        raisons[nom] = raison
+    return raisons
+
+
+def afficher_rapport(rapport):
+    """
+    Affiche l'issue de chaque étape.
+    """
+    print("\n--- Rapport du pipeline ---")
+    for nom, res in rapport.items():
+        if res['statut'] == EXECUTEE:
+            statut = f"exécutée ({res['raison']})"
+        elif res['statut'] == A_JOUR:
+            statut = "à jour"
+        else:
+            statut = f"{res['statut'].upper()} ({res['erreur']})"
+        print(f"  {nom:<26} {res['duree']:>7.1f} s  {statut}")
+
+
+def rapport_en_succes(rapport):
+    """
+    Retourne True si aucune étape n'a échoué ou n'a été annulée.
+    """
+    return all(res['statut'] in (A_JOUR, EXECUTEE) for res in rapport.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Met à jour une ou plusieurs étapes du pipeline et seulement celles dont elles dépendent."
+    )
+    parser.add_argument("cibles", nargs="*", default=["export-odoo"],
+                        help="Étapes à mettre à jour (défaut : export-odoo), ou 'tout'.")
+    parser.add_argument("--codes", nargs="+", default=None,
+                        help=f"Codes exportés par export-odoo (défaut : {CODE_A_FILTRER_DEFAUT}), ou 'all'.")
+    parser.add_argument("--catalogues", nargs="+", default=None,
+                        help="Catalogues dont les 'features' sont combinées (défaut : tous les catalogues gérés).")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Nombre d'étapes exécutées simultanément.")
+    parser.add_argument("--rafraichir", action="store_true",
+                        help="Relancer les téléchargements même s'ils sont récents.")
+    parser.add_argument("--force", action="store_true", help="Exécuter toutes les étapes, même à jour.")
+    parser.add_argument("--liste", action="store_true", help="Afficher les étapes et leurs dépendances.")
+    parser.add_argument("--simulation", action="store_true",
+                        help="Afficher ce qui serait exécuté, sans rien exécuter.")
+    args = parser.parse_args()
+
+    taches = definir_taches(args.codes, args.catalogues)
+    cibles = list(taches) if args.cibles == ["tout"] else args.cibles
+
+    try:
+        if args.liste:
+            for tache in taches.values():
+                dependances = f" <- {', '.join(tache.dependances)}" if tache.dependances else ""
+                print(f"{tache.nom}{' (téléchargement)' if tache.distante else ''}{dependances}")
+        elif args.simulation:
+            for nom, raison in plan(cibles, taches, args.rafraichir, args.force).items():
+                print(f"  {nom:<26} {'à exécuter : ' + raison if raison else 'à jour'}")
+        else:
+            rapport = executer(cibles, taches, args.workers, args.rafraichir, args.force)
+            sys.exit(0 if rapport_en_succes(rapport) else 1)
+    except ValueError as e:
+        print(f"Erreur : {e}")
+        sys.exit(2)
@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from moteur_telechargement import desactiver_progression
+from file_travaux import travail_courant, definir_travail_courant
+
+# Nombre de tâches simultanées par défaut (surchargeable via
+# PARTS_CANADA_MAX_WORKERS). Le travail est limité par le réseau, pas le CPU.
+MAX_WORKERS_DEFAUT = 4
+
+
+def nombre_workers(max_workers=None):
+    """
+    Retourne la limite de parallélisme à utiliser.
+    """
+    if max_workers is None:
+        max_workers = os.getenv("PARTS_CANADA_MAX_WORKERS", MAX_WORKERS_DEFAUT)
+    max_workers = int(max_workers)
+    if max_workers < 1:
+        raise ValueError("Le nombre de workers doit être au moins 1.")
+    return max_workers
+
+
+def preparer_worker(travail=None):
+    """
+    Prépare le thread d'un worker : pas de barre de progression, et les octets
+    et lignes traités sont comptés dans le travail parent.
+    """
+    desactiver_progression()
+    definir_travail_courant(travail)
+
+
+def executer_capture(fonction, travail=None):
+    """
+    Exécute `fonction` (sans argument) dans un worker et capture son résultat.
+
+    Returns:
+        dict: 'succes', 'resultat', 'erreur' et 'duree'.
+    """
+    preparer_worker(travail)
+    debut = time.perf_counter()
+    try:
+        resultat = fonction()
+        return {'succes': True, 'resultat': resultat, 'erreur': None,
+                'duree': time.perf_counter() - debut}
+    except Exception as e:
+        return {'succes': False, 'resultat': None, 'erreur': str(e),
+                'duree': time.perf_counter() - debut}
+
+
+def executer_en_parallele(appels: dict, max_workers=None, nom_threads: str = "worker"):
+    """
+    Exécute des appels indépendants avec au plus max_workers threads. L'échec
+    d'un appel n'interrompt pas les autres.
+
+    Args:
+        appels (dict): {clé: fonction sans argument (ex: functools.partial)}.
+
+    Yields:
+        tuple: (clé, résultat de executer_capture), dans l'ordre des appels,
+        dès que chaque résultat est disponible.
+    """
+    travail = travail_courant()
+    with ThreadPoolExecutor(max_workers=nombre_workers(max_workers), thread_name_prefix=nom_threads) as executor:
+        futures = {cle: executor.submit(executer_capture, fonction, travail) for cle, fonction in appels.items()}
+        for cle, future in futures.items():
+            yield cle, future.result()
@@ -0,0 +1,89 @@
+import sys
+import time
+import argparse
+import functools
+from dotenv import load_dotenv
+
+from download_and_save_catalog_details import download_and_save_catalog_files
+from download_product_features import download_product_features_file
+from parallelisme import MAX_WORKERS_DEFAUT, nombre_workers, executer_en_parallele
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# --- CONFIGURATION DE LA LISTE DES CATALOGUES ---
+CATALOGUES_A_GERER = [
+    "snow",
+    "fatbook",
+    "street",
+    "atv-utv",
+    "offroad",
+    "tire-and-service",
+    "oldbook"
+]
+
+def _telecharger_catalogue(catalog_name):
+    return download_and_save_catalog_files(catalog_name, avec_features=False)
+
+
+def rafraichir_tous_les_catalogues(catalogues=None, max_workers=None, features_complet=False):
+    """
+    Télécharge en parallèle les métadonnées, l'archive et les 'features'
+    de chaque catalogue, avec un nombre borné de workers.
+    Les 'features' sont synchronisées de façon incrémentale, sauf si
+    features_complet est vrai.
+
+    Returns:
+        dict: pour chaque catalogue, {'catalogue': {...}, 'features': {...}}
+        avec 'succes', 'resultat', 'erreur' et 'duree'.
+    """
+    catalogues = list(catalogues or CATALOGUES_A_GERER)
+    max_workers = nombre_workers(max_workers)
+
+    print(f"Rafraîchissement de {len(catalogues)} catalogue(s) avec {max_workers} worker(s)...")
+    debut = time.perf_counter()
+
+    appels = {}
+    for catalog_name in catalogues:
+        appels[catalog_name, 'catalogue'] = functools.partial(_telecharger_catalogue, catalog_name)
+        appels[catalog_name, 'features'] = functools.partial(download_product_features_file, catalog_name,
+                                                             complet=features_complet)
+    rapport = {}
+    for (catalog_name, etape), resultat in executer_en_parallele(appels, max_workers, "catalogue"):
+        rapport.setdefault(catalog_name, {})[etape] = resultat
+
+    afficher_rapport(rapport)
+    print(f"Rafraîchissement terminé en {time.perf_counter() - debut:.1f} s.")
+    return rapport
+
+
+def afficher_rapport(rapport):
+    """
+    Affiche le succès ou l'échec de chaque catalogue.
+    """
+    print("\n--- Rapport de rafraîchissement ---")
+    for catalog_name, etapes in rapport.items():
+        for etape, res in etapes.items():
+            statut = "OK" if res['succes'] else f"ÉCHEC ({res['erreur']})"
+            print(f"  {catalog_name:<18} {etape:<10} {res['duree']:>7.1f} s  {statut}")
+
+
+def rapport_en_succes(rapport):
+    """
+    Retourne True si toutes les étapes de tous les catalogues ont réussi.
+    """
+    return all(res['succes'] for etapes in rapport.values() for res in etapes.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rafraîchit tous les catalogues Parts Canada en parallèle.")
+    parser.add_argument("catalogues", nargs="*", help="Catalogues à rafraîchir (par défaut : tous).")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help=f"Nombre de téléchargements simultanés (défaut : {MAX_WORKERS_DEFAUT}).")
+    parser.add_argument("--features-complet", action="store_true",
+                        help="Resynchroniser toutes les features au lieu du delta depuis la dernière synchronisation.")
+    args = parser.parse_args()
+
+    rapport = rafraichir_tous_les_catalogues(args.catalogues, max_workers=args.workers,
+                                             features_complet=args.features_complet)
+    sys.exit(0 if rapport_en_succes(rapport) else 1)
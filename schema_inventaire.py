@@ -0,0 +1,86 @@
+import pandas as pd
+
+# Schéma des colonnes de l'inventaire Parts Canada (PartsCanadaCSV_8374000.csv et
+# PartsCanada_with_Features.csv). Les colonnes absentes du schéma gardent le type déduit par pandas.
+
+# Identifiants : toujours en texte (zéros en tête, codes alphanumériques)
+COLONNES_IDENTIFIANTS = ['Part Number', 'Old Part Number', 'Manufacturer Part Number', 'UPC Code']
+
+# Textes très répétés d'une ligne à l'autre : stockés une seule fois par valeur
+COLONNES_CATEGORIES = ['Brand', 'Commodity Code']
+
+# Prix : float64 (float32 perd les centimes au-delà d'environ 131 072 $ et s'écrit
+# en notation exponentielle à partir de 1e6 dans les exports)
+COLONNES_PRIX = ['MSRP Latest', 'Dealer Discounted Price']
+
+# Quantités : entiers compacts, avec valeurs manquantes possibles
+COLONNES_QUANTITES = ['CAL Qty Available', 'Lon Qty Available']
+
+SCHEMA_INVENTAIRE = {
+    **{col: str for col in COLONNES_IDENTIFIANTS},
+    **{col: 'category' for col in COLONNES_CATEGORIES},
+    **{col: 'float64' for col in COLONNES_PRIX},
+    **{col: 'Int32' for col in COLONNES_QUANTITES},
+}
+
+# Version du schéma : la changer invalide les caches Parquet écrits avec l'ancien
+VERSION_SCHEMA = 2
+
+# Colonnes sans lesquelles le fichier d'inventaire est inutilisable
+COLONNES_OBLIGATOIRES = ['Part Number', 'Commodity Code']
+
+
+class SchemaInvalide(ValueError):
+    """
+    L'en-tête d'un fichier ne contient pas les colonnes attendues.
+    """
+
+
+def valider_entete(colonnes, obligatoires=COLONNES_OBLIGATOIRES, nom: str = "Le fichier"):
+    """
+    Vérifie que toutes les colonnes obligatoires sont présentes dans l'en-tête.
+
+    Raises:
+        SchemaInvalide: avec la liste des colonnes manquantes.
+    """
+    manquantes = [col for col in obligatoires if col not in set(colonnes)]
+    if manquantes:
+        raise SchemaInvalide(
+            f"{nom} ne contient pas les colonnes {manquantes}. Colonnes disponibles : {list(colonnes)}"
+        )
+
+
+def types_pour(colonnes, dtype=None):
+    """
+    Types de lecture (dtype de pandas) du schéma pour les colonnes présentes,
+    éventuellement surchargés par `dtype`.
+    """
+    colonnes = set(colonnes)
+    types = {col: typ for col, typ in SCHEMA_INVENTAIRE.items() if col in colonnes}
+    types.update(dtype or {})
+    return types
+
+
+def appliquer_schema(df: pd.DataFrame):
+    """
+    Convertit les colonnes d'un DataFrame déjà chargé aux types du schéma.
+    """
+    return df.astype(types_pour(df.columns))
+
+
+def en_texte(df: pd.DataFrame):
+    """
+    Retourne une copie où les colonnes catégorielles redeviennent du texte
+    (pour concaténer des chaînes ou remplir des valeurs manquantes librement).
+    """
+    categories = df.select_dtypes('category').columns
+    if len(categories) == 0:
+        return df
+    return df.astype({col: object for col in categories})
+
+
+def memoire_mo(df: pd.DataFrame):
+    """
+    Mémoire occupée par un DataFrame, en Mo (chaînes comprises).
+    """
+    return df.memory_usage(deep=True).sum() / 2**20
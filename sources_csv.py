@@ -0,0 +1,95 @@
+import os
+import io
+import glob
+import zipfile
+import contextlib
+
+import pandas as pd
+
+# Séparateur entre le chemin d'une archive et le nom du membre CSV
+# (ex: "INVENTAIRE-PARTS-CANADA/inventory.zip::PartsCanadaCSV_8374000.csv")
+SEPARATEUR_MEMBRE = "::"
+
+
+def chemin_sur_disque(source: str):
+    """
+    Retourne le fichier réellement présent sur disque pour une source
+    (le CSV lui-même ou l'archive qui le contient).
+    """
+    return str(source).partition(SEPARATEUR_MEMBRE)[0]
+
+
+def _premier_membre_csv(zf):
+    membres = [nom for nom in zf.namelist() if nom.endswith('.csv')]
+    if not membres:
+        raise FileNotFoundError(f"Aucun fichier CSV trouvé dans l'archive {zf.filename}")
+    return membres[0]
+
+
+@contextlib.contextmanager
+def ouvrir_source_csv(source, mode_texte: bool = False, encoding: str = 'utf-8'):
+    """
+    Ouvre un CSV sur disque, ou le membre CSV d'une archive ZIP sans
+    l'extraire : les données sont décompressées au fil de la lecture.
+
+    Args:
+        source (str): Chemin d'un .csv, d'un .zip, ou "archive.zip::membre.csv".
+        mode_texte (bool): Retourner un flux texte (pour le module csv)
+            plutôt qu'un flux binaire (pour pandas).
+    """
+    chemin, _, membre = str(source).partition(SEPARATEUR_MEMBRE)
+    if chemin.lower().endswith('.zip'):
+        with zipfile.ZipFile(chemin, 'r') as zf:
+            with zf.open(membre or _premier_membre_csv(zf)) as f:
+                if mode_texte:
+                    yield io.TextIOWrapper(f, encoding=encoding, newline='')
+                else:
+                    yield f
+    elif mode_texte:
+        with open(chemin, 'r', encoding=encoding, newline='') as f:
+            yield f
+    else:
+        with open(chemin, 'rb') as f:
+            yield f
+
+
+def lire_csv_source(source, **kwargs):
+    """
+    Lit une source CSV (voir ouvrir_source_csv) dans un DataFrame.
+    Un DataFrame déjà chargé est retourné tel quel.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    with ouvrir_source_csv(source, encoding=kwargs.get('encoding', 'utf-8')) as f:
+        return pd.read_csv(f, **kwargs)
+
+
+def trouver_source(chemin_csv: str):
+    """
+    Retourne la source la plus récente pour un CSV attendu : le fichier
+    extrait s'il existe, ou l'archive conservée du même dossier qui le contient.
+    Si rien n'est trouvé, chemin_csv est retourné tel quel.
+    """
+    dossier, nom = os.path.split(chemin_csv)
+    candidats = []
+    if os.path.exists(chemin_csv):
+        candidats.append((os.path.getmtime(chemin_csv), chemin_csv))
+
+    for archive in glob.glob(os.path.join(dossier or '.', '*.zip')):
+        try:
+            with zipfile.ZipFile(archive, 'r') as zf:
+                if nom in zf.namelist():
+                    candidats.append((os.path.getmtime(archive), f"{archive}{SEPARATEUR_MEMBRE}{nom}"))
+        except zipfile.BadZipFile:
+            continue
+
+    if not candidats:
+        return chemin_csv
+    return max(candidats)[1]
+
+
+def source_existe(source: str):
+    """
+    Indique si le fichier sous-jacent d'une source existe.
+    """
+    return os.path.exists(chemin_sur_disque(source))
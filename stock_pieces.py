@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+import functools
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+from moteur_telechargement import configuration_api, obtenir_session
+from parallelisme import executer_en_parallele
+from sources_csv import lire_csv_source, trouver_source, chemin_sur_disque
+from instantane_quantites import date_instantane, lire_instantane, appliquer_quantites
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# L'endpoint accepte une liste de pièces séparées par des virgules
+TAILLE_LOT = 50
+
+# Limite de l'API : 10 requêtes par minute (surchargeable pour les tests)
+REQUETES_PAR_PERIODE = int(os.getenv("PARTS_CANADA_STOCK_REQUETES", 10))
+PERIODE_LIMITE = float(os.getenv("PARTS_CANADA_STOCK_PERIODE", 60))
+
+# Durée de validité d'un stock en cache (secondes)
+TTL_CACHE = float(os.getenv("PARTS_CANADA_STOCK_TTL", 300))
+
+# Temps maximal d'attente d'un créneau de l'API avant de se rabattre sur l'inventaire local
+DELAI_MAX_DEFAUT = 10.0
+
+# Inventaire local utilisé en dernier recours
+FICHIER_INVENTAIRE = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanadaCSV_8374000.csv")
+COLONNES_QUANTITE = ['CAL Qty Available', 'Lon Qty Available']
+
+
+class LimiteurDebit:
+    """
+    Seau à jetons : au plus `capacite` requêtes par `periode` secondes.
+    """
+
+    def __init__(self, capacite: int, periode: float):
+        self.capacite = capacite
+        self.periode = periode
+        self.jetons = float(capacite)
+        self.dernier = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def acquerir(self, delai_max: float):
+        """
+        Attend un jeton au plus delai_max secondes. Retourne False si le délai est dépassé.
+        """
+        limite = time.monotonic() + delai_max
+        while True:
+            with self._verrou:
+                maintenant = time.monotonic()
+                self.jetons = min(self.capacite,
+                                  self.jetons + (maintenant - self.dernier) * self.capacite / self.periode)
+                self.dernier = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return True
+                attente = (1 - self.jetons) * self.periode / self.capacite
+            if maintenant + attente > limite:
+                return False
+            time.sleep(attente)
+
+
+class CacheTTL:
+    """
+    Cache mémoire dont les entrées expirent après `ttl` secondes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._donnees = {}
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        with self._verrou:
+            entree = self._donnees.get(cle)
+            if entree is None or entree[1] < time.monotonic():
+                self._donnees.pop(cle, None)
+                return None
+            return entree[0]
+
+    def ecrire(self, cle, valeur):
+        with self._verrou:
+            self._donnees[cle] = (valeur, time.monotonic() + self.ttl)
+
+    def vider(self):
+        with self._verrou:
+            self._donnees.clear()
+
+
+limiteur = LimiteurDebit(REQUETES_PAR_PERIODE, PERIODE_LIMITE)
+cache_stock = CacheTTL(TTL_CACHE)
+
+# Quantités de l'inventaire local, rechargées quand le fichier change
+_inventaire_local = {'source': None, 'mtime': None, 'instantane': None, 'quantites': None}
+_verrou_inventaire = threading.Lock()
+
+
+def quantites_inventaire_local():
+    """
+    Retourne les quantités de l'inventaire local (Series indexée par Part Number),
+    corrigées par les dernières quantités rafraîchies si elles sont plus récentes,
+    ou None si aucun inventaire n'a été téléchargé.
+    """
+    source = trouver_source(FICHIER_INVENTAIRE)
+    chemin = chemin_sur_disque(source)
+    if not os.path.exists(chemin):
+        return None
+
+    with _verrou_inventaire:
+        mtime = os.path.getmtime(chemin)
+        instantane = date_instantane()
+        if (_inventaire_local['source'], _inventaire_local['mtime'], _inventaire_local['instantane']) \
+                != (source, mtime, instantane):
+            df = lire_csv_source(source, usecols=['Part Number'] + COLONNES_QUANTITE,
+                                 dtype={'Part Number': str})
+            recentes = lire_instantane(plus_recent_que=source)
+            if recentes is not None:
+                appliquer_quantites(df, recentes)
+            quantites = df[COLONNES_QUANTITE].fillna(0).sum(axis=1).astype(int)
+            quantites.index = df['Part Number']
+            _inventaire_local.update(source=source, mtime=mtime, instantane=instantane,
+                                     quantites=quantites[~quantites.index.duplicated(keep='last')])
+        return _inventaire_local['quantites']
+
+
+def _interroger_lot(lot, delai_max: float):
+    """
+    Interroge l'API pour un lot de pièces. Retourne {part_number: quantité}
+    pour les pièces reçues, ou {} si aucun créneau n'est disponible à temps.
+    """
+    if not limiteur.acquerir(delai_max):
+        return {}
+
+    base_url, headers = configuration_api()
+    url = f"{base_url}/inventory/{quote(','.join(lot), safe=',')}/stock"
+    response = obtenir_session(url).get(url, headers=headers, timeout=delai_max)
+    if response.status_code == 404:
+        return {}
+    response.raise_for_status()
+
+    donnees = response.json()
+    if isinstance(donnees, dict):
+        donnees = donnees.get('data', [donnees])
+    return {str(item['part_number']): item.get('quantity') for item in donnees if 'part_number' in item}
+
+
+def consulter_stocks(part_numbers, max_workers: int = None, delai_max: float = DELAI_MAX_DEFAUT):
+    """
+    Retourne le stock d'une liste de pièces : d'abord le cache, puis l'API
+    (lots parallèles, bornés par le limiteur de débit), et enfin l'inventaire
+    local pour les pièces que l'API n'a pas pu fournir dans le délai.
+
+    Returns:
+        dict: {part_number: {'quantite': int|None, 'source': 'cache'|'api'|'inventaire'|None}}
+    """
+    pieces = list(dict.fromkeys(str(p).strip() for p in part_numbers if str(p).strip()))
+    resultats = {}
+
+    a_interroger = []
+    for piece in pieces:
+        quantite = cache_stock.lire(piece)
+        if quantite is not None:
+            resultats[piece] = {'quantite': quantite, 'source': 'cache'}
+        else:
+            a_interroger.append(piece)
+
+    if a_interroger:
+        lots = [a_interroger[i:i + TAILLE_LOT] for i in range(0, len(a_interroger), TAILLE_LOT)]
+        appels = {i: functools.partial(_interroger_lot, lot, delai_max) for i, lot in enumerate(lots)}
+        for _, resultat in executer_en_parallele(appels, max_workers, "stock"):
+            if not resultat['succes']:
+                print(f"Erreur lors de la consultation du stock : {resultat['erreur']}")
+                continue
+            for piece, quantite in resultat['resultat'].items():
+                cache_stock.ecrire(piece, quantite)
+                resultats[piece] = {'quantite': quantite, 'source': 'api'}
+
+    manquantes = [piece for piece in pieces if piece not in resultats]
+    if manquantes:
+        quantites_locales = quantites_inventaire_local()
+        for piece in manquantes:
+            if quantites_locales is not None and piece in quantites_locales.index:
+                resultats[piece] = {'quantite': int(quantites_locales[piece]), 'source': 'inventaire'}
+            else:
+                resultats[piece] = {'quantite': None, 'source': None}
+
+    return {piece: resultats[piece] for piece in pieces}
+
+
+# Ce bloc permet de tester le module de manière autonome
+if __name__ == "__main__":
+    import sys
+    pieces_test = sys.argv[1:] or ["YTX14-BS"]
+    for piece, info in consulter_stocks(pieces_test).items():
+        print(f"{piece:<20} {info['quantite']!s:>8}  ({info['source']})")
@@ -0,0 +1,282 @@
+import os
+import io
+import csv
+import json
+import time
+import hashlib
+import tempfile
+import zipfile
+import argparse
+import threading
+import functools
+from urllib.parse import quote
+
+import requests
+import pandas as pd
+from dotenv import load_dotenv
+
+from moteur_telechargement import configuration_api, telecharger_fichier, supprimer_partiel
+from Filtrer_CSV_par_Code import PREFIXE_REFERENCE
+from file_travaux import signaler
+from parallelisme import executer_en_parallele
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# Magasin d'images adressé par contenu : IMAGES/objets/ab/abcdef....jpg
+DOSSIER_IMAGES = "IMAGES"
+DOSSIER_OBJETS = os.path.join(DOSSIER_IMAGES, "objets")
+FICHIER_INDEX = os.path.join(DOSSIER_IMAGES, "index.json")
+
+# Dates des dernières requêtes d'images : le quota est partagé entre les exécutions
+FICHIER_REQUETES = os.path.join(DOSSIER_IMAGES, "requetes.json")
+
+# L'API accepte au plus 10 pièces par requête
+TAILLE_LOT = 10
+
+# Limite documentée : 10 requêtes par 24 heures (surchargeable selon le contrat)
+REQUETES_PAR_PERIODE = int(os.getenv("PARTS_CANADA_IMAGES_REQUETES", 10))
+PERIODE_LIMITE = float(os.getenv("PARTS_CANADA_IMAGES_PERIODE", 24 * 3600))
+
+# Attente maximale d'un créneau avant de reporter les lots restants à la prochaine exécution
+DELAI_MAX_DEFAUT = 60.0
+
+EXTENSIONS_IMAGES = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff', '.bmp')
+
+
+
+class LimiteurPersistant:
+    """
+    Au plus `capacite` requêtes par fenêtre glissante de `periode` secondes.
+    Les dates des requêtes sont enregistrées dans `fichier` : un redémarrage
+    ou un lancement en ligne de commande ne remet pas le quota à zéro.
+    """
+
+    def __init__(self, capacite: int, periode: float, fichier: str):
+        self.capacite = capacite
+        self.periode = periode
+        self.fichier = fichier
+        self._verrou = threading.Lock()
+
+    def _dates_recentes(self, maintenant: float):
+        try:
+            with open(self.fichier, 'r', encoding='utf-8') as f:
+                dates = json.load(f)
+        except (OSError, ValueError):
+            dates = []
+        return sorted(d for d in dates if d > maintenant - self.periode)
+
+    def _enregistrer(self, dates):
+        os.makedirs(os.path.dirname(self.fichier) or '.', exist_ok=True)
+        with open(self.fichier + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(dates, f)
+        os.replace(self.fichier + ".tmp", self.fichier)
+
+    def acquerir(self, delai_max: float):
+        """
+        Attend un créneau au plus delai_max secondes. Retourne False si le délai est dépassé.
+        """
+        limite = time.time() + delai_max
+        while True:
+            with self._verrou:
+                maintenant = time.time()
+                dates = self._dates_recentes(maintenant)
+                if len(dates) < self.capacite:
+                    self._enregistrer(dates + [maintenant])
+                    return True
+                attente = dates[0] + self.periode - maintenant
+            if maintenant + attente > limite:
+                return False
+            time.sleep(attente)
+
+
+limiteur = LimiteurPersistant(REQUETES_PAR_PERIODE, PERIODE_LIMITE, FICHIER_REQUETES)
+_verrou_index = threading.Lock()
+
+
+def lire_index():
+    """
+    Retourne l'index {part_number: [{'sha256', 'fichier', 'nom_original'}]}.
+    Une liste vide signifie que l'API n'a aucune image pour la pièce.
+    """
+    try:
+        with open(FICHIER_INDEX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def ecrire_index(index: dict):
+    os.makedirs(DOSSIER_IMAGES, exist_ok=True)
+    with open(FICHIER_INDEX + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(FICHIER_INDEX + ".tmp", FICHIER_INDEX)
+
+
+def stocker_objet(contenu: bytes, nom_original: str):
+    """
+    Enregistre une image sous son empreinte SHA-256. Une image identique
+    déjà présente (partagée entre plusieurs pièces) n'est pas réécrite.
+
+    Returns:
+        dict: {'sha256', 'fichier', 'nom_original'}
+    """
+    empreinte = hashlib.sha256(contenu).hexdigest()
+    extension = os.path.splitext(nom_original)[1].lower()
+    relatif = os.path.join(empreinte[:2], empreinte + extension)
+    chemin = os.path.join(DOSSIER_OBJETS, relatif)
+    if not os.path.exists(chemin):
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        # Fichier temporaire propre à cet appel : deux threads peuvent stocker
+        # la même image au même moment, le dernier os.replace écrase à l'identique.
+        descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix=".tmp")
+        try:
+            with os.fdopen(descripteur, 'wb') as f:
+                f.write(contenu)
+            os.replace(temporaire, chemin)
+        except OSError:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            # Sous Windows, os.replace échoue si un autre thread vient de créer l'objet
+            if not os.path.exists(chemin):
+                raise
+    return {'sha256': empreinte, 'fichier': relatif.replace(os.sep, '/'), 'nom_original': nom_original}
+
+
+def pieces_depuis_export(chemin_export: str):
+    """
+    Retourne les Part Numbers d'un export Odoo (MICPARTSONLINE/parts_canada_<code>.csv).
+    """
+    references = pd.read_csv(chemin_export, usecols=['Internal Reference'], dtype=str)['Internal Reference']
+    references = references.dropna().str.strip()
+    pieces = references.str.slice(len(PREFIXE_REFERENCE)).where(
+        references.str.startswith(PREFIXE_REFERENCE), references
+    )
+    return list(dict.fromkeys(pieces[pieces != '']))
+
+
+def _associer_images(zf, lot):
+    """
+    Associe chaque image de l'archive à une pièce du lot : d'abord via le CSV
+    fourni dans l'archive, sinon d'après le nom du fichier image.
+    """
+    images = [nom for nom in zf.namelist() if nom.lower().endswith(EXTENSIONS_IMAGES)]
+    associations = {}
+
+    for nom_csv in (nom for nom in zf.namelist() if nom.lower().endswith('.csv')):
+        with zf.open(nom_csv) as f:
+            lecteur = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8-sig'))
+            for ligne in lecteur:
+                cles = {cle.lower().replace(' ', '_'): valeur for cle, valeur in ligne.items() if cle}
+                piece = cles.get('part_number')
+                fichier = next((v for k, v in cles.items() if k in ('image', 'file', 'filename', 'file_name')), None)
+                if piece and fichier:
+                    associations[os.path.basename(fichier)] = piece.strip()
+
+    resultat = {piece: [] for piece in lot}
+    for nom in images:
+        base = os.path.basename(nom)
+        piece = associations.get(base)
+        if piece is None:
+            if len(lot) == 1:
+                piece = lot[0]
+            else:
+                # Le plus long Part Number qui préfixe le nom de fichier
+                candidats = [p for p in lot if base.upper().startswith(p.upper())]
+                piece = max(candidats, key=len) if candidats else None
+        if piece in resultat:
+            resultat[piece].append(nom)
+    return resultat
+
+
+def _telecharger_lot(lot, delai_max: float):
+    """
+    Télécharge les images d'un lot de pièces et les range dans le magasin.
+
+    Returns:
+        dict: {part_number: [entrées d'index]}, ou None si aucun créneau n'était disponible.
+        Les pièces auxquelles aucune image de l'archive n'a pu être associée sont
+        absentes du résultat : elles seront redemandées à la prochaine exécution.
+    """
+    if not limiteur.acquerir(delai_max):
+        return None
+
+    base_url, headers = configuration_api()
+    url = f"{base_url}/images/{quote(','.join(lot), safe=',')}/download"
+    os.makedirs(DOSSIER_IMAGES, exist_ok=True)
+    temp_zip_path = os.path.join(DOSSIER_IMAGES, f"lot_{hashlib.sha1(url.encode()).hexdigest()[:12]}.zip")
+
+    try:
+        telecharger_fichier(url, temp_zip_path, headers=headers)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            # Aucune image pour ces pièces : on le note pour ne plus les redemander
+            supprimer_partiel(temp_zip_path)
+            return {piece: [] for piece in lot}
+        raise
+
+    try:
+        with zipfile.ZipFile(temp_zip_path, 'r') as zf:
+            resultat = {}
+            for piece, noms in _associer_images(zf, lot).items():
+                if noms:
+                    resultat[piece] = [stocker_objet(zf.read(nom), os.path.basename(nom)) for nom in noms]
+    finally:
+        supprimer_partiel(temp_zip_path)
+    return resultat
+
+
+def synchroniser_images(part_numbers, max_workers: int = None, delai_max: float = DELAI_MAX_DEFAUT,
+                        force: bool = False):
+    """
+    Télécharge en parallèle les images des pièces qui ne sont pas encore
+    dans le magasin. Les lots sans créneau disponible sont reportés.
+
+    Returns:
+        dict: compteurs 'pieces', 'deja_presentes', 'telechargees', 'non_associees',
+        'reportees', 'echecs', 'objets'.
+    """
+    index = lire_index()
+    pieces = list(dict.fromkeys(part_numbers))
+    a_telecharger = pieces if force else [p for p in pieces if p not in index]
+    lots = [a_telecharger[i:i + TAILLE_LOT] for i in range(0, len(a_telecharger), TAILLE_LOT)]
+
+    print(f"{len(pieces)} pièces, {len(pieces) - len(a_telecharger)} déjà présentes, "
+          f"{len(lots)} lot(s) à télécharger...")
+    compteurs = {'pieces': len(pieces), 'deja_presentes': len(pieces) - len(a_telecharger),
+                 'telechargees': 0, 'non_associees': 0, 'reportees': 0, 'echecs': 0}
+
+    appels = {i: functools.partial(_telecharger_lot, lot, delai_max) for i, lot in enumerate(lots)}
+    for i, execution in executer_en_parallele(appels, max_workers, "images"):
+        lot, resultat = lots[i], execution['resultat']
+        if not execution['succes']:
+            print(f"Échec du lot {lot[0]}... : {execution['erreur']}")
+            compteurs['echecs'] += len(lot)
+            continue
+        if resultat is None:
+            compteurs['reportees'] += len(lot)
+            continue
+        with _verrou_index:
+            index.update(resultat)
+            ecrire_index(index)
+        compteurs['telechargees'] += len(resultat)
+        compteurs['non_associees'] += len(lot) - len(resultat)
+        signaler(lignes=len(lot))
+
+    compteurs['objets'] = len({entree['sha256'] for entrees in index.values() for entree in entrees})
+    print(f"Synchronisation terminée : {compteurs}")
+    if compteurs['reportees']:
+        print("Limite de débit atteinte : relancer plus tard pour les pièces reportées.")
+    if compteurs['non_associees']:
+        print(f"{compteurs['non_associees']} pièce(s) sans image associée : redemandées à la prochaine exécution.")
+    return compteurs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Télécharge les images des pièces d'un export Odoo.")
+    parser.add_argument("export", help="Export filtré, ex: MICPARTSONLINE/parts_canada_1240.csv")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Téléchargements simultanés.")
+    parser.add_argument("--force", action="store_true", help="Retélécharger aussi les pièces déjà présentes.")
+    args = parser.parse_args()
+
+    synchroniser_images(pieces_depuis_export(args.export), max_workers=args.workers, force=args.force)
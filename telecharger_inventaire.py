@@ -1,82 +1,54 @@
 import os
-import sys
-import requests
-import zipfile
 from dotenv import load_dotenv
 
-def download_inventory_file(endpoint: str):
+from moteur_telechargement import configuration_api, telecharger_et_extraire_zip
+from cache_colonnes import convertir_en_parquet
+
+def download_inventory_file(endpoint: str, force: bool = False):
     """
     Télécharge un fichier ZIP depuis un endpoint de l'API, le décompresse,
     et sauvegarde son contenu dans un dossier cible.
+
+    Args:
+        endpoint (str): L'endpoint de l'API (ex: "/inventory").
+        force (bool): Ignorer le cache et tout retélécharger.
+
+    Returns:
+        str: Le dossier cible, ou None si l'inventaire n'a pas changé.
     """
     # Charger les variables d'environnement (au cas où ce module est appelé seul)
     load_dotenv() 
     
     # Récupérer les configurations depuis les variables d'environnement
-    base_url = os.getenv("API_BASE_URL")
-    bearer_token = os.getenv("PARTS_CANADA_API_TOKEN")
+    base_url, headers = configuration_api()
     target_folder = "INVENTAIRE-PARTS-CANADA"
 
-    if not base_url or not bearer_token:
-        raise ValueError("Les variables d'environnement API_BASE_URL et PARTS_CANADA_API_TOKEN doivent être définies.")
-
     inventory_url = f"{base_url}{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {bearer_token}"
-    }
 
     print(f"Début du téléchargement de l'inventaire depuis {inventory_url}...")
 
     # ÉTAPE 1: Créer le dossier cible s'il n'existe pas
     if not os.path.exists(target_folder):
         os.makedirs(target_folder)
-        print(f"1/4. Dossier '{target_folder}' créé.")
+        print(f"1/3. Dossier '{target_folder}' créé.")
     else:
-        print(f"1/4. Le dossier '{target_folder}' existe déjà.")
-
-    # ÉTAPE 2: Télécharger le fichier ZIP dans un fichier temporaire
-    print(f"2/4. Téléchargement du fichier ZIP en cours...")
-    zip_response = requests.get(inventory_url, headers=headers, stream=True)
-    zip_response.raise_for_status()
-    
-    temp_zip_path = os.path.join(target_folder, "temp_inventory.zip")
-    total_size = zip_response.headers.get('content-length')
-
-    with open(temp_zip_path, 'wb') as f:
-        if total_size is None:
-            f.write(zip_response.content)
-            print("   Téléchargement du ZIP réussi (taille inconnue).")
-        else:
-            total_size = int(total_size)
-            downloaded = 0
-            chunk_size = 128 * 1024
-            
-            for data in zip_response.iter_content(chunk_size=chunk_size):
-                downloaded += len(data)
-                f.write(data)
-                
-                progress = int(50 * downloaded / total_size)
-                megabytes_downloaded = downloaded / (1024 * 1024)
-                total_megabytes = total_size / (1024 * 1024)
-                
-                sys.stdout.write(f"\r   [{'=' * progress}{' ' * (50 - progress)}] {megabytes_downloaded:.2f} Mo / {total_megabytes:.2f} Mo")
-                sys.stdout.flush()
-            
-            sys.stdout.write('\n')
-            print("   Téléchargement du ZIP terminé.")
-
-    # ÉTAPE 3 & 4: Décompresser et supprimer le fichier temporaire
-    try:
-        with zipfile.ZipFile(temp_zip_path, 'r') as zf:
-            print(f"3/4. Décompression du fichier en cours...")
-            zf.extractall(target_folder)
-            output_path = os.path.join(target_folder)
-            print(f"   Fichiers extraits avec succès dans le dossier '{target_folder}'.")
-    finally:
-        # S'assurer que le fichier temporaire est supprimé
-        os.remove(temp_zip_path)
-        print(f"4/4. Fichier temporaire '{os.path.basename(temp_zip_path)}' supprimé.")
-    
+        print(f"1/3. Le dossier '{target_folder}' existe déjà.")
+
+    # ÉTAPE 2 & 3: Télécharger, décompresser et supprimer le fichier temporaire
+    print(f"2/3. Téléchargement du fichier ZIP en cours...")
+    noms, modifie = telecharger_et_extraire_zip(inventory_url, target_folder, "temp_inventory.zip",
+                                             headers=headers, cle_cache=endpoint, force=force)
+    if not modifie:
+        print(f"3/3. Inventaire inchangé, rien à faire.")
+        return None
+    print(f"3/3. Fichiers extraits avec succès dans le dossier '{target_folder}'.")
+
+    # Conversion unique en Parquet : les étapes suivantes ne reparsent plus le CSV
+    for nom in noms:
+        if nom.endswith('.csv'):
+            convertir_en_parquet(os.path.join(target_folder, nom))
+
+    output_path = os.path.join(target_folder)
     return output_path
 
 # Ce bloc permet de tester ce module spécifiquement
@@ -86,4 +58,4 @@ if __name__ == "__main__":
         download_inventory_file(endpoint="/inventory")
         print("Test de téléchargement réussi.")
     except Exception as e:
-        print(f"Test de téléchargement a échoué : {e}")
\ No newline at end of file
+        print(f"Test de téléchargement a échoué : {e}")
@@ -0,0 +1,134 @@
+import os
+import requests
+import zipfile
+import pandas as pd
+from dotenv import load_dotenv
+
+from moteur_telechargement import configuration_api, telecharger_et_extraire_zip, premier_csv
+from sources_csv import lire_csv_source
+from cache_colonnes import convertir_en_parquet, empreinte_source
+from index_inventaire import construire_index
+from combiner_features import lire_etat, ecrire_etat
+from instantane_quantites import CLE_PIECE, enregistrer_instantane, appliquer_quantites
+from file_travaux import signaler
+
+# Charger les variables d'environnement à partir du fichier .env
+load_dotenv()
+
+# Dossier où le fichier des quantités est téléchargé
+DOSSIER_QUANTITES = "INVENTAIRE-QUANTITES-PARTS-CANADA"
+
+# Fichier à mettre à jour : l'inventaire combiné. Les exports Odoo n'ont pas de
+# colonne de stock ('Variant Seller/Quantity' est la quantité minimale d'achat) :
+# ils ne sont pas modifiés.
+FICHIER_COMBINE = os.path.join("INVENTAIRE-PARTS-CANADA", "PartsCanada_with_Features.csv")
+
+
+def download_quantities_file(force: bool = False):
+    """
+    Télécharge le fichier ZIP des quantités d'inventaire (/inventory/quantities).
+    Attention : l'API limite cet endpoint à 1 requête toutes les 2 heures.
+
+    Returns:
+        str: Le chemin du CSV des quantités, ou None s'il n'a pas changé.
+    """
+    base_url, headers = configuration_api()
+    endpoint = "/inventory/quantities"
+    quantities_url = f"{base_url}{endpoint}"
+
+    print(f"Début du téléchargement des quantités depuis {quantities_url}...")
+    try:
+        noms, modifie = telecharger_et_extraire_zip(quantities_url, DOSSIER_QUANTITES, "quantities_temp.zip",
+                                                    headers=headers, cle_cache=endpoint, force=force)
+        if not modifie:
+            print("     Quantités inchangées, rien à faire.")
+            return None
+        return os.path.join(DOSSIER_QUANTITES, premier_csv(noms))
+
+    except requests.exceptions.RequestException as e:
+        print(f"Une erreur de réseau est survenue : {e}")
+        raise
+    except zipfile.BadZipFile:
+        print("Erreur : Le fichier téléchargé n'est pas un fichier ZIP valide.")
+        raise
+
+
+def patcher_quantites(chemin_csv: str, quantites: pd.DataFrame, cle: str = CLE_PIECE):
+    """
+    Remplace, dans un CSV existant, les colonnes de quantité présentes dans
+    `quantites` (indexé par Part Number). Les autres colonnes sont réécrites
+    telles quelles (lues en texte, sans conversion).
+
+    Returns:
+        int: Le nombre de lignes mises à jour (0 : fichier laissé tel quel).
+    """
+    df = pd.read_csv(chemin_csv, dtype=str, keep_default_na=False)
+    lignes = appliquer_quantites(df, quantites, cle)
+    if not lignes:
+        return 0
+
+    # Écriture atomique : le fichier n'est jamais à moitié réécrit
+    df.to_csv(chemin_csv + ".tmp", index=False, encoding='utf-8')
+    os.replace(chemin_csv + ".tmp", chemin_csv)
+    return lignes
+
+
+def actualiser_derives_combine(empreinte_avant: dict):
+    """
+    Après la mise à jour des quantités du fichier combiné : reconstruit son
+    cache Parquet et son index (sinon périmés), et reporte sa nouvelle
+    empreinte dans l'état de la combinaison pour qu'elle ne soit pas refaite.
+    """
+    convertir_en_parquet(FICHIER_COMBINE)
+    construire_index(FICHIER_COMBINE)
+    etat = lire_etat()
+    if etat is not None and etat.get('sortie') == empreinte_avant:
+        ecrire_etat(dict(etat, sortie=empreinte_source(FICHIER_COMBINE)))
+
+
+def rafraichir_quantites(source=None, force: bool = False):
+    """
+    Télécharge uniquement le fichier des quantités et met à jour les colonnes
+    de quantité de l'inventaire combiné, sans refaire la combinaison des
+    caractéristiques. Les exports Odoo, sans colonne de stock, ne changent pas.
+
+    Les quantités sont aussi conservées comme dernier instantané : la
+    combinaison et le stock local les réappliquent à l'inventaire d'origine
+    tant qu'il n'a pas été retéléchargé.
+
+    Args:
+        source: Un CSV de quantités déjà téléchargé (sinon il est téléchargé).
+    """
+    if source is None:
+        source = download_quantities_file(force=force)
+        if source is None:
+            return
+
+    signaler(etape="lecture des quantités")
+    quantites = lire_csv_source(source, dtype=str, keep_default_na=False)
+    quantites = quantites.drop_duplicates(subset=[CLE_PIECE], keep='last').set_index(CLE_PIECE)
+    print(f"{len(quantites)} quantités lues ({', '.join(quantites.columns)}).")
+    enregistrer_instantane(quantites)
+
+    if not os.path.exists(FICHIER_COMBINE):
+        print(f"     '{FICHIER_COMBINE}' introuvable, ignoré.")
+        return
+    signaler(etape=f"mise à jour {os.path.basename(FICHIER_COMBINE)}")
+    empreinte_avant = empreinte_source(FICHIER_COMBINE)
+    lignes = patcher_quantites(FICHIER_COMBINE, quantites)
+    signaler(lignes=lignes)
+    if not lignes:
+        print(f"     '{FICHIER_COMBINE}' : aucune quantité à mettre à jour.")
+        return
+    print(f"     '{FICHIER_COMBINE}' : {lignes} lignes mises à jour.")
+    signaler(etape="cache et index du fichier combiné")
+    actualiser_derives_combine(empreinte_avant)
+
+
+# Ce bloc permet de tester le module de manière autonome
+if __name__ == "__main__":
+    try:
+        print("Test du rafraîchissement des quantités...")
+        rafraichir_quantites()
+    except Exception as e:
+        print(f"Le test autonome a échoué : {e}")
@@ -1,6 +1,10 @@
 import os
 import glob
-import csv
+import threading
+
+import pandas as pd
+
+from sources_csv import ouvrir_source_csv, trouver_source, source_existe, chemin_sur_disque
 
 # Définir le dossier de travail
 COMMODITY_FOLDER = "COMMODITY-CODES"
@@ -23,6 +27,78 @@ def find_csv_file(folder_path, file_pattern="*.csv"):
     return csv_files[0]
 
 
+# Colonnes du fichier commodity_codes.csv (dans cet ordre) : parent puis enfant
+COLONNES_HIERARCHIE = ['Parent Code', 'Parent Description', 'Child Code', 'Child Description']
+
+# Hiérarchie chargée en mémoire, rechargée quand le fichier change
+_hierarchie = {'source': None, 'mtime': None, 'table': None}
+_verrou_hierarchie = threading.Lock()
+
+
+def trouver_fichier_source():
+    """
+    Retourne la source du fichier commodity_codes.csv : le CSV extrait, ou
+    directement le membre de l'archive conservée (mode streaming).
+    """
+    source_file = trouver_source(os.path.join(COMMODITY_FOLDER, "commodity_codes.csv"))
+    if not source_existe(source_file):
+        source_file = find_csv_file(COMMODITY_FOLDER, "commodity_codes.csv")
+    return source_file
+
+
+def lire_hierarchie(source_file):
+    """
+    Lit le fichier des codes (parent/enfant) et retourne une table indexée par
+    code combiné (parent + enfant), avec les niveaux parent et enfant.
+    """
+    # Une colonne de plus que prévu : une ligne de 5 champs y laisse une valeur, une
+    # ligne plus courte laisse sa 4e colonne manquante (NaN, et non '' comme avec le
+    # moteur C), les lignes plus longues sont ignorées
+    with ouvrir_source_csv(source_file) as infile:
+        df = pd.read_csv(infile, header=None, skiprows=1, names=COLONNES_HIERARCHIE + ['En trop'],
+                         dtype=str, keep_default_na=False, encoding='utf-8-sig',
+                         engine='python', on_bad_lines='skip')
+    # Seules les lignes d'exactement 4 colonnes sont retenues (ni complétées, ni tronquées)
+    df = df.loc[df['Child Description'].notna() & df['En trop'].isna(), COLONNES_HIERARCHIE]
+    df = df.apply(lambda colonne: colonne.str.strip())
+
+    df['Combined Code'] = df['Parent Code'] + df['Child Code']
+    df['Combined Description'] = df['Parent Description'] + " : " + df['Child Description']
+    return df.set_index('Combined Code')
+
+
+def charger_hierarchie():
+    """
+    Retourne la hiérarchie des codes (voir lire_hierarchie), gardée en mémoire
+    tant que le fichier source ne change pas. Retourne None si les codes
+    n'ont pas encore été téléchargés.
+    """
+    try:
+        source_file = trouver_fichier_source()
+    except FileNotFoundError:
+        return None
+    chemin = chemin_sur_disque(source_file)
+
+    with _verrou_hierarchie:
+        mtime = os.path.getmtime(chemin)
+        if _hierarchie['source'] != source_file or _hierarchie['mtime'] != mtime:
+            _hierarchie.update(source=source_file, mtime=mtime, table=lire_hierarchie(source_file))
+        return _hierarchie['table']
+
+
+def categories_odoo(racine: str, separateur: str = " / "):
+    """
+    Retourne la catégorie Odoo de chaque code combiné, sous la forme
+    "<racine> / <parent> / <enfant>" (Series indexée par code combiné),
+    ou None si les codes ne sont pas disponibles.
+    """
+    table = charger_hierarchie()
+    if table is None:
+        return None
+    categories = racine + separateur + table['Parent Description'] + separateur + table['Child Description']
+    return categories[~categories.index.duplicated(keep='last')]
+
+
 def transformer_codes_commodite():
     """
     Lit le fichier commodity_codes.csv original, fusionne les colonnes parent/enfant
@@ -30,43 +106,18 @@ def transformer_codes_commodite():
     """
     
     try:
-        source_file = find_csv_file(COMMODITY_FOLDER, "commodity_codes.csv")
+        source_file = trouver_fichier_source()
         output_file = os.path.join(COMMODITY_FOLDER, "commodity_codes_fusionnes.csv")
         
         print(f"Début de la transformation : '{source_file}'...")
 
-        with open(source_file, mode='r', encoding='utf-8-sig') as infile:
-            reader = csv.reader(infile)
-            
-            with open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
-                writer = csv.writer(outfile)
-                
-                # Écrire le nouvel en-tête
-                writer.writerow(["Combined Code", "Combined Description"])
-                
-                # Lire l'en-tête original pour le sauter
-                header = next(reader)
-                
-                # Traiter chaque ligne
-                for row in reader:
-                    try:
-                        # Assurer que la ligne a bien 4 colonnes
-                        if len(row) == 4:
-                            parent_code = row[0].strip()
-                            parent_desc = row[1].strip()
-                            child_code = row[2].strip()
-                            child_desc = row[3].strip()
-                            
-                            # Créer les nouvelles colonnes
-                            combined_code = parent_code + child_code
-                            combined_desc = f"{parent_desc} : {child_desc}"
-                            
-                            # Écrire la nouvelle ligne
-                            writer.writerow([combined_code, combined_desc])
-                    except Exception as e:
-                        print(f"Erreur lors du traitement de la ligne {row}: {e}")
+        # Fusion vectorisée des colonnes parent/enfant
+        table = lire_hierarchie(source_file)
+        table[['Combined Description']].reset_index().to_csv(
+            output_file, index=False, encoding='utf-8', lineterminator='\r\n'
+        )
                         
-        print(f"Transformation terminée. Fichier sauvegardé : '{output_file}'")
+        print(f"Transformation terminée ({len(table)} codes). Fichier sauvegardé : '{output_file}'")
         return output_file
 
     except FileNotFoundError as e: